@@ -1,16 +1,26 @@
+import time
+_STARTUP_STARTED = time.perf_counter()  # Startup metrics are measured from here
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, simpledialog
-import pandas as pd
+from tkinter import font as tkfont
 import sqlite3
 import os
 import re
+import threading
 from tkinter.filedialog import asksaveasfilename
-from pandas.io.sql import DatabaseError
-import datetime
-from datetime import datetime
+from esd_engine import ExcelSQLEngine, DatabaseError, ESD_HOME
+from esd_history import QueryHistory
+from esd_profile import profile_chunks, dataframe_chunks, sparkline
+from esd_perf import HISTOGRAM_EDGES_MS, IMPORT_SECONDS, LazyModule
 
-class ExcelSQLApp:
+# pandas and numpy are imported on the first load or query, after the window is shown
+pd = LazyModule("pandas", globals(), "pd")
+np = LazyModule("numpy", globals(), "np")
+_IMPORTS_FINISHED = time.perf_counter()
+
+class ExcelSQLApp(ExcelSQLEngine):
     def __init__(self, root):
+        super().__init__()  # Engine configuration and workspace state
         self.root = root
         self.root.title("Excel SQL Developer")
         self.root.geometry("1100x800")
@@ -18,6 +28,15 @@ class ExcelSQLApp:
         # Configuration
         self.max_sample_rows = 1000  # For previews
         self.result_limit = 100000  # Safety limit for exports
+        self.excel_sheet_rows = 1048575  # Data rows per exported sheet: Excel's 1,048,576-row limit less the header
+        self.column_sample_rows = 1000  # Rows sampled (head, tail, random) when sizing result columns
+        self.column_width_candidates = 3  # Longest sampled values per column measured with the real font
+        self.result_page_size = 1000  # Rows rendered in the result grid at a time
+        self.history_page_size = 50  # Entries per page in the history browser
+        self.workspace_history_limit = 500  # Most recent history entries saved with a workspace
+        # Multi-statement runs and column profiling read the workspace from worker threads;
+        # a shared in-memory database lets them open it directly instead of a snapshot copy
+        self.storage_mode = "shared_memory"
 
         # Define a light color scheme for better visibility
         self.bg_color = "#f0f0f0"  # Light gray background for root and main frames
@@ -37,17 +56,34 @@ class ExcelSQLApp:
         self.treeview_selected_bg = "#cce0ff"  # Light blue for selected items
 
         # Initialize variables
-        self.file_path = ""
-        self.conn = None
-        self.table_mapping = {}
         self.current_results = None  # This will hold the DataFrame for export
-        self.query_history = []
+        self.history = QueryHistory(os.path.join(ESD_HOME, "history.db"))  # Opened on first use
         self.query_executed = ""  # This will hold the processed query for full export
+        self._column_width_cache = None  # (result DataFrame, column widths) of the last sized result
+        self._result_view_df = None  # Result behind the grid's in-memory sort/filter view
+        self._view_positions = ()  # Row positions of that result in display order
+        self._sort_state = None
+        self._sort_cache = {}
+        self._filter_mask = None
+        self._column_text_cache = {}
+        self._filter_after_id = None
+        self.result_page = 0
 
         # UI Setup
         self.configure_styles()
         self.create_widgets()
 
+        # Startup metrics in seconds since the module started importing; first paint is
+        # filled in once the event loop has drawn the window
+        self.startup_metrics = {"imports": _IMPORTS_FINISHED - _STARTUP_STARTED}
+        self.root.after_idle(self._record_first_paint)
+
+    def _record_first_paint(self):
+        self.startup_metrics["first_paint"] = time.perf_counter() - _STARTUP_STARTED
+        if self.perf.enabled:
+            for stage, seconds in self.startup_metrics.items():
+                self.perf.record(f"startup_{stage}", seconds)
+
     def configure_styles(self):
         """Configure ttk styles for the application"""
         style = ttk.Style()
@@ -105,12 +141,31 @@ class ExcelSQLApp:
         """Configure the tables explorer panel"""
         frame.grid_columnconfigure(0, weight=1)
 
+        top_frame = tk.Frame(frame, bg=self.frame_bg_color)
+        top_frame.grid(row=0, column=0, pady=10, sticky="ew")
+
         # Browse button (using tk.Button for direct color control)
-        browse_btn = tk.Button(frame, text="📂 Browse Excel Files", command=self.browse_files,
+        browse_btn = tk.Button(top_frame, text="📂 Browse Excel Files", command=self.browse_files,
                                bg=self.button_bg_color, fg=self.button_fg_color,
                                activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
                                relief=tk.RAISED, font=('Helvetica', 10, 'bold'))
-        browse_btn.grid(row=0, column=0, pady=10, sticky="ew")
+        browse_btn.pack(fill=tk.X)
+
+        # Workspace snapshot buttons
+        workspace_frame = tk.Frame(top_frame, bg=self.frame_bg_color)
+        workspace_frame.pack(fill=tk.X, pady=(5, 0))
+        for text, cmd in (("💾 Save Workspace", self.save_workspace_dialog),
+                          ("📦 Open Workspace", self.open_workspace_dialog)):
+            btn = tk.Button(workspace_frame, text=text, command=cmd,
+                            bg=self.button_bg_color, fg=self.button_fg_color,
+                            activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                            relief=tk.RAISED, font=('Helvetica', 9))
+            btn.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
+
+        tk.Button(top_frame, text="🧮 Summary Tables", command=self.show_summary_tables,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED, font=('Helvetica', 9)).pack(fill=tk.X, pady=(5, 0))
 
         # Search box
         search_frame = tk.Frame(frame, bg=self.frame_bg_color)
@@ -152,6 +207,9 @@ class ExcelSQLApp:
         self.tables_tree_context_menu = tk.Menu(self.root, tearoff=0)
         self.tables_tree_context_menu.add_command(label="Show Columns", command=self.show_columns_for_selected_table)
         self.tables_tree_context_menu.add_command(label="Copy Table Name", command=self.copy_table_name_to_clipboard)
+        self.tables_tree_context_menu.add_command(label="Profile Columns", command=self.profile_selected_table)
+        self.tables_tree_context_menu.add_command(label="Text Index...", command=self.show_text_index_dialog)
+        self.tables_tree_context_menu.add_command(label="Reload Workbook", command=self.reload_selected_workbook)
 
         # --- New Warning Display Area ---
         self.warning_label = tk.Label(frame, text="Warnings:", bg=self.frame_bg_color, fg="red")
@@ -194,7 +252,7 @@ class ExcelSQLApp:
             "IN", "LIKE", "IS NULL", "IS NOT NULL", "INSERT", "UPDATE",
             "DELETE", "CREATE", "ALTER", "DROP", "TABLE", "VIEW", "INDEX",
             "AS", "DISTINCT", "COUNT", "SUM", "AVG", "MIN", "MAX",
-            "HAVING", "LIMIT", "OFFSET"
+            "HAVING", "LIMIT", "OFFSET", "MATCH"
         ]
 
         # Scrollbars
@@ -226,6 +284,9 @@ class ExcelSQLApp:
             ("📖 Sample Data", self.show_sample_data),
             ("📋 Clear", self.clear_query),
             ("⏱ History", self.show_query_history),
+            ("🔬 Profile", self.profile_query),
+            ("⚡ Index Advisor", self.show_index_advisor),
+            ("📈 Performance", self.show_performance_window),
         ]
 
         for i, (text, cmd) in enumerate(buttons):
@@ -252,9 +313,15 @@ class ExcelSQLApp:
                                     bg=self.bg_color, fg="grey")
         self.spool_label.pack(side=tk.LEFT, padx=5)
 
+        # Approximate mode: aggregates on large sheets are estimated from row samples
+        self.approximate_var = tk.BooleanVar(value=self.approximate_mode)
+        tk.Checkbutton(spool_frame, text="≈ Approximate (sampled aggregates)", variable=self.approximate_var,
+                       command=self.toggle_approximate_mode,
+                       bg=self.bg_color, fg=self.text_color).pack(side=tk.RIGHT, padx=5)
+
     def toggle_spooling(self):
             """Toggle spooling on/off"""
-            if getattr(self, 'spooling_active', False):
+            if self.spooling_active:
                 self.disable_spool()
                 self.spool_btn.config(text="🔴 Start Spooling", bg="#880000")
                 self.spool_label.config(text="No active spool file", fg="grey")
@@ -267,6 +334,17 @@ class ExcelSQLApp:
                         self.spool_btn.config(text="✅ Stop Spooling", bg="#008800")
                         self.spool_label.config(text=f"Spooling to: {file_path}", fg="black")
 
+    def toggle_approximate_mode(self):
+        """Estimate aggregates on large sheets from their samples, or go back to exact answers"""
+        self.approximate_mode = self.approximate_var.get()
+        sampled = len(self.sample_tables)
+        if self.approximate_mode and not sampled:
+            self.status_var.set(f"Approximate mode on; no sheet has {self.sample_min_rows:,}+ rows, "
+                                f"so queries stay exact")
+        else:
+            self.status_var.set(f"Approximate mode {'on' if self.approximate_mode else 'off'}"
+                                f"{f' ({sampled} sampled sheet(s))' if self.approximate_mode else ''}")
+
     def highlight_syntax(self, event=None):
         """Basic SQL syntax highlighting"""
         # Remove previous highlighting
@@ -370,8 +448,45 @@ class ExcelSQLApp:
         self.result_tree_context_menu = tk.Menu(self.root, tearoff=0)
         self.result_tree_context_menu.add_command(label="Copy Cell Value", command=self.copy_cell_value)
         self.result_tree_context_menu.add_command(label="Copy Column Name", command=self.copy_column_name)
+        self.result_tree_context_menu.add_command(label="Profile Result Columns", command=self.profile_current_results)
         self.result_tree.bind("<Button-3>", self.show_result_tree_context_menu)
 
+        # Quick filter and paging
+        view_frame = tk.Frame(frame, bg=self.bg_color)
+        view_frame.grid(row=1, column=0, sticky="ew", pady=(5, 0))
+
+        tk.Label(view_frame, text="Filter:", bg=self.bg_color, fg=self.text_color).pack(side=tk.LEFT)
+        self.filter_column_var = tk.StringVar(value="All columns")
+        self.filter_column_combo = ttk.Combobox(view_frame, textvariable=self.filter_column_var,
+                                                values=["All columns"], state="readonly", width=20)
+        self.filter_column_combo.pack(side=tk.LEFT, padx=2)
+        self.filter_column_combo.bind("<<ComboboxSelected>>", self.apply_result_filter)
+
+        self.filter_var = tk.StringVar()
+        filter_entry = tk.Entry(view_frame, textvariable=self.filter_var, width=30,
+                                bg=self.entry_bg_color, fg=self.entry_fg_color,
+                                insertbackground=self.entry_fg_color)
+        filter_entry.pack(side=tk.LEFT, padx=2)
+        filter_entry.bind("<KeyRelease>", self._schedule_result_filter)
+        filter_entry.bind("<Return>", self.apply_result_filter)
+
+        tk.Button(view_frame, text="✖", command=self.clear_result_filter, width=3,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED).pack(side=tk.LEFT, padx=2)
+
+        tk.Button(view_frame, text="▶", command=lambda: self.change_result_page(1), width=3,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED).pack(side=tk.RIGHT, padx=2)
+        self.page_label_var = tk.StringVar()
+        tk.Label(view_frame, textvariable=self.page_label_var,
+                 bg=self.bg_color, fg=self.text_color).pack(side=tk.RIGHT, padx=5)
+        tk.Button(view_frame, text="◀", command=lambda: self.change_result_page(-1), width=3,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED).pack(side=tk.RIGHT, padx=2)
+
         # Result buttons
         btn_frame = tk.Frame(frame, bg=self.bg_color)
         btn_frame.grid(row=2, column=0, sticky="e", pady=5)
@@ -461,8 +576,10 @@ class ExcelSQLApp:
             self.status_var.set("Could not determine which column was clicked.")
             return
 
-        # Get the column name from the treeview
-        column_name = self.result_tree.heading(column_id)['text']
+        # Get the column name from the treeview (the heading text may carry a sort arrow)
+        column_index = int(column_id.replace("#", "")) - 1
+        columns = self.result_tree["columns"]
+        column_name = columns[column_index] if 0 <= column_index < len(columns) else ""
 
         if column_name:
             self.root.clipboard_clear()
@@ -496,9 +613,11 @@ class ExcelSQLApp:
                 if item['values'] and item['values'][0] == "Sheet":
                     self.tables_tree_context_menu.entryconfig("Show Columns", state="normal")
                     self.tables_tree_context_menu.entryconfig("Copy Table Name", state="normal")
+                    self.tables_tree_context_menu.entryconfig("Profile Columns", state="normal")
                 else:
                     self.tables_tree_context_menu.entryconfig("Show Columns", state="disabled")
                     self.tables_tree_context_menu.entryconfig("Copy Table Name", state="disabled")
+                    self.tables_tree_context_menu.entryconfig("Profile Columns", state="disabled")
 
                 self.tables_tree_context_menu.tk_popup(event.x_root, event.y_root)
         finally:
@@ -534,29 +653,14 @@ class ExcelSQLApp:
         self.clear_ui()
         self.root.update_idletasks()
 
-        collected_warnings = []  # Collect warnings here as (message, type) tuples
-
         try:
-            self.conn = sqlite3.connect(':memory:')
-            self.conn.text_factory = str
-            self.table_mapping = {}
-
-            excel_files = [f for f in os.listdir(self.file_path)
-                           if f.lower().endswith(('.xlsx', '.xls'))]
+            excel_files, collected_warnings = self.load_folder(path, self._show_load_progress)
 
             if not excel_files:
                 self.status_var.set("No Excel files found in selected directory.")
                 self._update_warning_display([("No Excel files found in selected directory.", "info")])
                 return
 
-            # Process files with progress
-            total_files = len(excel_files)
-            for i, filename in enumerate(excel_files, 1):
-                self.status_var.set(f"Loading files ({i}/{total_files}): {filename[:20]}...")
-                self.root.update_idletasks()
-                # Pass the warnings list to load_excel_file
-                self.load_excel_file(filename, collected_warnings)
-
             self.populate_tables_tree()
             final_status_message = f"Loaded {len(self.table_mapping)} tables from {len(excel_files)} files"
             if collected_warnings:
@@ -572,120 +676,62 @@ class ExcelSQLApp:
             ])
             self.conn = None
 
-    def load_excel_file(self, filename, collected_warnings):
-        """Load all sheets from an Excel file into SQLite"""
-        file_path = os.path.join(self.file_path, filename)
-        file_base = os.path.splitext(filename)[0]
-
-        # Sanitize file_key and check for changes
-        original_file_key = file_base.lower().replace(' ', '_')
-        file_key = re.sub(r'[^a-z0-9_]', '', original_file_key)
-        if original_file_key != file_key:
-            collected_warnings.append(
-                (f"File name '{file_base}' sanitized to '{file_key}' for internal use due to special characters/spaces.",
-                 "info")
-            )
+    def save_workspace_dialog(self):
+        """Save the loaded database, table mapping, warnings and history to a workspace file"""
+        if not self.conn:
+            messagebox.showwarning("No Database", "Please load Excel files first.")
+            return
+
+        path = filedialog.asksaveasfilename(defaultextension=".esdw",
+                                            filetypes=[("ESD Workspace", "*.esdw"), ("All files", "*.*")],
+                                            title="Save Workspace As")
+        if not path:
+            return
 
+        self.status_var.set("Saving workspace...")
+        self.root.update_idletasks()
+        start = time.perf_counter()
         try:
-            xls = pd.ExcelFile(file_path)
+            self.save_workspace(path, extra={"query_history": self.history.recent(self.workspace_history_limit)})
+        except Exception as e:
+            messagebox.showerror("Workspace Error", f"Failed to save workspace:\n{str(e)}")
+            self.status_var.set("Error saving workspace")
+            return
+        self.status_var.set(f"Saved workspace to {os.path.basename(path)} in {time.perf_counter() - start:.1f}s")
 
-            for sheet_name in xls.sheet_names:
-                full_sheet_name_display = f"{file_base}.{sheet_name}"  # For display in warnings
+    def open_workspace_dialog(self):
+        """Restore a saved workspace without re-reading the source workbooks"""
+        path = filedialog.askopenfilename(filetypes=[("ESD Workspace", "*.esdw"), ("All files", "*.*")],
+                                          title="Open Workspace")
+        if not path:
+            return
 
-                # Sanitize sheet_name for SQL table name and check for changes
-                original_sheet_name_for_sql = sheet_name.lower().replace(' ', '_')
-                sanitized_sheet_name_for_sql = re.sub(r'[^a-z0-9_]', '', original_sheet_name_for_sql)
+        self.status_var.set("Opening workspace...")
+        self.clear_ui()
+        self.root.update_idletasks()
+        start = time.perf_counter()
+        try:
+            extra = self.open_workspace(path)
+        except Exception as e:
+            messagebox.showerror("Workspace Error", f"Failed to open workspace:\n{str(e)}")
+            self.status_var.set("Error opening workspace")
+            self.conn = None
+            return
 
-                if original_sheet_name_for_sql != sanitized_sheet_name_for_sql:
-                    collected_warnings.append(
-                        (f"Sheet name '{sheet_name}' in file '{file_base}' sanitized to '{sanitized_sheet_name_for_sql}' for internal use due to special characters/spaces.",
-                         "info")
-                    )
+        self.history.import_queries(extra.get("query_history", []))
+        self.populate_tables_tree()
+        self._update_warning_display(self.load_warnings)
+        self.status_var.set(f"Opened workspace with {len(self.table_mapping)} tables "
+                            f"in {time.perf_counter() - start:.1f}s")
 
-                try:
-                    # Read the Excel sheet without a header first
-                    df_raw = pd.read_excel(xls, sheet_name, header=None, na_values=['', 'NA', 'NULL'])
-
-                    if df_raw.empty:
-                        collected_warnings.append(
-                            (f"Sheet '{full_sheet_name_display}' is empty and will not be loaded.", "info"))
-                        continue  # Skip empty sheets
-
-                    # Extract the first row as potential headers
-                    original_headers = df_raw.iloc[0].tolist()
-                    # Drop the header row from the DataFrame
-                    df = df_raw[1:].copy()
-                    df.reset_index(drop=True, inplace=True)  # Reset index after dropping row
-
-                    # Drop columns that are entirely NaN after header extraction
-                    df = df.dropna(axis=1, how='all')
-
-                    # --- Custom Column Name Processing ---
-                    processed_columns = []
-                    seen_final_names = set()
-                    for i, col_name_raw in enumerate(original_headers):
-                        # If column was dropped due to all NaNs, its header won't be used
-                        if i not in df.columns:
-                            continue
-
-                        original_col_str = str(col_name_raw).strip() if pd.notna(
-                            col_name_raw) else f"Unnamed_Column_{i}"
-
-                        # Step 1: Handle original duplicates
-                        base_name_for_dup_check = original_col_str
-                        count = 1
-                        while base_name_for_dup_check in seen_final_names:
-                            base_name_for_dup_check = f"{original_col_str}_{count}"
-                            count += 1
-
-                        if base_name_for_dup_check != original_col_str:
-                            collected_warnings.append(
-                                (f"'{full_sheet_name_display}': Original column '{original_col_str}' is a duplicate. Renamed to '{base_name_for_dup_check}'.",
-                                 "info")
-                            )
-
-                        # Step 2: Sanitize for special characters/spaces
-                        sanitized_name = re.sub(r'[^a-zA-Z0-9_]', '', base_name_for_dup_check.replace(' ', '_'))
-
-                        if sanitized_name != base_name_for_dup_check:
-                            collected_warnings.append(
-                                (f"'{full_sheet_name_display}': Column '{base_name_for_dup_check}' renamed to '{sanitized_name}' due to special characters or spaces.",
-                                 "info")
-                            )
-
-                        # Final check for uniqueness after full sanitization (should be rare if logic is correct)
-                        final_col_name = sanitized_name
-                        counter_final = 1
-                        while final_col_name in seen_final_names:
-                            final_col_name = f"{sanitized_name}_{counter_final}"
-                            counter_final += 1
-                            # This case should ideally not happen if previous duplicate handling is robust
-                            # but acts as a safeguard.
-                            if counter_final == 2:  # Only warn once for the first append
-                                collected_warnings.append(
-                                    (f"'{full_sheet_name_display}': Column '{sanitized_name}' became a duplicate after sanitization. Renamed to '{final_col_name}'.",
-                                     "info")
-                                )
-
-                        processed_columns.append(final_col_name)
-                        seen_final_names.add(final_col_name)
-
-                    # Assign the new column names to the DataFrame
-                    df.columns = processed_columns
-
-                    sql_table_name = f"{file_key}_{sanitized_sheet_name_for_sql}"
-                    sql_table_name = re.sub(r'[^a-z0-9_]', '', sql_table_name)  # Final check for table name
-
-                    self.table_mapping[full_sheet_name_display] = sql_table_name
-                    df.to_sql(sql_table_name, self.conn, index=False, if_exists='replace')
-
-                except Exception as e:
-                    collected_warnings.append((f"Error loading sheet '{full_sheet_name_display}': {str(e)}", "error"))
-                    print(f"Error loading {filename} sheet {sheet_name}: {str(e)}")  # Keep for console debug
+    def _show_load_progress(self, index, total_files, filename):
+        """Progress callback for load_folder"""
+        self.status_var.set(f"Loading files ({index}/{total_files}): {filename[:20]}...")
+        self.root.update_idletasks()
 
-        except Exception as e:
-            collected_warnings.append((f"Error loading file '{filename}': {str(e)}", "error"))
-            print(f"Error loading {filename}: {str(e)}")  # Keep for console debug
+    def report_status(self, message):
+        """Show engine progress messages in the status bar"""
+        self.status_var.set(message)
 
     def populate_tables_tree(self):
         """Display all tables in a hierarchical view"""
@@ -706,22 +752,82 @@ class ExcelSQLApp:
             # Count total rows for the file
             file_rows = sum(row_count for _, _, row_count in sheets)
 
+            file_type = "Summary" if file == self.summary_file and self.summary_tables else "Excel"
             file_node = self.tables_tree.insert("", "end", text=file,
-                                                values=("Excel", f"{file_rows:,}"))
+                                                values=(file_type, f"{file_rows:,}"))
 
             for sheet, sql_name, row_count in sorted(sheets):
                 self.tables_tree.insert(file_node, "end", text=sheet,
                                         values=("Sheet", f"{row_count:,}"))
 
-    def get_row_count(self, table_name):
-        """Get row count for a table"""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(f"SELECT COUNT(*) FROM \"{table_name}\"")
-            return cursor.fetchone()[0]
-        except sqlite3.Error as e:
-            print(f"Error getting row count for {table_name}: {e}")
-            return 0
+    def show_index_advisor(self):
+        """Show index suggestions gathered from query plans and let the user create them"""
+        if not self.conn:
+            messagebox.showwarning("No Database", "Please load Excel files first.")
+            return
+
+        sql_to_dot = {v: k for k, v in self.table_mapping.items()}
+
+        advisor_window = tk.Toplevel(self.root)
+        advisor_window.title("Index Advisor")
+        advisor_window.geometry("700x400")
+        advisor_window.configure(bg=self.bg_color)
+        advisor_window.transient(self.root)
+        advisor_window.grab_set()
+
+        tree_frame = tk.Frame(advisor_window, bg=self.frame_bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        advisor_tree = ttk.Treeview(tree_frame, show="headings", selectmode="extended")
+        advisor_tree["columns"] = ("Table", "Column", "Full Scans", "Status")
+        for heading, width in (("Table", 250), ("Column", 150), ("Full Scans", 80), ("Status", 100)):
+            advisor_tree.heading(heading, text=heading)
+            advisor_tree.column(heading, width=width, anchor="w")
+
+        scroll_y = ttk.Scrollbar(tree_frame, orient="vertical", command=advisor_tree.yview)
+        advisor_tree.configure(yscrollcommand=scroll_y.set)
+        advisor_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
+
+        def refresh():
+            advisor_tree.delete(*advisor_tree.get_children())
+            for (table, column), count in self.index_scan_counts.most_common():
+                status = "Suggested" if count >= self.index_scan_threshold else "Watching"
+                advisor_tree.insert("", "end", iid=f"{table}\x00{column}",
+                                    values=(sql_to_dot.get(table, table), column, count, status))
+            for table, column in self.created_indexes:
+                advisor_tree.insert("", "end", values=(sql_to_dot.get(table, table), column, "-", "Indexed"))
+
+        def create_selected():
+            created = 0
+            for item_id in advisor_tree.selection():
+                if "\x00" not in item_id:
+                    continue  # Already indexed
+                table, column = item_id.split("\x00", 1)
+                if self.create_index(table, column):
+                    created += 1
+            self.status_var.set(f"Created {created} index(es)")
+            refresh()
+
+        auto_var = tk.BooleanVar(value=self.auto_create_indexes)
+
+        def toggle_auto():
+            self.auto_create_indexes = auto_var.get()
+
+        tk.Checkbutton(advisor_window, text=f"Create suggested indexes automatically (budget: {self.index_budget})",
+                       variable=auto_var, command=toggle_auto,
+                       bg=self.bg_color, fg=self.text_color).pack(pady=(0, 5))
+
+        create_btn = tk.Button(advisor_window, text="⚡ Create Selected Indexes", command=create_selected,
+                               bg=self.button_bg_color, fg=self.button_fg_color,
+                               activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                               relief=tk.RAISED, font=('Helvetica', 10, 'bold'))
+        create_btn.pack(pady=10)
+
+        refresh()
+        advisor_window.wait_window()
 
     def execute_query_handler(self):
         """Handles query execution while preserving selection functionality"""
@@ -734,32 +840,335 @@ class ExcelSQLApp:
         queries = [q.strip() for q in query_text.split(';') if q.strip()]
 
         try:
-            for i, query in enumerate(queries):
-                if hasattr(self, 'spooling_active') and self.spooling_active:
-                    self._write_query_header(query, i == 0)
+            # Independent read-only statements run concurrently; results still arrive in order
+            for i, processed_query, result_df, error in self.iter_statement_results(queries, validate=False):
+                if self.spooling_active:
+                    self.write_query_header(queries[i], i == 0)
+                self.record_history(queries[i], result_df, error)
+                if error:
+                    raise error
 
-                processed_query = self.process_query(query)
-                result_df = pd.read_sql_query(processed_query, self.conn)
                 self._handle_query_results(result_df, i, len(queries))
 
         except Exception as e:
             self.handle_sql_error(str(e))
 
-    def _write_query_header(self, query, is_first_query):
-        """Write query header to spool file"""
-        self.spool_file.write(f"\n--- Query executed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-        self.spool_file.write(f"{query}\n")
-        self.spool_file.write("-" * 80 + "\n")
+    def profile_query(self):
+        """Execute the current query with per-stage timing and show its EXPLAIN QUERY PLAN"""
+        if not self.conn:
+            messagebox.showwarning("No Database", "Please load Excel files first.")
+            return
+
+        query_text = self._get_query_to_execute()
+        queries = [q.strip() for q in query_text.split(';') if q.strip()]
+        if not queries:
+            messagebox.showwarning("Input Error", "Please enter or select a SQL query")
+            return
+        if len(queries) > 1:
+            messagebox.showwarning("Profile", "Please select a single query to profile")
+            return
+        query = queries[0]
+
+        timings = []
+        steps = [0]
+        step_interval = 1000  # VM instructions between progress handler callbacks
+
+        def count_steps():
+            steps[0] += step_interval
+            return 0  # Returning non-zero would abort the query
+
+        try:
+            self.validate_query(query)
+
+            start = time.perf_counter()
+            processed_query = self.process_query(query)
+            timings.append(("Rewrite (process_query)", time.perf_counter() - start))
+
+            plan = self.conn.execute(f"EXPLAIN QUERY PLAN {processed_query}").fetchall()
+
+            self.result_status_var.set("Profiling query...")
+            self.root.update_idletasks()
+
+            self.conn.set_progress_handler(count_steps, step_interval)
+            try:
+                start = time.perf_counter()
+                cursor = self.conn.execute(processed_query)
+                rows = cursor.fetchall()
+                timings.append(("SQLite execution", time.perf_counter() - start))
+            finally:
+                self.conn.set_progress_handler(None, 0)
+            self.advise_indexes(processed_query)
+
+            start = time.perf_counter()
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            result_df = pd.DataFrame.from_records(rows, columns=columns)
+            timings.append(("DataFrame construction", time.perf_counter() - start))
+
+            start = time.perf_counter()
+            self.current_results = result_df
+            self.query_executed = processed_query
+            self.show_results(result_df)
+            self.root.update_idletasks()
+            timings.append(("Grid rendering", time.perf_counter() - start))
+
+        except (sqlite3.Error, DatabaseError) as e:
+            self.handle_sql_error(str(e))
+            return
+
+        self.show_profile_window(query, plan, timings, steps[0], len(result_df.index))
+
+    def show_profile_window(self, query, plan, timings, vm_steps, row_count):
+        """Display a query plan tree and the stage timings of a profiled query"""
+        profile_window = tk.Toplevel(self.root)
+        profile_window.title("Query Profile")
+        profile_window.geometry("800x550")
+        profile_window.configure(bg=self.bg_color)
+        profile_window.transient(self.root)
+
+        plan_frame = ttk.LabelFrame(profile_window, text=" Query Plan ")
+        plan_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        plan_frame.grid_rowconfigure(0, weight=1)
+        plan_frame.grid_columnconfigure(0, weight=1)
+
+        plan_tree = ttk.Treeview(plan_frame, show="tree")
+        scroll_y = ttk.Scrollbar(plan_frame, orient="vertical", command=plan_tree.yview)
+        plan_tree.configure(yscrollcommand=scroll_y.set)
+        plan_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
+
+        # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); parent 0 is the root
+        for node_id, parent_id, _, detail in plan:
+            parent = str(parent_id) if parent_id and plan_tree.exists(str(parent_id)) else ""
+            plan_tree.insert(parent, "end", iid=str(node_id), text=detail, open=True)
+
+        timing_frame = ttk.LabelFrame(profile_window, text=" Timings ")
+        timing_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        total = sum(seconds for _, seconds in timings)
+        lines = [f"{stage:<28}{seconds * 1000:>12.1f} ms  {seconds / total * 100 if total else 0:>5.1f}%"
+                 for stage, seconds in timings]
+        lines.append(f"{'Total':<28}{total * 1000:>12.1f} ms")
+        lines.append("")
+        lines.append(f"Rows returned: {row_count:,}")
+        lines.append(f"VM steps (progress handler): ~{vm_steps:,}")
+
+        timing_text = tk.Text(timing_frame, height=len(lines) + 1, wrap=tk.NONE,
+                              bg=self.entry_bg_color, fg=self.entry_fg_color, font=('Consolas', 10))
+        timing_text.pack(fill=tk.X, padx=5, pady=5)
+        timing_text.insert(tk.END, "\n".join(lines))
+        timing_text.configure(state='disabled')
+
+        self.result_status_var.set(f"Profiled {row_count:,} rows in {total * 1000:.1f} ms")
+
+    def show_performance_window(self):
+        """Show per-stage timing histograms recorded by the engine's timing spans"""
+        perf_window = tk.Toplevel(self.root)
+        perf_window.title("Performance")
+        perf_window.geometry("850x400")
+        perf_window.configure(bg=self.bg_color)
+        perf_window.transient(self.root)
+
+        control_frame = tk.Frame(perf_window, bg=self.bg_color)
+        control_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        recording_var = tk.BooleanVar(value=self.perf.enabled)
+
+        def toggle_recording():
+            if recording_var.get():
+                try:
+                    self.enable_perf_log()
+                except OSError as e:
+                    self.perf.enable()  # Keep the in-app view even if the log cannot be written
+                    self.status_var.set(f"Timing log unavailable: {e}")
+            else:
+                self.perf.disable()
+            refresh()
+
+        tk.Checkbutton(control_frame, text="Record timings", variable=recording_var, command=toggle_recording,
+                       bg=self.bg_color, fg=self.text_color, selectcolor=self.entry_bg_color,
+                       activebackground=self.bg_color, activeforeground=self.text_color).pack(side=tk.LEFT)
+        log_label = tk.Label(control_frame, bg=self.bg_color, fg="grey")
+        log_label.pack(side=tk.LEFT, padx=10)
+
+        tree_frame = tk.Frame(perf_window, bg=self.frame_bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        headings = (("Stage", 140), ("Count", 60), ("p50 ms", 80), ("p95 ms", 80), ("Max ms", 80),
+                    ("Total ms", 90), ("Histogram", 200))
+        perf_tree = ttk.Treeview(tree_frame, show="headings")
+        perf_tree["columns"] = [heading for heading, _ in headings]
+        for heading, width in headings:
+            perf_tree.heading(heading, text=heading)
+            perf_tree.column(heading, width=width, anchor="w")
+        scroll_y = ttk.Scrollbar(tree_frame, orient="vertical", command=perf_tree.yview)
+        perf_tree.configure(yscrollcommand=scroll_y.set)
+        perf_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
+
+        edges = " ".join(f"{edge:g}" for edge in HISTOGRAM_EDGES_MS)
+        tk.Label(perf_window, text=f"Histogram buckets end at {edges} ms; the last bucket is open",
+                 bg=self.bg_color, fg="grey").pack(padx=10, anchor="w")
+        startup_label = tk.Label(perf_window, bg=self.bg_color, fg="grey")
+        startup_label.pack(padx=10, anchor="w")
+
+        def refresh():
+            if not perf_window.winfo_exists():
+                return
+            perf_tree.delete(*perf_tree.get_children())
+            for row in self.perf.summary():
+                perf_tree.insert("", "end", values=(
+                    row["stage"], row["count"], f"{row['p50_ms']:.1f}", f"{row['p95_ms']:.1f}",
+                    f"{row['max_ms']:.1f}", f"{row['total_ms']:.0f}", sparkline(row["histogram"])))
+            startup = ", ".join(f"{stage.replace('_', ' ')} {seconds * 1000:.0f} ms"
+                                for stage, seconds in self.startup_metrics.items())
+            deferred = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in IMPORT_SECONDS.items())
+            startup_label.config(text=f"Startup: {startup}" + (f"; deferred imports: {deferred}" if deferred else ""))
+            if not self.perf.enabled:
+                log_label.config(text="Not recording")
+            else:
+                log_label.config(text=f"Logging to {self.perf.log_path}" if self.perf.log_path else "Recording")
+            perf_window.after(1000, refresh)
+
+        def clear():
+            self.perf.clear()
+            perf_tree.delete(*perf_tree.get_children())
+
+        perf_btn_frame = tk.Frame(perf_window, bg=self.bg_color)
+        perf_btn_frame.pack(pady=(0, 10))
+        for text, cmd in (("🧹 Clear", clear), ("🧠 Memory", self.show_memory_window)):
+            tk.Button(perf_btn_frame, text=text, command=cmd,
+                      bg=self.button_bg_color, fg=self.button_fg_color,
+                      activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                      relief=tk.RAISED, font=('Helvetica', 10, 'bold')).pack(side=tk.LEFT, padx=2)
+
+        refresh()
+
+    @staticmethod
+    def _format_bytes(size):
+        for unit in ("B", "KB", "MB"):
+            if abs(size) < 1024:
+                return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+            size /= 1024
+        return f"{size:,.1f} GB"
+
+    def show_memory_window(self):
+        """Report SQLite storage per table, the current result's footprint, Tk item counts and ingest allocations"""
+        memory_window = tk.Toplevel(self.root)
+        memory_window.title("Memory Diagnostics")
+        memory_window.geometry("850x650")
+        memory_window.configure(bg=self.bg_color)
+        memory_window.transient(self.root)
+
+        def make_tree(parent, headings, height):
+            parent.grid_rowconfigure(0, weight=1)
+            parent.grid_columnconfigure(0, weight=1)
+            tree = ttk.Treeview(parent, show="headings", height=height)
+            tree["columns"] = [heading for heading, _ in headings]
+            for heading, width in headings:
+                tree.heading(heading, text=heading)
+                tree.column(heading, width=width, anchor="w")
+            scroll_y = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scroll_y.set)
+            tree.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+            scroll_y.grid(row=0, column=1, sticky="ns")
+            return tree
+
+        # SQLite pages per table (dbstat), indexes included
+        storage_frame = ttk.LabelFrame(memory_window, text=" SQLite Storage ")
+        storage_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        storage_tree = make_tree(storage_frame, (("Table", 350), ("Pages", 100), ("Size", 120)), 6)
+
+        # Current result and widgets
+        usage_frame = ttk.LabelFrame(memory_window, text=" Results and Widgets ")
+        usage_frame.pack(fill=tk.X, padx=10, pady=5)
+        usage_text = tk.Text(usage_frame, height=7, wrap=tk.NONE, bg=self.entry_bg_color,
+                             fg=self.entry_fg_color, font=('Consolas', 10))
+        usage_text.pack(fill=tk.X, padx=5, pady=5)
+
+        # tracemalloc diff around the last traced load
+        ingest_frame = ttk.LabelFrame(memory_window, text=" Ingest Allocations (tracemalloc) ")
+        ingest_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        ingest_label = tk.Label(ingest_frame, bg=self.frame_bg_color, fg=self.text_color, anchor="w")
+        ingest_label.grid(row=1, column=0, sticky="we", padx=5)
+        ingest_tree = make_tree(ingest_frame, (("Allocated at", 450), ("Size Diff", 110), ("Blocks Diff", 90),
+                                               ("Size", 110)), 6)
+
+        trace_var = tk.BooleanVar(value=self.trace_ingest_memory)
+
+        def toggle_trace():
+            self.trace_ingest_memory = trace_var.get()
+
+        tk.Checkbutton(memory_window, text="Trace allocations during the next load (slower)",
+                       variable=trace_var, command=toggle_trace,
+                       bg=self.bg_color, fg=self.text_color, selectcolor=self.entry_bg_color,
+                       activebackground=self.bg_color, activeforeground=self.text_color).pack(anchor="w", padx=10)
+
+        def count_items(tree, parent=""):
+            children = tree.get_children(parent)
+            return len(children) + sum(count_items(tree, child) for child in children)
+
+        def count_widgets(widget):
+            children = widget.winfo_children()
+            return len(children) + sum(count_widgets(child) for child in children)
+
+        def refresh():
+            storage_tree.delete(*storage_tree.get_children())
+            if self.conn:
+                sql_to_dot = {v: k for k, v in self.table_mapping.items()}
+                usage = self.table_memory_usage()
+                for sql_name, size, pages in usage:
+                    name = "All tables (dbstat unavailable)" if sql_name == "*" else sql_to_dot.get(sql_name, sql_name)
+                    storage_tree.insert("", "end", values=(name, f"{pages:,}", self._format_bytes(size)))
+                storage_tree.insert("", "end", values=("Total", f"{sum(row[2] for row in usage):,}",
+                                                       self._format_bytes(sum(row[1] for row in usage))))
+
+            lines = []
+            df = self.current_results
+            if df is not None:
+                column_bytes = df.memory_usage(index=False, deep=True)
+                lines.append(f"Current result: {len(df):,} rows x {len(df.columns)} columns, "
+                             f"{self._format_bytes(int(column_bytes.sum()))} in memory")
+                largest = column_bytes.nlargest(3)
+                lines.append("  Largest columns: " + ", ".join(f"{col} {self._format_bytes(int(size))}"
+                                                                for col, size in largest.items()))
+                spill = df.attrs.get("spill")
+                if spill is not None and os.path.exists(spill.path):
+                    lines.append(f"  Spilled to disk: {spill.row_count:,} rows, "
+                                 f"{self._format_bytes(os.path.getsize(spill.path))}")
+            else:
+                lines.append("Current result: none")
+            lines.append(f"Result grid rows: {len(self.result_tree.get_children()):,}  "
+                         f"Tables tree items: {count_items(self.tables_tree):,}")
+            lines.append(f"Query history entries: {self.history.count():,} (stored in {self.history.path})")
+            lines.append(f"Tk widgets: {count_widgets(self.root):,}")
+            usage_text.configure(state='normal')
+            usage_text.delete("1.0", tk.END)
+            usage_text.insert(tk.END, "\n".join(lines))
+            usage_text.configure(state='disabled')
+
+            ingest_tree.delete(*ingest_tree.get_children())
+            report = self.ingest_memory_report
+            if report is None:
+                ingest_label.config(text="No traced load yet: tick the box below, then load a folder.")
+                return
+            ingest_label.config(text=f"Peak traced memory during load: {self._format_bytes(report['peak'])}, "
+                                     f"retained after load: {self._format_bytes(report['current'])}")
+            for location, size_diff, count_diff, size in report["top"]:
+                ingest_tree.insert("", "end", values=(location, self._format_bytes(size_diff),
+                                                      f"{count_diff:+,}", self._format_bytes(size)))
+
+        tk.Button(memory_window, text="🔄 Refresh", command=refresh,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED, font=('Helvetica', 10, 'bold')).pack(pady=(0, 10))
+
+        refresh()
 
     def _handle_query_results(self, result_df, query_index, total_queries):
         """Process and display query results"""
-        if hasattr(self, 'spooling_active') and self.spooling_active:
-            result_df.to_csv(
-                self.spool_file,
-                mode='a',
-                index=False,
-                header=(query_index == 0)  # Only write headers for first query
-            )
+        self.spool_results(result_df, query_index)
 
         # For single query, show immediately
         # For multiple queries, show last query's results but keep all in current_results
@@ -767,6 +1176,29 @@ class ExcelSQLApp:
             self.current_results = result_df
             self.show_results(result_df)
 
+            note = self._result_source_note(result_df)
+            if note:
+                self.result_status_var.set(f"Showing {len(result_df):,} rows{note}")
+
+            spill = result_df.attrs.get("spill")
+            if spill is not None:
+                self.result_status_var.set(
+                    f"Showing first {len(result_df):,} of {spill.row_count:,} rows "
+                    f"(result exceeded memory budget; full result kept on disk for export and spooling)")
+
+    def _result_source_note(self, result_df):
+        """Status line suffix for results not read directly from the loaded sheets"""
+        summary = result_df.attrs.get("summary_rewrite")
+        if summary is not None:
+            return f" (answered from summary table {summary})"
+        approximate = result_df.attrs.get("approximate")
+        if approximate is not None:
+            sheet = next((dot for dot, sql in self.table_mapping.items() if sql == approximate["table"]),
+                         approximate["table"])
+            return (f" (≈ approximate: {approximate['fraction']:.1%} {approximate['sample']} sample of {sheet}; "
+                    f"± columns are 95% confidence bounds)")
+        return ""
+
     def _execute_core_query(self, query_text_to_execute):  # Renamed to be an internal helper
         """Core logic for executing a SQL query and displaying results."""
         query = query_text_to_execute.strip()
@@ -793,23 +1225,23 @@ class ExcelSQLApp:
             if "LIMIT" not in query.upper():
                 limited_query += " -- Original query automatically limited"
 
-            result_df = pd.read_sql_query(limited_query, self.conn)
+            result_df = self.read_result(limited_query)
+            self.advise_indexes(processed_query)
 
             self.current_results = result_df
 
-            # Only add to history if it's not a sample data query (which adds itself)
-            # and if it's not already the last query in history (to avoid duplicates from re-execution)
-            if not query.startswith("-- Sample data from") and (
-                    not self.query_history or self.query_history[-1] != query):
-                self.query_history.append(query)
+            # Sample data queries record themselves; re-running a query only updates its entry
+            if not query.startswith("-- Sample data from"):
+                self.record_history(query, result_df)
 
             self.show_results(result_df)
 
             row_count = len(result_df.index)
             limited_note = " (limited)" if "LIMIT" not in query.upper() else ""
+            limited_note += self._result_source_note(result_df)
             self.result_status_var.set(f"Showing {row_count:,} rows{limited_note}")
 
-        except pd.io.sql.DatabaseError as e:
+        except DatabaseError as e:
             self.handle_sql_error(str(e))
             self.current_results = None
         except Exception as e:
@@ -817,71 +1249,6 @@ class ExcelSQLApp:
             self.result_status_var.set("Query failed")
             self.current_results = None
 
-    def process_query(self, query):
-        """
-        Converts file.sheet notation to SQL table names (e.g., "file_sheet")
-        while preserving aliases and not misinterpreting alias.column_name.
-        """
-        processed_query = query
-
-        # Sort table mappings by the length of the dot_name in descending order.
-        # This ensures that if "file.sheet_a" and "file.sheet_a_b" exist,
-        # "file.sheet_a_b" is replaced first, preventing partial replacements.
-        sorted_table_mappings = sorted(self.table_mapping.items(), key=lambda item: len(item[0]), reverse=True)
-
-        # Iterate through the sorted table mappings and perform replacements.
-        # The key is to use a regex that specifically targets the table name
-        # and avoids matching alias.column_name patterns.
-        for dot_name, sql_name in sorted_table_mappings:
-            # Construct a regex pattern for the current dot_name.
-            # re.escape() handles special characters in dot_name (like the dot itself).
-            #
-            # IMPORTANT CHANGE HERE:
-            # The original pattern `\b` + re.escape(dot_name) + `\b(?!\.\w+)` was too restrictive.
-            # The final `\b` (word boundary) would fail if dot_name ended with a non-word char (like comma).
-            #
-            # New pattern:
-            # `\b` at the start ensures we match a whole word.
-            # `re.escape(dot_name)` matches the literal dot_name.
-            # `(?=\W|$)` is a positive lookahead that asserts the match is followed by
-            # a non-word character (`\W`) OR the end of the string (`$`).
-            # This allows dot_names ending in punctuation to be matched correctly.
-            # `(?!\.\w+)` is still needed to prevent matching `alias.column_name` where `alias` is a dot_name.
-            pattern = r'\b' + re.escape(dot_name) + r'(?=\W|$)(?!\.\w+)'
-
-            # Replace the found 'dot_name' with the quoted SQL table name.
-            # re.IGNORECASE ensures case-insensitive matching for the dot_name.
-            processed_query = re.sub(pattern, f'"{sql_name}"', processed_query, flags=re.IGNORECASE)
-
-        return processed_query
-
-    def validate_query(self, query):
-        """Basic query validation to prevent harmful operations, ignoring comments"""
-        # Remove single-line comments
-        clean_query = re.sub(r'--.*?$', '', query, flags=re.MULTILINE)
-        # Remove multi-line comments
-        clean_query = re.sub(r'/\*.*?\*/', '', clean_query, flags=re.DOTALL)
-
-        # Check for blocked keywords in the cleaned query
-        blocked_keywords = [
-            "DROP ", "DELETE ", "UPDATE ", "INSERT ", "ALTER ",
-            "CREATE ", "VACUUM ", "ATTACH ", "DETACH ", "PRAGMA ",
-            "TRANSACTION ", "ROLLBACK", "COMMIT", "REINDEX"
-        ]
-
-        # Convert the cleaned query to uppercase for case-insensitive comparison
-        clean_query_upper = clean_query.upper()
-
-        # Check if any blocked keyword is present in the cleaned query
-        if any(kw in clean_query_upper for kw in blocked_keywords):
-            raise DatabaseError("Modification queries are not allowed")
-
-        # Check for multiple statements by looking for more than one semicolon
-        # after stripping comments and leading/trailing whitespace
-        no_comments = clean_query.strip()
-        if no_comments.count(';') > 1 or (no_comments.count(';') == 1 and not no_comments.endswith(';')):
-            raise DatabaseError("Multiple statements not allowed")
-
     def export_to_excel(self):
         """Export current results to Excel file"""
         if not hasattr(self, 'current_results') or self.current_results.empty:
@@ -896,14 +1263,48 @@ class ExcelSQLApp:
             )
 
             if filename:
-                self.current_results.to_excel(filename, index=False)
-                self.status_var.set(f"Exported {len(self.current_results)} rows to {filename}")
+                spill = self.current_results.attrs.get("spill")
+                row_count = len(self.current_results) if spill is None else spill.row_count
+                if row_count <= self.excel_sheet_rows:
+                    sheet_count = 1
+                else:
+                    sheet_count = -(-row_count // self.excel_sheet_rows)
+                    if not messagebox.askyesno(
+                            "Export Rows",
+                            f"The result has {row_count:,} rows, more than the {self.excel_sheet_rows:,} "
+                            f"an Excel sheet can hold.\n\nExport it across {sheet_count} sheets?"):
+                        return
+                if spill is None and sheet_count == 1:
+                    self.current_results.to_excel(filename, index=False)
+                else:
+                    # Write the result chunk by chunk (a spilled result is never materialized),
+                    # starting a new sheet whenever the current one is full
+                    chunks = spill.iter_chunks(self.result_chunk_rows) if spill is not None \
+                        else dataframe_chunks(self.current_results, self.result_chunk_rows)
+                    with pd.ExcelWriter(filename) as writer:
+                        self._write_excel_sheets(writer, chunks)
+                sheets = f" on {sheet_count} sheets" if sheet_count > 1 else ""
+                self.status_var.set(f"Exported {row_count} rows{sheets} to {filename}")
 
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export data:\n{str(e)}")
 
+    def _write_excel_sheets(self, writer, chunks):
+        """Write result chunks to Sheet1, Sheet2, ... with at most excel_sheet_rows rows each"""
+        sheet_number, sheet_rows = 1, 0
+        for chunk in chunks:
+            while len(chunk):
+                if sheet_rows == self.excel_sheet_rows:
+                    sheet_number, sheet_rows = sheet_number + 1, 0
+                part = chunk.iloc[:self.excel_sheet_rows - sheet_rows]
+                chunk = chunk.iloc[len(part):]
+                part.to_excel(writer, sheet_name=f"Sheet{sheet_number}", index=False, header=(sheet_rows == 0),
+                              startrow=sheet_rows + (1 if sheet_rows else 0))
+                sheet_rows += len(part)
+
     def show_results(self, df):
-        """Display pandas dataframe in the result tree"""
+        """Display pandas dataframe in the result tree, one page at a time"""
+        started = self.perf.start()
         self.clear_results()  # This will clear the treeview display and reset status, but not self.current_results
 
         if df.empty:
@@ -911,35 +1312,180 @@ class ExcelSQLApp:
             self.current_results = df  # Set current_results even if empty for consistency
             return
 
-        # Configure columns
+        # Configure columns; clicking a heading sorts by that column
         self.result_tree["columns"] = list(df.columns)
-        for col in df.columns:
-            self.result_tree.heading(col, text=col)
+        for position, col in enumerate(df.columns):
+            self.result_tree.heading(col, text=col, command=lambda p=position: self.sort_results(p))
             self.result_tree.column(col, width=100)
 
-        # Insert data with progress for large datasets
-        self.result_status_var.set(f"Loading {len(df):,} rows...")
-        self.root.update_idletasks()
-
-        step = max(1, len(df) // 50)  # Update progress every 2%
+        self.filter_column_combo["values"] = ["All columns"] + [str(c) for c in df.columns]
+        self.filter_column_var.set("All columns")
+        self.filter_var.set("")
 
-        for i, row in df.iterrows():
-            self.result_tree.insert("", "end", values=list(row))
-            if i % step == 0 or i == len(df) - 1:
-                self.result_status_var.set(f"Loading rows {i + 1}/{len(df)}")
-                self.root.update_idletasks()
+        self._reset_result_view(df)
+        self.render_result_page()
 
         # Auto-resize columns
         self.auto_resize_columns(df)
         self.result_status_var.set(f"Showing {len(df):,} rows")  # Final status update
+        self.perf.stop("show_results", started, rows=len(df))
+
+    def _reset_result_view(self, df):
+        """Start a fresh sort/filter view over a new result"""
+        self._result_view_df = df
+        self._view_positions = np.arange(len(df.index))
+        self._sort_state = None  # (column position, ascending)
+        self._sort_cache = {}  # (column position, ascending) -> row permutation
+        self._filter_mask = None
+        self._column_text_cache = {}  # column position -> lowercase strings used for filtering
+        self.result_page = 0
+
+    def _column_text(self, position):
+        """Lowercase string form of a result column, built once per result"""
+        text = self._column_text_cache.get(position)
+        if text is None:
+            column = self._result_view_df.iloc[:, position].reset_index(drop=True)
+            text = column.astype(str).str.lower()
+            self._column_text_cache[position] = text
+        return text
+
+    def sort_results(self, position):
+        """Sort the displayed result by a column in memory; clicking again reverses the order"""
+        df = self._result_view_df
+        if df is None or df.empty:
+            return
+
+        start = time.perf_counter()
+        ascending = self._sort_state != (position, True)
+        key = (position, ascending)
+        permutation = self._sort_cache.get(key)
+        if permutation is None:
+            column = df.iloc[:, position].reset_index(drop=True)
+            try:
+                ordered = column.sort_values(ascending=ascending, kind='mergesort', na_position='last')
+            except TypeError:  # Mixed values (e.g. text kept in a numeric column): order as text
+                ordered = self._column_text(position).sort_values(ascending=ascending, kind='mergesort')
+            permutation = ordered.index.to_numpy()
+            self._sort_cache[key] = permutation
+        self._sort_state = key
+
+        for i, col in enumerate(df.columns):
+            arrow = (" ▲" if ascending else " ▼") if i == position else ""
+            self.result_tree.heading(col, text=f"{col}{arrow}")
+
+        self._apply_result_view()
+        self.result_status_var.set(f"Sorted {len(df):,} rows by {df.columns[position]} "
+                                   f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _schedule_result_filter(self, event=None):
+        """Apply the quick filter shortly after typing stops"""
+        if self._filter_after_id:
+            self.root.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.root.after(250, self.apply_result_filter)
+
+    def apply_result_filter(self, event=None):
+        """Keep rows whose chosen column (or any column) contains the quick-filter text"""
+        self._filter_after_id = None
+        df = self._result_view_df
+        if df is None or df.empty:
+            return
+
+        start = time.perf_counter()
+        text = self.filter_var.get().strip().lower()
+        if not text:
+            self._filter_mask = None
+        else:
+            column = self.filter_column_var.get()
+            names = [str(c) for c in df.columns]
+            positions = [names.index(column)] if column in names else range(len(names))
+            mask = np.zeros(len(df.index), dtype=bool)
+            for position in positions:
+                mask |= self._column_text(position).str.contains(text, regex=False).to_numpy()
+            self._filter_mask = mask
+
+        self._apply_result_view()
+        shown = len(self._view_positions)
+        self.result_status_var.set(f"Filter matched {shown:,} of {len(df):,} rows "
+                                   f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def clear_result_filter(self):
+        self.filter_var.set("")
+        self.apply_result_filter()
+
+    def _apply_result_view(self):
+        """Combine the cached sort permutation with the filter mask and show the first page"""
+        positions = self._sort_cache[self._sort_state] if self._sort_state else np.arange(len(self._result_view_df.index))
+        if self._filter_mask is not None:
+            positions = positions[self._filter_mask[positions]]
+        self._view_positions = positions
+        self.result_page = 0
+        self.render_result_page()
+
+    def change_result_page(self, step):
+        last_page = max(0, (len(self._view_positions) - 1) // self.result_page_size)
+        new_page = min(max(0, self.result_page + step), last_page)
+        if new_page != self.result_page:
+            self.result_page = new_page
+            self.render_result_page()
+
+    def render_result_page(self):
+        """Insert only the rows of the current page into the result tree"""
+        self.result_tree.delete(*self.result_tree.get_children())
+        total = len(self._view_positions)
+        start = self.result_page * self.result_page_size
+        positions = self._view_positions[start:start + self.result_page_size]
+
+        page = self._result_view_df.iloc[positions]
+        for row in page.itertuples(index=False, name=None):
+            self.result_tree.insert("", "end", values=row)
+
+        if total:
+            label = f"Rows {start + 1:,}-{start + len(positions):,} of {total:,}"
+        else:
+            label = "No matching rows"
+        if self._filter_mask is not None:
+            label += f" (filtered from {len(self._result_view_df):,})"
+        self.page_label_var.set(label)
 
     def auto_resize_columns(self, df):
-        """Automatically resize columns based on content"""
-        for col in df.columns:
-            max_len = max(df[col].astype(str).apply(len).max(), len(col))
-            width = min(300, max(50, max_len * 8))
+        """
+        Automatically resize columns based on content. Widths come from a bounded sample
+        (head, tail and a random subset) using vectorized string lengths; only the longest
+        few values per column are measured with the real font, and widths are cached per result.
+        """
+        # The cache holds the frame itself: an id() could be reused by a later result
+        if self._column_width_cache and self._column_width_cache[0] is df:
+            widths = self._column_width_cache[1]
+        else:
+            widths = self._measure_column_widths(df)
+            self._column_width_cache = (df, widths)
+
+        for col, width in zip(df.columns, widths):
             self.result_tree.column(col, width=width)
 
+    def _measure_column_widths(self, df):
+        """Return a pixel width per column, measured on a sample of the rows"""
+        if len(df.index) <= self.column_sample_rows:
+            sample = df
+        else:
+            edge = self.column_sample_rows // 4
+            middle = df.iloc[edge:-edge].sample(n=self.column_sample_rows - 2 * edge, random_state=0)
+            sample = pd.concat([df.iloc[:edge], middle, df.iloc[-edge:]])
+
+        cell_font = tkfont.Font(family='Helvetica', size=9)
+        heading_font = tkfont.Font(family='Helvetica', size=9, weight='bold')
+        padding = 16  # Cell padding plus room for the separator
+
+        widths = []
+        for position, col in enumerate(df.columns):
+            values = sample.iloc[:, position].astype(str)
+            lengths = values.str.len()
+            # Proportional fonts make the longest string a good but imperfect guess; measure a few
+            candidates = values[lengths.nlargest(self.column_width_candidates).index.unique()]
+            max_px = max([cell_font.measure(v) for v in candidates] + [heading_font.measure(str(col))])
+            widths.append(min(300, max(50, max_px + padding)))
+        return widths
+
     def show_tables_info(self):
         """Show metadata about all tables"""
         if not self.conn:
@@ -947,17 +1493,10 @@ class ExcelSQLApp:
             return
 
         try:
-            # Query to get table info from sqlite_master and pragma_table_info
-            # Note: pragma_table_info needs to be executed for each table, so we collect it
-            # and then build a DataFrame.
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-            table_names = [row[0] for row in cursor.fetchall()]
-
+            # Only what users can query: loaded sheets, partitioned views and summary tables.
+            # The engine's own tables (text indexes, samples) are not in table_mapping.
             tables_info = []
-            for sql_name in table_names:
-                # Find the original dot_name from table_mapping
-                original_name = next((k for k, v in self.table_mapping.items() if v == sql_name), sql_name)
+            for original_name, sql_name in sorted(self.table_mapping.items()):
 
                 # Get column info
                 col_cursor = self.conn.cursor()
@@ -1077,6 +1616,317 @@ class ExcelSQLApp:
         except Exception as e:
             self.show_error("Error", f"Failed to retrieve column info:\n{str(e)}")
 
+    def reload_selected_workbook(self):
+        """Re-read the selected workbook from disk, refreshing summary tables built on it"""
+        selected = self.tables_tree.focus()
+        if not self.conn or not selected:
+            return
+        node = self.tables_tree.parent(selected) or selected
+        file_base = self.tables_tree.item(node)['text']
+        try:
+            filename = next((f for f in os.listdir(self.file_path)
+                             if f.lower().endswith(('.xlsx', '.xls')) and os.path.splitext(f)[0] == file_base), None)
+        except OSError:
+            filename = None
+        if filename is None:
+            messagebox.showwarning("Reload Workbook", f"'{file_base}' is not a workbook in the loaded folder.")
+            return
+
+        self.status_var.set(f"Reloading {filename}...")
+        self.root.update_idletasks()
+        start = time.perf_counter()
+        collected_warnings = self.reload_excel_file(filename)
+        self.populate_tables_tree()
+        self._update_warning_display(collected_warnings)
+        self.status_var.set(f"Reloaded {filename} in {time.perf_counter() - start:.1f}s")
+
+    def show_summary_tables(self):
+        """Manage summary tables: materialized aggregates queried as summary.<name>"""
+        if not self.conn:
+            messagebox.showwarning("No Database", "Please load Excel files first.")
+            return
+
+        summary_window = tk.Toplevel(self.root)
+        summary_window.title("Summary Tables")
+        summary_window.geometry("900x400")
+        summary_window.configure(bg=self.bg_color)
+        summary_window.transient(self.root)
+
+        tree_frame = tk.Frame(summary_window, bg=self.frame_bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        headings = (("Name", 150), ("Rows", 70), ("Sources", 200), ("Refreshed", 140), ("Query", 350))
+        summary_tree = ttk.Treeview(tree_frame, show="headings", selectmode="browse")
+        summary_tree["columns"] = [heading for heading, _ in headings]
+        for heading, width in headings:
+            summary_tree.heading(heading, text=heading)
+            summary_tree.column(heading, width=width, anchor="w")
+        scroll_y = ttk.Scrollbar(tree_frame, orient="vertical", command=summary_tree.yview)
+        summary_tree.configure(yscrollcommand=scroll_y.set)
+        summary_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
+
+        def refresh():
+            sql_to_dot = {v: k for k, v in self.table_mapping.items()}
+            summary_tree.delete(*summary_tree.get_children())
+            for name, definition in sorted(self.summary_tables.items()):
+                sources = ", ".join(sql_to_dot.get(source, source) for source in definition["sources"])
+                summary_tree.insert("", "end", iid=name, values=(
+                    f"{self.summary_file}.{name}", f"{definition.get('rows', 0):,}", sources,
+                    definition.get("refreshed", "").replace("T", " "), " ".join(definition["query"].split())))
+
+        def create_from_editor():
+            query = self._get_query_to_execute()
+            if not query:
+                messagebox.showwarning("Input Error", "Write the aggregate query in the editor first.",
+                                       parent=summary_window)
+                return
+            name = simpledialog.askstring("Summary Table", "Name (queried as summary.<name>):",
+                                          parent=summary_window)
+            if not name:
+                return
+            start = time.perf_counter()
+            try:
+                definition = self.define_summary_table(name.strip(), query)
+            except Exception as e:
+                messagebox.showerror("Summary Table Error", f"Could not create summary table:\n{str(e)}",
+                                     parent=summary_window)
+                return
+            self.populate_tables_tree()
+            refresh()
+            self.status_var.set(f"Built {self.summary_file}.{name.strip()} ({definition['rows']:,} rows) "
+                                f"in {time.perf_counter() - start:.1f}s")
+
+        def rebuild_selected():
+            for name in summary_tree.selection():
+                collected_warnings = []
+                self.refresh_summary_tables(self.summary_tables[name]["sources"], collected_warnings)
+                if collected_warnings:
+                    self._update_warning_display(collected_warnings)
+            self.populate_tables_tree()
+            refresh()
+
+        def drop_selected():
+            for name in summary_tree.selection():
+                if messagebox.askyesno("Drop Summary Table", f"Drop {self.summary_file}.{name}?",
+                                       parent=summary_window):
+                    self.drop_summary_table(name)
+            self.populate_tables_tree()
+            refresh()
+
+        rewrite_var = tk.BooleanVar(value=self.summary_rewrite_enabled)
+
+        def toggle_rewrite():
+            self.summary_rewrite_enabled = rewrite_var.get()
+
+        tk.Checkbutton(summary_window, text="Answer matching aggregate queries from summary tables",
+                       variable=rewrite_var, command=toggle_rewrite,
+                       bg=self.bg_color, fg=self.text_color).pack(pady=(0, 5))
+
+        btn_frame = tk.Frame(summary_window, bg=self.bg_color)
+        btn_frame.pack(pady=(0, 10))
+        for text, cmd in (("➕ New from Query Editor", create_from_editor), ("🔄 Rebuild", rebuild_selected),
+                          ("🗑 Drop", drop_selected)):
+            tk.Button(btn_frame, text=text, command=cmd,
+                      bg=self.button_bg_color, fg=self.button_fg_color,
+                      activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                      relief=tk.RAISED, font=('Helvetica', 10, 'bold')).pack(side=tk.LEFT, padx=2)
+
+        refresh()
+
+    def show_text_index_dialog(self):
+        """Choose the columns of the selected sheet to cover with a full-text (FTS5) index"""
+        selected = self.tables_tree.focus()
+        item = self.tables_tree.item(selected) if selected else {}
+        if not self.conn or not item.get('values') or item['values'][0] != "Sheet":
+            messagebox.showwarning("Invalid Selection", "Please select a specific sheet (table) to index.")
+            return
+        dot_name = f"{self.tables_tree.item(self.tables_tree.parent(selected))['text']}.{item['text']}"
+        sql_name = self.table_mapping.get(dot_name)
+        if sql_name is None or sql_name in self.partition_views:
+            messagebox.showerror("Error", "Only loaded sheets can be text indexed.")
+            return
+
+        schema = self.inferred_schema.get(sql_name, {})
+        text_columns = [c for c in self._table_columns(sql_name).values() if schema.get(c, "TEXT") == "TEXT"]
+        chosen = set(self.text_indexes.get(sql_name) or self.detect_text_columns(sql_name))
+
+        index_window = tk.Toplevel(self.root)
+        index_window.title(f"Text Index: {dot_name}")
+        index_window.configure(bg=self.bg_color)
+        index_window.transient(self.root)
+
+        tk.Label(index_window, text="Columns to index (free-text columns are preselected):",
+                 bg=self.bg_color, fg=self.text_color).pack(anchor="w", padx=10, pady=(10, 5))
+        column_vars = {}
+        for column in text_columns:
+            column_vars[column] = tk.BooleanVar(value=column in chosen)
+            tk.Checkbutton(index_window, text=column, variable=column_vars[column],
+                           bg=self.bg_color, fg=self.text_color).pack(anchor="w", padx=20)
+        tk.Label(index_window, text=f"Search with:  WHERE {dot_name} MATCH 'words'\n"
+                                    f"or one column:  WHERE {dot_name}.<column> MATCH 'words'",
+                 bg=self.bg_color, fg="grey", justify=tk.LEFT).pack(anchor="w", padx=10, pady=5)
+
+        def build():
+            columns = [column for column, var in column_vars.items() if var.get()]
+            if not columns:
+                messagebox.showwarning("Text Index", "Select at least one column.", parent=index_window)
+                return
+            start = time.perf_counter()
+            try:
+                self.create_text_index(sql_name, columns)
+            except (sqlite3.Error, ValueError) as e:
+                messagebox.showerror("Text Index Error", f"Could not build the index:\n{str(e)}",
+                                     parent=index_window)
+                return
+            index_window.destroy()
+            self.status_var.set(f"Indexed {', '.join(columns)} of {dot_name} in {time.perf_counter() - start:.1f}s; "
+                                f"search with {dot_name} MATCH '...'")
+
+        def remove():
+            self.drop_text_index(sql_name)
+            index_window.destroy()
+            self.status_var.set(f"Removed the text index of {dot_name}")
+
+        btn_frame = tk.Frame(index_window, bg=self.bg_color)
+        btn_frame.pack(pady=10)
+        buttons = [("🔎 Build Index", build)]
+        if sql_name in self.text_indexes:
+            buttons.append(("🗑 Remove Index", remove))
+        for text, cmd in buttons:
+            tk.Button(btn_frame, text=text, command=cmd,
+                      bg=self.button_bg_color, fg=self.button_fg_color,
+                      activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                      relief=tk.RAISED, font=('Helvetica', 10, 'bold')).pack(side=tk.LEFT, padx=2)
+
+    def profile_selected_table(self):
+        """Profile every column of the selected sheet in the background"""
+        if not self.conn:
+            messagebox.showwarning("No Database", "Please load Excel files first.")
+            return
+
+        selected = self.tables_tree.focus()
+        item = self.tables_tree.item(selected) if selected else {}
+        if not item.get('values') or item['values'][0] != "Sheet":
+            messagebox.showwarning("Invalid Selection", "Please select a specific sheet (table) to profile.")
+            return
+
+        file_name = self.tables_tree.item(self.tables_tree.parent(selected))['text']
+        dot_name = f"{file_name}.{item['text']}"
+        sql_name = self.table_mapping.get(dot_name)
+        if sql_name is None:
+            messagebox.showerror("Error", "Table mapping not found for selected item.")
+            return
+
+        if sql_name in self.stats_catalog:
+            self.show_column_profile_window(dot_name, self.stats_catalog[sql_name], cached=True)
+            return
+
+        db_uri = self.worker_database_uri()  # Must be resolved on the thread that owns self.conn
+
+        def job(progress):
+            conn = self.connect_worker(db_uri)
+            try:
+                return self.profile_table(sql_name, conn, progress)
+            finally:
+                conn.close()
+
+        self._run_column_profile(dot_name, job)
+
+    def profile_current_results(self):
+        """Profile every column of the current result set in the background"""
+        if self.current_results is None or self.current_results.empty:
+            messagebox.showwarning("No Data", "No results to profile.")
+            return
+
+        result_df = self.current_results
+        spill = result_df.attrs.get("spill")
+
+        def job(progress):
+            total = spill.row_count if spill is not None else len(result_df.index)
+            chunks = spill.iter_chunks(self.result_chunk_rows) if spill is not None \
+                else dataframe_chunks(result_df, self.result_chunk_rows)
+            return profile_chunks(chunks, list(result_df.columns), lambda done: progress(done, total))
+
+        self._run_column_profile("Query Results", job)
+
+    def _run_column_profile(self, title, job):
+        """Run job(progress) on a worker thread, polling from the Tk loop until it finishes"""
+        state = {"done": 0, "total": 0, "result": None, "error": None, "finished": False}
+
+        def progress(done, total):
+            state["done"], state["total"] = done, total
+
+        def run():
+            try:
+                state["result"] = job(progress)
+            except Exception as e:
+                state["error"] = e
+            state["finished"] = True
+
+        def poll():
+            if not state["finished"]:
+                if state["total"]:
+                    self.status_var.set(f"Profiling {title}: {state['done']:,} of {state['total']:,} rows...")
+                self.root.after(100, poll)
+                return
+            if state["error"] is not None:
+                self.show_error("Profile Error", f"Failed to profile columns:\n{str(state['error'])}")
+                self.status_var.set("Error profiling columns")
+                return
+            self.status_var.set(f"Profiled {title} in {time.perf_counter() - start:.1f}s")
+            self.show_column_profile_window(title, state["result"])
+
+        start = time.perf_counter()
+        self.status_var.set(f"Profiling {title}...")
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(100, poll)
+
+    def show_column_profile_window(self, title, summaries, cached=False):
+        """Display per-column statistics produced by esd_profile"""
+        profile_window = tk.Toplevel(self.root)
+        profile_window.title(f"Column Profile - {title}" + (" (cached)" if cached else ""))
+        profile_window.geometry("1000x450")
+        profile_window.configure(bg=self.bg_color)
+        profile_window.transient(self.root)
+
+        tree_frame = tk.Frame(profile_window, bg=self.frame_bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        headings = (("Column", 150), ("Type", 70), ("Rows", 80), ("Nulls", 70), ("Distinct", 80),
+                    ("Min", 110), ("Max", 110), ("Top Values", 220), ("Histogram", 140))
+        stats_tree = ttk.Treeview(tree_frame, show="headings")
+        stats_tree["columns"] = [heading for heading, _ in headings]
+        for heading, width in headings:
+            stats_tree.heading(heading, text=heading)
+            stats_tree.column(heading, width=width, anchor="w")
+
+        scroll_y = ttk.Scrollbar(tree_frame, orient="vertical", command=stats_tree.yview)
+        scroll_x = ttk.Scrollbar(tree_frame, orient="horizontal", command=stats_tree.xview)
+        stats_tree.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        stats_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
+        scroll_x.grid(row=1, column=0, sticky="we")
+
+        def fmt(value):
+            if value is None:
+                return ""
+            if isinstance(value, float):
+                return f"{value:,.4g}"
+            return str(value)[:40]
+
+        for summary in summaries:
+            distinct = f"{summary['distinct']:,}" if summary["distinct_exact"] else f"≈{summary['distinct']:,}"
+            top_values = ", ".join(f"{fmt(value)} ({count:,})" for value, count in summary["top_values"])
+            stats_tree.insert("", "end", values=(
+                summary["column"], summary.get("type", ""), f"{summary['rows']:,}",
+                f"{summary['null_ratio']:.1%}", distinct, fmt(summary["min"]), fmt(summary["max"]),
+                top_values, sparkline(summary["histogram"])))
+
     def copy_columns_to_clipboard(self, treeview):
         """Copies all column names from the given treeview to the clipboard."""
         column_names = []
@@ -1143,10 +1993,10 @@ class ExcelSQLApp:
         query = f'SELECT * FROM "{sql_name}" LIMIT {self.max_sample_rows}'
 
         try:
-            result_df = pd.read_sql_query(query, self.conn)
+            result_df = self.read_result(query)
             self.current_results = result_df  # Set current_results for export
             self.query_executed = query  # Store the query for full export
-            self.query_history.append(f"-- Sample data from {dot_name}\n{query}")
+            self.record_history(f"-- Sample data from {dot_name}\n{query}", result_df)
 
             self.show_results(result_df)  # Display results in the treeview
 
@@ -1181,66 +2031,176 @@ class ExcelSQLApp:
 
         for file, sheets in sorted(files.items()):
             file_rows = sum(row_count for _, _, row_count in sheets)
+            file_type = "Summary" if file == self.summary_file and self.summary_tables else "Excel"
             file_node = self.tables_tree.insert("", "end", text=file,
-                                                values=("Excel", f"{file_rows:,}"))
+                                                values=(file_type, f"{file_rows:,}"))
             self.tables_tree.item(file_node, open=True)  # Keep parent open if it has matching children
 
             for sheet, sql_name, row_count in sorted(sheets):
                 self.tables_tree.insert(file_node, "end", text=sheet,
                                         values=("Sheet", f"{row_count:,}"))
 
+    def record_history(self, query, result_df=None, error=None):
+        """Store an executed statement in the persistent history; history problems never block a query"""
+        rows = duration = None
+        if result_df is not None:
+            spill = result_df.attrs.get("spill")
+            rows = spill.row_count if spill is not None else len(result_df.index)
+            duration = result_df.attrs.get("elapsed_seconds")
+        try:
+            self.history.record(query, duration, rows, str(error) if error else None, self.file_path or None)
+        except (sqlite3.Error, OSError) as e:
+            self.status_var.set(f"Could not save query history: {e}")
+
     def show_query_history(self):
-        """Display previously executed queries"""
-        if not self.query_history:
-            messagebox.showinfo("History", "No queries in history yet")
+        """Search and page through the persistent query history, and load an entry into the editor"""
+        try:
+            if not self.history.count():
+                messagebox.showinfo("History", "No queries in history yet")
+                return
+        except (sqlite3.Error, OSError) as e:
+            messagebox.showerror("History Error", f"Cannot open query history:\n{str(e)}")
             return
 
         history_window = tk.Toplevel(self.root)
         history_window.title("Query History")
-        history_window.geometry("800x600")
+        history_window.geometry("900x600")
         history_window.configure(bg=self.bg_color)
         history_window.transient(self.root)  # Make it appear on top of the main window
         history_window.grab_set()  # Make it modal
 
-        text = tk.Text(history_window, wrap=tk.WORD,
-                       bg=self.entry_bg_color, fg=self.entry_fg_color,
-                       font=('Consolas', 10))
-        scroll = ttk.Scrollbar(history_window, command=text.yview)
-        text.configure(yscrollcommand=scroll.set)
+        search_frame = tk.Frame(history_window, bg=self.bg_color)
+        search_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        tk.Label(search_frame, text="Search:", bg=self.bg_color, fg=self.text_color).pack(side=tk.LEFT)
+        search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=search_var, width=50,
+                                bg=self.entry_bg_color, fg=self.entry_fg_color,
+                                insertbackground=self.entry_fg_color)
+        search_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        search_entry.focus_set()
 
-        scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        tree_frame = tk.Frame(history_window, bg=self.frame_bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
 
-        # Display history in reverse chronological order
-        for i, q in enumerate(reversed(self.query_history)):
-            text.insert(tk.END, f"--- Query {len(self.query_history) - i} ---\n")
-            text.insert(tk.END, q)
-            text.insert(tk.END, "\n\n")
+        headings = (("Last Run", 140), ("Runs", 50), ("Duration ms", 90), ("Rows", 80), ("Query", 500))
+        history_tree = ttk.Treeview(tree_frame, show="headings", selectmode="browse")
+        history_tree["columns"] = [heading for heading, _ in headings]
+        for heading, width in headings:
+            history_tree.heading(heading, text=heading)
+            history_tree.column(heading, width=width, anchor="w")
+        scroll_y = ttk.Scrollbar(tree_frame, orient="vertical", command=history_tree.yview)
+        history_tree.configure(yscrollcommand=scroll_y.set)
+        history_tree.grid(row=0, column=0, sticky="nsew")
+        scroll_y.grid(row=0, column=1, sticky="ns")
 
-        text.configure(state='disabled')
+        page_frame = tk.Frame(history_window, bg=self.bg_color)
+        page_frame.pack(fill=tk.X, padx=10)
+        page_label_var = tk.StringVar()
 
-        def load_query():
+        preview = tk.Text(history_window, height=8, wrap=tk.WORD, state='disabled',
+                          bg=self.entry_bg_color, fg=self.entry_fg_color, font=('Consolas', 10))
+        preview.pack(fill=tk.X, padx=10, pady=5)
+
+        state = {"page": 0, "total": 0, "after_id": None}
+        entries = {}  # Tree item -> history entry
+
+        def refresh(reset_page=False):
+            state["after_id"] = None
+            if reset_page:
+                state["page"] = 0
+            text = search_var.get().strip()
             try:
-                # Get selected text, remove history header
-                selected_text = text.get(tk.SEL_FIRST, tk.SEL_LAST)
-                # Remove the "--- Query X ---" line if present
-                lines = selected_text.splitlines()
-                if lines and lines[0].startswith("--- Query"):
-                    selected_text = "\n".join(lines[1:])
-
-                self.query_text.delete("1.0", tk.END)
-                self.query_text.insert("1.0", selected_text.strip())
-                history_window.destroy()
-            except tk.TclError:  # No text selected
-                messagebox.showwarning("Selection Error", "Please select a query to load.")
-
-        # This button and wait_window must be inside the method, after history_window is defined.
-        load_btn = tk.Button(history_window, text="Load Selected Query", command=load_query,
-                             bg=self.button_bg_color, fg=self.button_fg_color,
-                             activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
-                             relief=tk.RAISED, font=('Helvetica', 10, 'bold'))
-        load_btn.pack(pady=5)
+                state["total"] = self.history.count(text)
+                page_entries = self.history.search(text, state["page"] * self.history_page_size,
+                                                   self.history_page_size)
+            except (sqlite3.Error, OSError) as e:
+                page_label_var.set(f"History unavailable: {e}")
+                return
 
+            history_tree.delete(*history_tree.get_children())
+            entries.clear()
+            for entry in page_entries:
+                summary = " ".join(entry["sql"].split())[:300]
+                if entry["last_error"]:
+                    summary = "⚠ " + summary
+                duration = entry["last_duration_ms"]
+                item_id = history_tree.insert("", "end", values=(
+                    (entry["last_run"] or "Imported").replace("T", " "), entry["run_count"],
+                    "" if duration is None else f"{duration:,.1f}",
+                    "" if entry["last_rows"] is None else f"{entry['last_rows']:,}", summary))
+                entries[item_id] = entry
+
+            pages = max(1, -(-state["total"] // self.history_page_size))
+            page_label_var.set(f"Page {state['page'] + 1:,} of {pages:,} ({state['total']:,} queries)")
+            show_preview()
+
+        def schedule_refresh(event=None):
+            if state["after_id"]:
+                history_window.after_cancel(state["after_id"])
+            state["after_id"] = history_window.after(250, lambda: refresh(reset_page=True))
+
+        def change_page(step):
+            last_page = max(0, (state["total"] - 1) // self.history_page_size)
+            new_page = min(max(0, state["page"] + step), last_page)
+            if new_page != state["page"]:
+                state["page"] = new_page
+                refresh()
+
+        def selected_entry():
+            selection = history_tree.selection()
+            return entries.get(selection[0]) if selection else None
+
+        def show_preview(event=None):
+            entry = selected_entry()
+            preview.configure(state='normal')
+            preview.delete("1.0", tk.END)
+            if entry:
+                preview.insert(tk.END, entry["sql"])
+                if entry["last_error"]:
+                    preview.insert(tk.END, f"\n\n-- Last run failed: {entry['last_error']}")
+            preview.configure(state='disabled')
+
+        def load_query(event=None):
+            entry = selected_entry()
+            if not entry:
+                messagebox.showwarning("Selection Error", "Please select a query to load.", parent=history_window)
+                return
+            self.query_text.delete("1.0", tk.END)
+            self.query_text.insert("1.0", entry["sql"])
+            history_window.destroy()
+
+        def delete_entry():
+            entry = selected_entry()
+            if entry:
+                self.history.delete(entry["id"])
+                refresh()
+
+        search_entry.bind("<KeyRelease>", schedule_refresh)
+        search_entry.bind("<Return>", lambda event: refresh(reset_page=True))
+        history_tree.bind("<<TreeviewSelect>>", show_preview)
+        history_tree.bind("<Double-1>", load_query)
+
+        tk.Button(page_frame, text="◀", command=lambda: change_page(-1), width=3,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED).pack(side=tk.LEFT, padx=2)
+        tk.Label(page_frame, textvariable=page_label_var, bg=self.bg_color, fg=self.text_color).pack(side=tk.LEFT, padx=5)
+        tk.Button(page_frame, text="▶", command=lambda: change_page(1), width=3,
+                  bg=self.button_bg_color, fg=self.button_fg_color,
+                  activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                  relief=tk.RAISED).pack(side=tk.LEFT, padx=2)
+
+        btn_frame = tk.Frame(history_window, bg=self.bg_color)
+        btn_frame.pack(pady=5)
+        for text, cmd in (("Load Selected Query", load_query), ("Delete Entry", delete_entry)):
+            tk.Button(btn_frame, text=text, command=cmd,
+                      bg=self.button_bg_color, fg=self.button_fg_color,
+                      activebackground=self.button_active_bg_color, activeforeground=self.button_fg_color,
+                      relief=tk.RAISED, font=('Helvetica', 10, 'bold')).pack(side=tk.LEFT, padx=2)
+
+        refresh()
         history_window.wait_window()  # Wait for the window to close
 
     def clear_query(self):
@@ -1253,6 +2213,9 @@ class ExcelSQLApp:
             self.result_tree.delete(item)
 
         self.result_tree["columns"] = []
+        self._result_view_df = None
+        self._view_positions = ()
+        self.page_label_var.set("")
         self.result_status_var.set("Results cleared")
         # IMPORTANT: Do NOT set self.current_results = None here.
         # It should only be set to None if a query fails or returns truly empty results.
@@ -1287,6 +2250,10 @@ class ExcelSQLApp:
                 else:
                     clean_error_msg += "\n\nNo similar table names found."
 
+        # MATCH on a sheet without a full-text index
+        elif "has no full-text index" in clean_error_msg:
+            clean_error_msg += "\n\nRight-click the sheet in the tables list and choose Text Index... to build one."
+
         # Specific handling for syntax errors (can be more detailed if needed)
         elif "syntax error" in clean_error_msg.lower():
             clean_error_msg += "\n\nPlease check your SQL syntax."
@@ -1295,34 +2262,6 @@ class ExcelSQLApp:
         self.result_status_var.set("Query failed")
         self.current_results = None  # Clear results on error
 
-
-    def suggest_table_name(self, wrong_name):
-        """Suggest similar table names based on loaded tables"""
-        all_tables = list(self.table_mapping.keys())
-
-        # Prioritize exact case-insensitive matches
-        suggestions = [t for t in all_tables if t.lower() == wrong_name.lower()]
-        if suggestions:
-            return "\n- " + "\n- ".join(sorted(suggestions))
-
-        # Then, partial case-insensitive matches
-        suggestions = [t for t in all_tables if wrong_name.lower() in t.lower()]
-        if suggestions:
-            return "\n- " + "\n- ".join(sorted(suggestions))
-
-        # Finally, fuzzy matching on parts of the name
-        wrong_parts = re.split(r'[._\s]', wrong_name.lower())
-        fuzzy_suggestions = set()
-        for table in all_tables:
-            table_parts = re.split(r'[._\s]', table.lower())
-            if any(part in table_parts for part in wrong_parts if len(part) > 2):  # Only consider parts > 2 chars
-                fuzzy_suggestions.add(table)
-
-        if fuzzy_suggestions:
-            return "\n- " + "\n- ".join(sorted(list(fuzzy_suggestions)))
-
-        return None  # No suggestions found
-
     def show_error(self, title, message):
         """Show formatted error message in a messagebox"""
         messagebox.showerror(title, message)
@@ -1331,25 +2270,11 @@ class ExcelSQLApp:
     def enable_spool(self, file_path):
         """Enable spooling to a file"""
         try:
-            self.spool_file = open(file_path, 'w', encoding='utf-8')
-            self.spooling_active = True
-            return True
+            return super().enable_spool(file_path)
         except Exception as e:
             messagebox.showerror("Spool Error", f"Cannot open file {file_path}:\n{str(e)}")
             return False
 
-    def disable_spool(self):
-        """Disable spooling"""
-        if hasattr(self, 'spool_file') and self.spool_file:
-            self.spool_file.close()
-        self.spooling_active = False
-
-    def write_to_spool(self, content):
-        """Write content to spool file if active"""
-        if getattr(self, 'spooling_active', False):
-            self.spool_file.write(content)
-            self.spool_file.flush()
-
     def _get_query_to_execute(self):
         """Get either selected text or full query text"""
         try:
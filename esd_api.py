@@ -0,0 +1,99 @@
+"""
+Importable API for Excel SQL Developer, for scripts and ETL pipelines (no tkinter needed).
+
+    from esd_api import Workspace
+
+    with Workspace.open("exports/2024") as ws:
+        for row in ws.query("SELECT id, amount FROM sales.jan WHERE amount > 100"):
+            ...
+        for chunk in ws.query_chunks("SELECT * FROM sales.jan", chunksize=50000):
+            chunk.to_parquet(...)
+
+Tables are named and sanitized exactly as in the app (file.sheet in queries), and
+queries go through the same rewriting and validation.
+"""
+import pandas as pd
+
+from esd_engine import ExcelSQLEngine
+
+
+class QueryResult:
+    """Lazy iterator over the rows of a query; rows are fetched from SQLite in batches"""
+
+    def __init__(self, cursor, fetch_size):
+        self._cursor = cursor
+        self._fetch_size = fetch_size
+        self.columns = [d[0] for d in cursor.description] if cursor.description else []
+
+    def __iter__(self):
+        try:
+            while True:
+                rows = self._cursor.fetchmany(self._fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            self.close()
+
+    def close(self):
+        self._cursor.close()
+
+
+class Workspace:
+    """A folder of workbooks loaded into SQLite. Use from the thread that opened it."""
+
+    def __init__(self, engine, warnings=None):
+        self.engine = engine
+        self.warnings = warnings or []  # (message, type) tuples collected while loading
+
+    @classmethod
+    def open(cls, folder, progress_callback=None, **options):
+        """
+        Load every workbook in a folder. Keyword options override engine settings,
+        e.g. Workspace.open(folder, type_inference_enabled=False).
+        """
+        engine = ExcelSQLEngine()
+        for name, value in options.items():
+            if not hasattr(engine, name):
+                raise TypeError(f"Unknown workspace option '{name}'")
+            setattr(engine, name, value)
+
+        excel_files, warnings = engine.load_folder(folder, progress_callback)
+        if not excel_files:
+            engine.conn.close()
+            raise FileNotFoundError(f"No Excel files found in {folder}")
+        return cls(engine, warnings)
+
+    @property
+    def tables(self):
+        """Mapping of file.sheet names to SQL table names"""
+        return dict(self.engine.table_mapping)
+
+    def _prepare(self, sql):
+        query = sql.strip().rstrip(';')
+        self.engine.validate_query(query)
+        return self.engine.process_query(query)
+
+    def query(self, sql, params=None, fetch_size=1000):
+        """Run a query and return a lazy QueryResult of row tuples"""
+        cursor = self.engine.conn.execute(self._prepare(sql), params or ())
+        return QueryResult(cursor, fetch_size)
+
+    def query_chunks(self, sql, chunksize=10000, params=None):
+        """Run a query and yield its results as DataFrames of at most chunksize rows"""
+        return pd.read_sql_query(self._prepare(sql), self.engine.conn, params=params, chunksize=chunksize)
+
+    def query_df(self, sql, params=None):
+        """Run a query and return the full result as one DataFrame"""
+        return pd.read_sql_query(self._prepare(sql), self.engine.conn, params=params)
+
+    def close(self):
+        if self.engine.conn:
+            self.engine.conn.close()
+            self.engine.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
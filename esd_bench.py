@@ -0,0 +1,323 @@
+"""
+Benchmark harness for Excel SQL Developer.
+
+    python esd_bench.py [-s SCENARIO ...] [-r REPEAT] [-o bench.json] [--baseline old.json]
+
+Generates synthetic workbook folders (file count, sheets per file, rows, column count and
+text width, dirty headers, mixed-type columns) and times each stage headlessly:
+
+    parse         time load_folder spends in pd.ExcelFile and pd.read_excel
+    insert        the rest of load_folder: header cleanup, type inference, to_sql, views
+    rewrite       process_query on the scenario's queries
+    query         executing the rewritten queries into DataFrames (read_result)
+    functions     queries calling the Excel-style SQL functions of esd_functions, with their
+                  memoized results cleared first
+    render_model  the data work show_results does before touching Tk: first page rows,
+                  column-width sample and a sort permutation
+    export        to_excel of the largest result
+    spool         spool_results of every result to a CSV spool file
+
+Each stage runs --repeat times; the JSON output keeps every run plus min and median.
+With --baseline, stages whose median is slower than the baseline by more than
+--tolerance are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from esd_engine import ExcelSQLEngine
+from esd_functions import clear_caches
+
+# name -> generator settings; "default" scenarios run when none are named
+SCENARIOS = {
+    "small": dict(files=3, sheets=2, rows=2000, columns=8, text_width=12, dirty_headers=False, mixed_types=False),
+    "dirty": dict(files=4, sheets=3, rows=3000, columns=12, text_width=40, dirty_headers=True, mixed_types=True),
+    "wide": dict(files=2, sheets=2, rows=5000, columns=60, text_width=20, dirty_headers=False, mixed_types=False),
+    "many_files": dict(files=25, sheets=2, rows=400, columns=6, text_width=12, dirty_headers=False, mixed_types=True),
+    "tall": dict(files=1, sheets=1, rows=200000, columns=8, text_width=16, dirty_headers=False, mixed_types=False),
+}
+DEFAULT_SCENARIOS = ["small", "dirty", "wide", "many_files"]
+
+STAGES = ["parse", "insert", "rewrite", "query", "functions", "render_model", "export", "spool"]
+
+# Column kinds cycle in this order so every table has each kind once it has 5+ columns
+_COLUMN_KINDS = ["id", "amount", "category", "date", "text"]
+
+
+def generate_folder(folder, files, sheets, rows, columns, text_width, dirty_headers, mixed_types, seed=0):
+    """Write files x sheets synthetic workbooks into folder; returns the file names"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    alphabet = np.array(list("abcdefghijklmnopqrstuvwxyz "))
+    names = []
+    for file_index in range(files):
+        filename = f"bench_{file_index:03d}.xlsx"
+        with pd.ExcelWriter(os.path.join(folder, filename)) as writer:
+            for sheet_index in range(sheets):
+                data = {}
+                for col in range(columns):
+                    kind = _COLUMN_KINDS[col % len(_COLUMN_KINDS)]
+                    if kind == "id":
+                        values = pd.Series(np.arange(rows) + file_index * rows, dtype=object)
+                    elif kind == "amount":
+                        values = pd.Series(np.round(rng.normal(100, 40, rows), 2), dtype=object)
+                    elif kind == "category":
+                        values = pd.Series(rng.choice(["north", "south", "east", "west", "central"], rows),
+                                           dtype=object)
+                    elif kind == "date":
+                        values = pd.Series(pd.Timestamp("2020-01-01")
+                                           + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D"), dtype=object)
+                    else:
+                        letters = rng.choice(alphabet, (rows, text_width))
+                        values = pd.Series(["".join(row) for row in letters], dtype=object)
+                    if mixed_types and kind in ("amount", "date"):
+                        dirty = rng.random(rows) < 0.02
+                        values[dirty] = rng.choice(["n/a", "TBD", "-"], int(dirty.sum()))
+                    if mixed_types:
+                        values[rng.random(rows) < 0.01] = None
+                    data[f"c{col}"] = values
+                df = pd.DataFrame(data)
+                df.columns = [header_for(col, dirty_headers) for col in range(columns)]
+                df.to_excel(writer, sheet_name=f"Sheet{sheet_index + 1}", index=False)
+        names.append(filename)
+    return names
+
+
+def header_for(col, dirty_headers):
+    kind = _COLUMN_KINDS[col % len(_COLUMN_KINDS)]
+    if not dirty_headers:
+        return f"{kind}_{col}"
+    # Spaces, punctuation, case and exact duplicates, like hand-made sheets
+    return [f" {kind.title()} ({col % 3}) ", f"{kind}-{col}", f"{kind.upper()} #", kind][col % 4]
+
+
+def scenario_columns(engine):
+    """Pick (table, integer, number, text column) of the first loaded table by inferred type"""
+    first = sorted(engine.table_mapping)[0]
+    schema = engine.inferred_schema.get(engine.table_mapping[first], {})
+    columns = [row[1] for row in engine.conn.execute(f'PRAGMA table_info("{engine.table_mapping[first]}")')]
+
+    def column_of(sql_type, fallback):
+        return next((c for c in columns if schema.get(c) == sql_type), fallback)
+
+    key = column_of("INTEGER", columns[0])
+    number = column_of("REAL", key)
+    text = next((c for c in columns if schema.get(c, "TEXT") == "TEXT"), columns[-1])
+    return first, key, number, text
+
+
+def scenario_queries(engine):
+    """Build queries against the loaded tables using the column types inferred at load"""
+    dot_names = sorted(engine.table_mapping)
+    first, key, number, text = scenario_columns(engine)
+
+    queries = {
+        "scan": f"SELECT * FROM {first}",
+        "filter": f"SELECT * FROM {first} WHERE {number} > 100",
+        "group": f"SELECT {text}, COUNT(*) AS n, SUM({number}) AS total FROM {first} GROUP BY {text}",
+    }
+    if len(dot_names) > 1:
+        queries["join"] = (f"SELECT COUNT(*) FROM {first} a JOIN {dot_names[1]} b "
+                           f"ON a.{key} = b.{key}")
+    return queries
+
+
+def function_queries(engine):
+    """One query per Excel-style SQL function over the first loaded table"""
+    first, key, number, text = scenario_columns(engine)
+    return {
+        "excel_date": f"SELECT EXCEL_DATE({key} + 40000) FROM {first}",
+        "to_number": f"SELECT SUM(TO_NUMBER('$ ' || {number})) FROM {first}",
+        "regexp": f"SELECT COUNT(*) FROM {first} WHERE {text} REGEXP '^[a-m]'",
+        "regex_extract": f"SELECT REGEX_EXTRACT({text}, '[aeiou]+') FROM {first}",
+        "normalize": f"SELECT NORMALIZE({text}), COUNT(*) FROM {first} GROUP BY 1",
+        "norm_distinct": f"SELECT NORM_DISTINCT({text}) FROM {first}",
+    }
+
+
+def timed_load(engine, folder):
+    """
+    Run load_folder, timing the workbook parsing inside it separately.
+    Returns (parse seconds, total load seconds).
+    """
+    parse_seconds = [0.0]
+    original_excel_file, original_read_excel = pd.ExcelFile, pd.read_excel
+
+    def timed(func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                parse_seconds[0] += time.perf_counter() - start
+        return wrapper
+
+    pd.ExcelFile, pd.read_excel = timed(original_excel_file), timed(original_read_excel)
+    try:
+        start = time.perf_counter()
+        engine.load_folder(folder)
+        load_seconds = time.perf_counter() - start
+    finally:
+        pd.ExcelFile, pd.read_excel = original_excel_file, original_read_excel
+    return parse_seconds[0], load_seconds
+
+
+def time_stage(runs, repeat, func):
+    """Call func() repeat times, appending seconds to runs; returns the last return value"""
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return result
+
+
+def render_model(df, page_size=1000, sample_rows=1000):
+    """Headless stand-in for show_results: page tuples, width sample and a sort permutation"""
+    rows = list(df.iloc[:page_size].itertuples(index=False, name=None))
+    sample = df if len(df.index) <= sample_rows else df.sample(n=sample_rows, random_state=0)
+    widths = [int(sample.iloc[:, i].astype(str).str.len().max()) for i in range(len(df.columns))]
+    if len(df.columns):
+        column = df.iloc[:, 0].reset_index(drop=True)
+        try:
+            column.sort_values(kind='mergesort', na_position='last')
+        except TypeError:
+            column.astype(str).sort_values(kind='mergesort')
+    return len(rows), widths
+
+
+def run_scenario(name, settings, repeat, work_dir):
+    """Generate one scenario's folder and time every stage; returns its result record"""
+    folder = os.path.join(work_dir, name)
+    generate_start = time.perf_counter()
+    files = generate_folder(folder, **settings)
+    generate_seconds = time.perf_counter() - generate_start
+    timings = {stage: [] for stage in STAGES}
+
+    engine = ExcelSQLEngine()
+    for _ in range(repeat):
+        parse_seconds, load_seconds = timed_load(engine, folder)
+        timings["parse"].append(parse_seconds)
+        timings["insert"].append(load_seconds - parse_seconds)
+
+    queries = scenario_queries(engine)
+    processed = time_stage(timings["rewrite"], repeat,
+                           lambda: {key: engine.process_query(sql) for key, sql in queries.items()})
+    results = time_stage(timings["query"], repeat,
+                         lambda: {key: engine.read_result(sql) for key, sql in processed.items()})
+
+    functions = {key: engine.process_query(sql) for key, sql in function_queries(engine).items()}
+
+    def run_functions():
+        clear_caches()
+        return {key: engine.read_result(sql) for key, sql in functions.items()}
+
+    time_stage(timings["functions"], repeat, run_functions)
+
+    largest = max(results.values(), key=lambda df: len(df.index))
+    time_stage(timings["render_model"], repeat, lambda: render_model(largest))
+
+    export_path = os.path.join(work_dir, f"{name}_export.xlsx")
+    time_stage(timings["export"], repeat, lambda: largest.to_excel(export_path, index=False))
+
+    spool_path = os.path.join(work_dir, f"{name}_spool.csv")
+
+    def spool():
+        engine.enable_spool(spool_path)
+        try:
+            for index, (key, df) in enumerate(results.items()):
+                engine.write_query_header(queries[key], index == 0)
+                engine.spool_results(df, index)
+        finally:
+            engine.disable_spool()
+
+    time_stage(timings["spool"], repeat, spool)
+
+    return {
+        "scenario": name,
+        "settings": settings,
+        "tables": len(engine.table_mapping),
+        "total_rows": sum(engine.get_row_count(t) for t in engine.table_mapping.values()),
+        "result_rows": {key: len(df.index) for key, df in results.items()},
+        "generate_seconds": round(generate_seconds, 4),
+        "stages": {stage: {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+                   for stage, runs in timings.items()},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return (scenario, stage, baseline median, current median) for stages that regressed"""
+    previous = {record["scenario"]: record["stages"] for record in baseline.get("scenarios", [])}
+    regressions = []
+    for record in results["scenarios"]:
+        for stage, stats in record["stages"].items():
+            old = previous.get(record["scenario"], {}).get(stage)
+            # Ignore sub-millisecond stages, where timer noise dominates
+            if old and old["median"] > 0.001 and stats["median"] > old["median"] * (1 + tolerance):
+                regressions.append((record["scenario"], stage, old["median"], stats["median"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time Excel SQL Developer stages on synthetic workbooks.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help=f"Scenario to run; repeatable (default: {', '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per stage (default: 3)")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline as a fraction (default: 0.25)")
+    parser.add_argument("--work-dir", help="Keep generated workbooks and exports here instead of a temp folder")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="esd_bench_")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "scenarios": [],
+    }
+    try:
+        for name in args.scenario or DEFAULT_SCENARIOS:
+            print(f"Running scenario '{name}'...", file=sys.stderr)
+            record = run_scenario(name, SCENARIOS[name], args.repeat, work_dir)
+            results["scenarios"].append(record)
+            print("  " + "  ".join(f"{stage} {stats['median'] * 1000:.1f}ms"
+                                   for stage, stats in record["stages"].items()), file=sys.stderr)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for scenario, stage, old, new in regressions:
+            print(f"REGRESSION {scenario}/{stage}: {old * 1000:.1f}ms -> {new * 1000:.1f}ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Headless batch runner for Excel SQL Developer.
+
+    python esd_cli.py FOLDER SCRIPT.sql [-o OUTPUT] [--continue-on-error]
+
+Loads every workbook in FOLDER, runs each ;-separated statement of SCRIPT through
+the same file.sheet rewriting and validation as the app, and spools the results
+to OUTPUT (.csv/.txt, same layout as the app's spool files) or to stdout.
+
+Exit status: 0 when every statement succeeded, 1 when a statement failed (or the
+run stopped on an unexpected error), 2 when the folder or script could not be loaded.
+"""
+import argparse
+import os
+import sys
+
+from esd_engine import ExcelSQLEngine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a SQL script against a folder of Excel workbooks.")
+    parser.add_argument("folder", help="Folder containing .xlsx/.xls workbooks")
+    parser.add_argument("script", help="SQL script; statements are separated by semicolons")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Spool file for the results (default: stdout)")
+    parser.add_argument("--continue-on-error", action="store_true",
+                        help="Keep running the remaining statements after a failure")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Statements to run concurrently (default: up to 4)")
+    parser.add_argument("--storage", choices=("memory", "shared_memory", "file"), default=None,
+                        help="Workspace database storage; shared_memory/file let --jobs workers read it directly "
+                             "(default: shared_memory when statements run concurrently, else memory)")
+    parser.add_argument("--no-summary-rewrite", action="store_true",
+                        help="Always read the source sheets, even when a summary table could answer a query")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Estimate aggregates on large sheets from row samples, with confidence bounds")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Only report errors on stderr")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    if not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return 2
+    try:
+        with open(args.script, encoding='utf-8') as f:
+            statements_text = f.read()
+    except OSError as e:
+        print(f"Cannot read script {args.script}: {e}", file=sys.stderr)
+        return 2
+
+    engine = ExcelSQLEngine()
+    jobs = args.jobs or engine.parallel_workers
+    engine.storage_mode = args.storage or ("shared_memory" if jobs > 1 else "memory")
+    engine.summary_rewrite_enabled = not args.no_summary_rewrite
+    engine.approximate_mode = args.approximate
+    try:
+        excel_files, warnings = engine.load_folder(
+            args.folder, lambda i, total, name: log(f"Loading files ({i}/{total}): {name}"))
+    except Exception as e:
+        print(f"Failed to load Excel files: {e}", file=sys.stderr)
+        return 2
+
+    for message, msg_type in warnings:
+        if msg_type == "error":
+            print(f"ERROR: {message}", file=sys.stderr)
+        else:
+            log(f"WARNING: {message}")
+    if not excel_files:
+        print("No Excel files found in selected directory.", file=sys.stderr)
+        return 2
+    log(f"Loaded {len(engine.table_mapping)} tables from {len(excel_files)} files")
+
+    statements = engine.split_statements(statements_text)
+    try:
+        if args.output == "-":
+            engine.spool_file = sys.stdout
+            engine.spooling_active = True
+        else:
+            engine.enable_spool(args.output)
+    except OSError as e:
+        print(f"Cannot open output {args.output}: {e}", file=sys.stderr)
+        return 2
+
+    exit_status = 0
+    try:
+        # Independent statements run concurrently; results are spooled in script order
+        for i, _, result_df, error in engine.iter_statement_results(statements, max_workers=args.jobs):
+            engine.write_query_header(statements[i], i == 0)
+            if error:
+                message = str(error)
+                engine.write_to_spool(f"ERROR: {message}\n")
+                print(f"Statement {i + 1}/{len(statements)} failed: {message}", file=sys.stderr)
+                exit_status = 1
+                if not args.continue_on_error:
+                    break
+                continue
+
+            engine.spool_results(result_df, i, header=True)
+            spill = result_df.attrs.get("spill")
+            row_count = spill.row_count if spill is not None else len(result_df.index)
+            summary = result_df.attrs.get("summary_rewrite")
+            approximate = result_df.attrs.get("approximate")
+            note = f" (answered from summary table {summary})" if summary else ""
+            if approximate:
+                note = f" (approximate, {approximate['fraction']:.1%} {approximate['sample']} sample)"
+            log(f"Statement {i + 1}/{len(statements)}: {row_count:,} rows{note}")
+    except Exception as e:
+        print(f"Run stopped: {e}", file=sys.stderr)
+        exit_status = 1
+    finally:
+        if engine.spool_file is sys.stdout:
+            sys.stdout.flush()
+            engine.spool_file = None
+            engine.spooling_active = False
+        else:
+            engine.disable_spool()
+
+    return exit_status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2290 @@
+import sqlite3
+import os
+import re
+import fnmatch
+import json
+import math
+import atexit
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from esd_profile import profile_chunks
+from esd_functions import register_functions
+from esd_perf import PerfRecorder, LazyModule
+
+pd = LazyModule("pandas", globals(), "pd")  # Imported on first use to keep startup fast
+
+# Per-user settings directory (persistent caches live here)
+ESD_HOME = os.path.join(os.path.expanduser("~"), ".esd")
+
+
+# Prefix process_query puts on a query it redirected to a summary table
+SUMMARY_REWRITE_MARK = "/* esd:summary {} */ "
+
+# Shape of a single-table aggregate query, parsed after process_query and comment removal
+_AGGREGATE_QUERY_PATTERN = re.compile(
+    r'^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>"\w+")'
+    r'(?:\s+(?:AS\s+)?(?!(?:WHERE|GROUP|ORDER|LIMIT)\b)(?P<alias>\w+))?'
+    r'(?:\s+WHERE\s+(?P<where>.+?))?'
+    r'(?:\s+GROUP\s+BY\s+(?P<group>.+?))?'
+    r'(?:\s+HAVING\s+(?P<having>.+?))?'
+    r'(?P<tail>\s+(?:ORDER\s+BY|LIMIT)\s+.+?)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL)
+_AGGREGATE_CALL_PATTERN = re.compile(r'\b(sum|total|count|min|max|avg|group_concat)\(')
+# String literals, quoted identifiers and bare words that are not function names
+_SQL_IDENTIFIER_PATTERN = re.compile(r"'(?:[^']|'')*'|\"[^\"]+\"|\b[a-z_]\w*\b(?!\()")
+_SQL_WORDS = {"and", "or", "not", "null", "is", "in", "like", "glob", "between", "case", "when", "then",
+              "else", "end", "as", "cast", "integer", "real", "text", "numeric", "collate", "nocase",
+              "escape", "distinct", "asc", "desc", "order", "by", "limit", "offset", "true", "false"}
+
+
+class DatabaseError(sqlite3.DatabaseError):
+    """Raised by validate_query for statements that are not allowed to run"""
+
+
+# Words that can follow a FROM source without being its alias
+_JOIN_WORDS = {"on", "using", "natural", "left", "right", "full", "inner", "outer", "cross", "join", "indexed", "not"}
+
+
+def _typed_frame(rows, columns, column_types):
+    """Build a DataFrame from fetched rows, using nullable/numeric dtypes for known typed columns"""
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for position, sql_type in enumerate(column_types):
+        target = {"INTEGER": "Int64", "REAL": "float64"}.get(sql_type)
+        if target is None or df.dtypes.iloc[position] == target:
+            continue
+        try:
+            df.isetitem(position, df.iloc[:, position].astype(target))
+        except (TypeError, ValueError):
+            pass  # Column holds values kept as text at load; leave it as object
+    return df
+
+
+class ResultSpill:
+    """Full rows of a query result that outgrew the memory budget, kept in a temporary SQLite file"""
+
+    def __init__(self, path, columns, column_types=None):
+        self.path = path
+        self.columns = list(columns)
+        self.column_types = column_types or [None] * len(self.columns)  # Typed like the in-memory rows
+        self.row_count = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        # Positional column names, since results may repeat a name (e.g. two joined "id" columns)
+        column_defs = ", ".join(f"c{i}" for i in range(len(self.columns)))
+        self._conn.execute(f"CREATE TABLE result ({column_defs})")
+        self._insert_sql = f"INSERT INTO result VALUES ({', '.join('?' * len(self.columns))})"
+
+    def append(self, rows):
+        cursor = self._conn.executemany(self._insert_sql, rows)
+        self.row_count += cursor.rowcount
+
+    def finish(self):
+        self._conn.commit()
+
+    def read_rows(self, offset, limit):
+        """Return rows [offset, offset + limit) as a DataFrame"""
+        rows = self._conn.execute("SELECT * FROM result WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                  (offset, limit)).fetchall()
+        return _typed_frame(rows, self.columns, self.column_types)
+
+    def iter_chunks(self, chunksize=50000):
+        """Yield the full result as DataFrames of at most chunksize rows"""
+        for offset in range(0, self.row_count, chunksize):
+            yield self.read_rows(offset, chunksize)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __deepcopy__(self, memo):
+        return self  # pandas deep-copies attrs into derived frames; they all share this one file
+
+    def __del__(self):
+        self.close()
+
+
+class ExcelSQLEngine:
+    """
+    UI-free core of Excel SQL Developer: loads a folder of workbooks into SQLite,
+    rewrites file.sheet names, validates and runs queries, and spools results.
+    ExcelSQLApp builds the Tk interface on top of it; esd_cli.py drives it headlessly.
+    """
+
+    def __init__(self):
+        # Index advisor
+        self.index_advisor_enabled = True  # Inspect EXPLAIN QUERY PLAN after each query
+        self.auto_create_indexes = False  # Create suggested indexes without asking
+        self.index_scan_threshold = 3  # Full scans on a column before it is suggested
+        self.index_budget = 10  # Max indexes the advisor may create per workspace
+
+        # Type inference
+        self.type_inference_enabled = True  # Store columns as INTEGER/REAL/DATE/TEXT
+        self.type_inference_threshold = 0.9  # Share of values that must parse for a column to be typed
+
+        # Load profiles (column allowlists, header row and row filters per workbook/sheet)
+        self.load_profile_filename = "esd_load_profiles.json"  # Looked up in the selected folder
+
+        # Partitioned views over same-schema sheets from different workbooks
+        self.partition_views_enabled = True
+        self.partition_source_column = "_source"  # Column holding the workbook name in each view
+
+        # Summary tables (user-defined materialized aggregates, queried as summary.<name>)
+        self.summary_file = "summary"  # File part of the summary tables' dot names
+        self.summary_cache_filename = "summary_tables.json"  # Definitions per folder, kept in ESD_HOME
+        self.summary_rewrite_enabled = True  # Answer matching aggregate queries from summary tables
+
+        # Full-text indexes over free-text columns, searched with: WHERE file.sheet MATCH 'words'
+        self.text_index_auto = False  # Index the free-text columns of every sheet at load
+        self.text_index_min_length = 20  # Average characters for a text column to count as free text
+        self.text_index_tokenizer = "unicode61 remove_diacritics 2"  # FTS5 tokenizer of new indexes
+        self.text_index_cache_filename = "text_indexes.json"  # Indexed columns per folder, kept in ESD_HOME
+
+        # Approximate mode: aggregate queries on large sheets run against row samples built at load
+        self.approximate_mode = False  # Answer from samples, with scaled counts/sums and bounds
+        self.sample_min_rows = 100000  # Sheets with at least this many rows get samples
+        self.sample_fraction = 0.01  # Share of rows kept in each sample
+        self.sample_min_size = 10000  # Rows kept at least, whatever the fraction
+        self.sample_min_per_stratum = 200  # Rows kept at least per stratum (or the whole stratum)
+        self.sample_max_strata = 50  # Most distinct values a text column may have to stratify on
+        self.sample_weight_column = "_esd_weight"  # Rows in the sheet each sample row stands for
+        self.sample_size_column = "_esd_stratum_sample"  # Sample rows drawn from the row's stratum
+        self.sample_seed = 0
+        self.confidence_z = 1.96  # Bounds shown with approximate results are 95% intervals
+
+        # Excel-style SQL functions (EXCEL_DATE, REGEXP, REGEX_EXTRACT, NORMALIZE, TO_NUMBER, ...; see esd_functions)
+        self.sql_functions_enabled = True  # Register them on every connection
+
+        # Parallel execution of independent read-only statements
+        self.parallel_workers = min(4, os.cpu_count() or 1)
+
+        # Storage: "memory" (private, fastest single-threaded), "shared_memory" (named shared-cache
+        # in-memory database other threads can open) or "file" (temp file in WAL mode, memory-mapped)
+        self.storage_mode = "memory"
+        self.mmap_size = 256 * 1024 * 1024  # Bytes of a file workspace to memory-map per connection
+
+        # Query results
+        self.result_chunk_rows = 50000  # Rows fetched from SQLite per DataFrame chunk
+        self.result_memory_budget = 512 * 1024 * 1024  # Bytes of result frames kept in memory before spilling
+
+        # Saved workspaces
+        self.workspace_format = 1  # Bump when the saved metadata layout changes
+        self.workspace_meta_table = "esd_workspace_meta"  # Only exists inside saved workspace files
+
+        # Timing spans around loading, rewriting, execution and spooling (see esd_perf)
+        self.perf_log_path = os.path.join(ESD_HOME, "perf.log")  # Rotating JSON-lines log
+        self.perf_log_max_bytes = 1024 * 1024
+        self.perf_log_backups = 3
+        self.perf = PerfRecorder()
+        if os.environ.get("ESD_PERF"):
+            self.enable_perf_log()
+
+        # Memory diagnostics
+        self.trace_ingest_memory = False  # Take tracemalloc snapshots around the next load (slows loading)
+        self.memory_trace_top = 25  # Allocation sites kept in the ingest report
+
+        # Workspace state
+        self.file_path = ""
+        self.conn = None
+        self.table_mapping = {}
+        self.index_scan_counts = Counter()  # (sql_table, column) -> number of full scans seen
+        self.created_indexes = []  # (sql_table, column) pairs created by the advisor
+        self.inferred_schema = {}  # sql_table -> {column: sql_type} chosen at load time
+        self.load_profiles = {}  # Profiles read from the selected folder
+        self.partition_views = {}  # view sql name -> [(workbook name, sql table), ...]
+        self.summary_tables = {}  # name -> {"query", "sql_name", "sources", "rows", "refreshed"}
+        self._summary_shapes = {}  # name -> parsed definition used by the rewrite stage, set when built
+        self.sample_tables = {}  # sql_table -> {"rows", "uniform", "uniform_rows", "stratified", "stratified_rows", "stratum"}
+        self.text_indexes = {}  # sql_table -> columns in its FTS5 index (table "<sql_table>__fts")
+        self.load_warnings = []  # (message, type) tuples from the last load
+        self.stats_catalog = {}  # sql_table -> column summaries from profile_table, until the next load
+        self.ingest_memory_report = None  # Peak and top allocation sites of the last traced load
+
+        self._temp_dir = None  # Temp folder for file workspaces, snapshots and result spills
+        self._temp_lock = threading.Lock()
+        self._workspace_count = 0  # Workspaces opened so far, used to keep database names unique
+        self._workspace_uri = None  # URI worker threads open; None for a private in-memory database
+        self._workspace_db_path = None  # Database file of a "file" workspace
+        self._snapshot_signature = None  # Database state the private-memory snapshot reflects
+        self._snapshot_path = None  # Temp file holding that snapshot
+        self._stale_snapshots = []  # Older snapshots not deleted yet because a reader still had them open
+
+        # Spooling
+        self.spool_file = None
+        self.spooling_active = False
+
+    def report_status(self, message):
+        """Report progress to the user; the Tk app shows it in the status bar"""
+        pass
+
+    def enable_perf_log(self):
+        """Start recording timing spans, also appending them to the rotating perf log"""
+        self.perf.enable(self.perf_log_path, self.perf_log_max_bytes, self.perf_log_backups)
+
+    def load_folder(self, path, progress_callback=None):
+        """
+        Load every Excel workbook in a folder into a fresh in-memory SQLite database.
+        progress_callback(index, total, filename) is called before each workbook.
+        Returns (excel_files, collected_warnings) where warnings are (message, type) tuples.
+        """
+        collected_warnings = []  # Collect warnings here as (message, type) tuples
+
+        self.file_path = path
+        self.open_workspace_database()
+        self.table_mapping = {}
+        self.index_scan_counts = Counter()
+        self.created_indexes = []
+        self.inferred_schema = {}
+        self.load_profiles = self.read_load_profiles(collected_warnings)
+        self.partition_views = {}
+        self.summary_tables = {}
+        self._summary_shapes = {}
+        self.sample_tables = {}
+        self.text_indexes = {}
+        self.load_warnings = collected_warnings
+        self.stats_catalog = {}
+
+        excel_files = [f for f in os.listdir(self.file_path)
+                       if f.lower().endswith(('.xlsx', '.xls'))]
+        if not excel_files:
+            return excel_files, collected_warnings
+
+        trace = self.trace_ingest_memory
+        if trace:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+
+        try:
+            total_files = len(excel_files)
+            for i, filename in enumerate(excel_files, 1):
+                if progress_callback:
+                    progress_callback(i, total_files, filename)
+                self.load_excel_file(filename, collected_warnings)
+        finally:
+            if trace:
+                self.ingest_memory_report = self._ingest_memory_report(before)
+                if started_tracing:
+                    tracemalloc.stop()
+
+        if self.partition_views_enabled:
+            self.create_partition_views(collected_warnings)
+        self.restore_persisted_indexes(collected_warnings)
+        self.restore_text_indexes(collected_warnings)
+        self.restore_summary_tables(collected_warnings)
+        return excel_files, collected_warnings
+
+    def reload_excel_file(self, filename):
+        """
+        Re-read one workbook of the loaded folder after it changed on disk. Its tables are
+        replaced, advisor indexes re-created and dependent summary tables refreshed.
+        Returns the (message, type) warnings of the reload.
+        """
+        collected_warnings = []
+        self.load_excel_file(filename, collected_warnings)
+        self.restore_persisted_indexes(collected_warnings)
+        return collected_warnings
+
+    def load_excel_file(self, filename, collected_warnings):
+        """Load all sheets from an Excel file into SQLite"""
+        file_path = os.path.join(self.file_path, filename)
+        file_base = os.path.splitext(filename)[0]
+
+        # Sanitize file_key and check for changes
+        original_file_key = file_base.lower().replace(' ', '_')
+        file_key = re.sub(r'[^a-z0-9_]', '', original_file_key)
+        if original_file_key != file_key:
+            collected_warnings.append(
+                (f"File name '{file_base}' sanitized to '{file_key}' for internal use due to special characters/spaces.",
+                 "info")
+            )
+
+        try:
+            xls = pd.ExcelFile(file_path)
+
+            for sheet_name in xls.sheet_names:
+                full_sheet_name_display = f"{file_base}.{sheet_name}"  # For display in warnings
+
+                # Sanitize sheet_name for SQL table name and check for changes
+                original_sheet_name_for_sql = sheet_name.lower().replace(' ', '_')
+                sanitized_sheet_name_for_sql = re.sub(r'[^a-z0-9_]', '', original_sheet_name_for_sql)
+
+                if original_sheet_name_for_sql != sanitized_sheet_name_for_sql:
+                    collected_warnings.append(
+                        (f"Sheet name '{sheet_name}' in file '{file_base}' sanitized to '{sanitized_sheet_name_for_sql}' for internal use due to special characters/spaces.",
+                         "info")
+                    )
+
+                try:
+                    sheet_started = self.perf.start()
+                    profile = self.get_load_profile(filename, sheet_name)
+                    if profile.get("skip"):
+                        collected_warnings.append(
+                            (f"Sheet '{full_sheet_name_display}' skipped by load profile.", "info"))
+                        continue
+
+                    # Rows above the header row are never parsed
+                    skip_rows = max(0, int(profile.get("header_row", 1)) - 1)
+                    usecols = None
+                    if profile.get("columns"):
+                        usecols = self._profile_usecols(xls, sheet_name, profile, skip_rows,
+                                                        full_sheet_name_display, collected_warnings)
+
+                    # Read the Excel sheet without a header first
+                    parse_started = self.perf.start()
+                    df_raw = pd.read_excel(xls, sheet_name, header=None, na_values=['', 'NA', 'NULL'],
+                                           skiprows=skip_rows, usecols=usecols)
+                    self.perf.stop("parse_sheet", parse_started, sheet=full_sheet_name_display)
+                    df_raw.columns = range(len(df_raw.columns))  # Positions, even when usecols picked a subset
+
+                    if df_raw.empty:
+                        collected_warnings.append(
+                            (f"Sheet '{full_sheet_name_display}' is empty and will not be loaded.", "info"))
+                        continue  # Skip empty sheets
+
+                    # Extract the first row as potential headers
+                    original_headers = df_raw.iloc[0].tolist()
+                    # Drop the header row from the DataFrame
+                    df = df_raw[1:].copy()
+                    df.reset_index(drop=True, inplace=True)  # Reset index after dropping row
+
+                    # Drop columns that are entirely NaN after header extraction
+                    df = df.dropna(axis=1, how='all')
+
+                    # --- Custom Column Name Processing ---
+                    processed_columns = []
+                    seen_final_names = set()
+                    header_lookup = {}  # Raw and final lowercase names -> final column name
+                    for i, col_name_raw in enumerate(original_headers):
+                        # If column was dropped due to all NaNs, its header won't be used
+                        if i not in df.columns:
+                            continue
+
+                        original_col_str = str(col_name_raw).strip() if pd.notna(
+                            col_name_raw) else f"Unnamed_Column_{i}"
+
+                        # Step 1: Handle original duplicates
+                        base_name_for_dup_check = original_col_str
+                        count = 1
+                        while base_name_for_dup_check in seen_final_names:
+                            base_name_for_dup_check = f"{original_col_str}_{count}"
+                            count += 1
+
+                        if base_name_for_dup_check != original_col_str:
+                            collected_warnings.append(
+                                (f"'{full_sheet_name_display}': Original column '{original_col_str}' is a duplicate. Renamed to '{base_name_for_dup_check}'.",
+                                 "info")
+                            )
+
+                        # Step 2: Sanitize for special characters/spaces
+                        sanitized_name = re.sub(r'[^a-zA-Z0-9_]', '', base_name_for_dup_check.replace(' ', '_'))
+
+                        if sanitized_name != base_name_for_dup_check:
+                            collected_warnings.append(
+                                (f"'{full_sheet_name_display}': Column '{base_name_for_dup_check}' renamed to '{sanitized_name}' due to special characters or spaces.",
+                                 "info")
+                            )
+
+                        # Final check for uniqueness after full sanitization (should be rare if logic is correct)
+                        final_col_name = sanitized_name
+                        counter_final = 1
+                        while final_col_name in seen_final_names:
+                            final_col_name = f"{sanitized_name}_{counter_final}"
+                            counter_final += 1
+                            # This case should ideally not happen if previous duplicate handling is robust
+                            # but acts as a safeguard.
+                            if counter_final == 2:  # Only warn once for the first append
+                                collected_warnings.append(
+                                    (f"'{full_sheet_name_display}': Column '{sanitized_name}' became a duplicate after sanitization. Renamed to '{final_col_name}'.",
+                                     "info")
+                                )
+
+                        processed_columns.append(final_col_name)
+                        seen_final_names.add(final_col_name)
+                        header_lookup.setdefault(original_col_str.lower(), final_col_name)
+                        header_lookup[final_col_name.lower()] = final_col_name
+
+                    # Assign the new column names to the DataFrame
+                    df.columns = processed_columns
+
+                    if profile.get("filters"):
+                        df = self._apply_row_filters(df, profile["filters"], header_lookup,
+                                                     full_sheet_name_display, collected_warnings)
+
+                    sql_table_name = f"{file_key}_{sanitized_sheet_name_for_sql}"
+                    sql_table_name = re.sub(r'[^a-z0-9_]', '', sql_table_name)  # Final check for table name
+
+                    column_types = None
+                    if self.type_inference_enabled:
+                        df, column_types = self.infer_column_types(df, full_sheet_name_display, collected_warnings)
+
+                    self.table_mapping[full_sheet_name_display] = sql_table_name
+                    self.inferred_schema[sql_table_name] = column_types or {}
+                    insert_started = self.perf.start()
+                    df.to_sql(sql_table_name, self.conn, index=False, if_exists='replace', dtype=column_types)
+                    self.perf.stop("insert_sheet", insert_started, sheet=full_sheet_name_display)
+                    self.stats_catalog.pop(sql_table_name, None)
+                    self.build_samples(sql_table_name, df, column_types, collected_warnings)
+                    if sql_table_name in self.text_indexes or self.text_index_auto:
+                        self._index_loaded_sheet(sql_table_name, full_sheet_name_display, collected_warnings)
+                    self.refresh_summary_tables([sql_table_name], collected_warnings)
+                    self.perf.stop("load_sheet", sheet_started, sheet=full_sheet_name_display,
+                                   rows=len(df.index), columns=len(df.columns))
+
+                except Exception as e:
+                    collected_warnings.append((f"Error loading sheet '{full_sheet_name_display}': {str(e)}", "error"))
+                    print(f"Error loading {filename} sheet {sheet_name}: {str(e)}")  # Keep for console debug
+
+        except Exception as e:
+            collected_warnings.append((f"Error loading file '{filename}': {str(e)}", "error"))
+            print(f"Error loading {filename}: {str(e)}")  # Keep for console debug
+
+    def read_load_profiles(self, collected_warnings):
+        """
+        Read optional load profiles from the selected folder. The file maps a workbook
+        name pattern, optionally followed by ':sheet', to settings applied while parsing:
+            {"vendor_*.xlsx": {"columns": ["Id", "Amount"], "header_row": 3,
+                               "filters": [["Amount", ">", 0], ["Region", "in", ["EMEA", "APAC"]]]},
+             "vendor_*.xlsx:Summary": {"skip": true}}
+        """
+        profile_path = os.path.join(self.file_path, self.load_profile_filename)
+        if not os.path.exists(profile_path):
+            return {}
+        try:
+            with open(profile_path, encoding='utf-8') as f:
+                profiles = json.load(f)
+            if not isinstance(profiles, dict):
+                raise ValueError("top level must be an object")
+        except (OSError, ValueError) as e:
+            collected_warnings.append((f"Ignoring load profiles in '{self.load_profile_filename}': {e}", "error"))
+            return {}
+        collected_warnings.append(
+            (f"Using {len(profiles)} load profile(s) from '{self.load_profile_filename}'.", "info"))
+        return profiles
+
+    def get_load_profile(self, filename, sheet_name):
+        """Merge the workbook-level and sheet-level profiles that match a sheet (sheet settings win)"""
+        workbook_profile, sheet_profile = {}, {}
+        for pattern, settings in self.load_profiles.items():
+            file_pattern, _, sheet_pattern = pattern.partition(':')
+            if not fnmatch.fnmatch(filename.lower(), file_pattern.lower()):
+                continue
+            if not sheet_pattern:
+                workbook_profile.update(settings)
+            elif fnmatch.fnmatch(sheet_name.lower(), sheet_pattern.lower()):
+                sheet_profile.update(settings)
+        return {**workbook_profile, **sheet_profile}
+
+    def _profile_usecols(self, xls, sheet_name, profile, skip_rows, sheet_display_name, collected_warnings):
+        """Resolve a profile's column allowlist to column positions by reading only the header row"""
+        wanted = {str(c).strip().lower(): c for c in profile["columns"]}
+        header_row = pd.read_excel(xls, sheet_name, header=None, skiprows=skip_rows, nrows=1)
+        if header_row.empty:
+            return None
+
+        usecols = []
+        found = set()
+        for position, header in enumerate(header_row.iloc[0].tolist()):
+            if pd.isna(header):
+                continue
+            header_str = str(header).strip().lower()
+            # Accept both the raw header and its sanitized SQL column name
+            sanitized = re.sub(r'[^a-z0-9_]', '', header_str.replace(' ', '_'))
+            for candidate in (header_str, sanitized):
+                if candidate in wanted:
+                    usecols.append(position)
+                    found.add(candidate)
+                    break
+
+        missing = [wanted[key] for key in wanted if key not in found]
+        if missing:
+            collected_warnings.append(
+                (f"'{sheet_display_name}': Load profile columns not found: {', '.join(map(str, missing))}", "info"))
+        return usecols
+
+    def _apply_row_filters(self, df, filters, header_lookup, sheet_display_name, collected_warnings):
+        """Keep only rows matching every [column, operator, value] filter of a load profile"""
+        keep = pd.Series(True, index=df.index)
+        for row_filter in filters:
+            try:
+                column, operator, *value = row_filter
+                value = value[0] if value else None
+                col_name = header_lookup[str(column).strip().lower()]
+            except (ValueError, KeyError):
+                collected_warnings.append(
+                    (f"'{sheet_display_name}': Ignoring invalid row filter {row_filter}.", "error"))
+                continue
+
+            series = df[col_name]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                series = pd.to_numeric(series, errors='coerce')
+            elif isinstance(value, str):
+                series = series.astype(str).str.strip().where(series.notna())
+
+            operator = operator.strip().lower()
+            if operator in ("=", "=="):
+                mask = series == value
+            elif operator in ("!=", "<>"):
+                mask = series != value
+            elif operator == ">":
+                mask = series > value
+            elif operator == ">=":
+                mask = series >= value
+            elif operator == "<":
+                mask = series < value
+            elif operator == "<=":
+                mask = series <= value
+            elif operator == "in":
+                mask = series.isin(value)
+            elif operator == "not in":
+                mask = ~series.isin(value)
+            elif operator == "not null":
+                mask = series.notna()
+            elif operator == "is null":
+                mask = series.isna()
+            else:
+                collected_warnings.append(
+                    (f"'{sheet_display_name}': Unknown row filter operator '{operator}'.", "error"))
+                continue
+            keep &= mask.fillna(False).astype(bool)
+
+        filtered = df[keep].reset_index(drop=True)
+        dropped = len(df.index) - len(filtered.index)
+        if dropped:
+            collected_warnings.append(
+                (f"'{sheet_display_name}': Load profile filters skipped {dropped:,} row(s).", "info"))
+        return filtered
+
+    def infer_column_types(self, df, sheet_display_name, collected_warnings):
+        """
+        Choose INTEGER/REAL/DATE/TEXT storage for every column using vectorized checks.
+        Dates are stored as ISO-8601 text so they sort and compare correctly.
+        Values that do not fit a column's type are kept as text (SQLite allows this)
+        and reported as coercion warnings. Returns (converted df, {column: sql_type}).
+        """
+        column_types = {}
+        for col in df.columns:
+            series = df[col]
+            non_null = series.dropna()
+
+            if non_null.empty:
+                column_types[col] = "TEXT"
+                continue
+
+            if pd.api.types.is_datetime64_any_dtype(series):
+                df[col] = self._to_iso_dates(series)
+                column_types[col] = "DATE"
+                continue
+
+            if pd.api.types.is_numeric_dtype(series):
+                df[col], column_types[col] = self._to_numeric_column(series)
+                continue
+
+            kind = pd.api.types.infer_dtype(non_null, skipna=True)
+            if kind in ("datetime", "datetime64", "date"):
+                df[col] = self._to_iso_dates(pd.to_datetime(series, errors='coerce'))
+                column_types[col] = "DATE"
+                continue
+
+            as_text = non_null.astype(str).str.strip()
+            numbers = pd.to_numeric(as_text, errors='coerce')
+            if numbers.notna().mean() >= self.type_inference_threshold:
+                numbers, sql_type, problem = self._parse_text_numbers(non_null, as_text, numbers)
+                if problem:
+                    collected_warnings.append(
+                        (f"'{sheet_display_name}': Column '{col}' looks numeric but was kept as TEXT: {problem}.",
+                         "info"))
+                    column_types[col] = "TEXT"
+                    continue
+                converted = numbers.reindex(series.index)
+                converted = converted.astype("Int64") if sql_type == "INTEGER" else converted.astype(float)
+                self._warn_reformatted(non_null, numbers, sql_type, col, sheet_display_name, collected_warnings)
+                df[col], column_types[col] = self._keep_unparsed(
+                    series, converted, numbers, sql_type, col, sheet_display_name, collected_warnings)
+                continue
+
+            iso_like = as_text.str.match(r'^\d{4}-\d{1,2}-\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2})?)?$')
+            if iso_like.mean() >= self.type_inference_threshold:
+                dates = pd.to_datetime(as_text.where(iso_like), errors='coerce', format='ISO8601')
+                converted = self._to_iso_dates(dates.reindex(series.index))
+                df[col], column_types[col] = self._keep_unparsed(
+                    series, converted, dates, "DATE", col, sheet_display_name, collected_warnings)
+                continue
+
+            column_types[col] = "TEXT"
+
+        return df, column_types
+
+    def _to_numeric_column(self, numbers):
+        """Convert a numeric column to Int64 when every value is whole, otherwise float"""
+        valid = numbers.dropna()
+        if pd.api.types.is_bool_dtype(valid) or pd.api.types.is_integer_dtype(valid) or (
+                (valid % 1 == 0).all() and (valid.abs() <= 2 ** 53).all()):
+            return numbers.astype("Int64"), "INTEGER"
+        return numbers.astype(float), "REAL"
+
+    def _parse_text_numbers(self, values, texts, numbers):
+        """
+        Exact numbers for a mostly numeric column holding text cells. Returns (numbers,
+        sql_type, problem); problem says why the column must stay TEXT instead: codes with
+        leading zeros, integers beyond SQLite's 64-bit range, or decimals a REAL would round.
+        The text is checked with vectorized string operations; integers are parsed by
+        pd.to_numeric as int64, never through float.
+        """
+        parsed = numbers.notna()
+        is_text = values.map(type) == str
+        cells = pd.to_numeric(values[parsed & ~is_text])  # Numeric cells: their value is already exact
+        texts = texts[parsed & is_text]
+
+        leading_zero = texts.str.match(r'[+-]?0\d')
+        if leading_zero.any():
+            return None, None, f"values like '{texts[leading_zero].iloc[0]}' have leading zeros"
+
+        integer_text = texts.str.fullmatch(r'[+-]?\d+')
+        digits = texts[integer_text].str.lstrip("+-")
+        limit = texts[integer_text].str.startswith("-").map({True: str(2 ** 63), False: str(2 ** 63 - 1)})
+        too_large = (digits.str.len() > 19) | ((digits.str.len() == 19) & (digits > limit))
+        if too_large.any():
+            return None, None, f"{texts[integer_text][too_large].iloc[0]} is too large for an INTEGER column"
+        integers = pd.to_numeric(texts[integer_text])
+
+        # Other decimals: mantissa digits, digits after the point and exponent, e.g. '1.50e3'.
+        # pandas-only spellings such as 'inf' are left out and kept as text by _keep_unparsed
+        decimal_texts = texts[~integer_text & texts.str.fullmatch(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')]
+        parts = decimal_texts.str.extract(r'^[+-]?(\d*)\.?(\d*)(?:[eE]([+-]?\d+))?$')
+        mantissa = parts[0] + parts[1]
+        exponent = pd.to_numeric(parts[2].fillna("0"))
+        trailing_zeros = mantissa.str.len() - mantissa.str.rstrip("0").str.len()
+        zero = mantissa.str.strip("0") == ""
+        decimals = decimal_texts.astype(float)  # Correctly rounded; pd.to_numeric can be an ulp off
+        whole = zero | (trailing_zeros >= parts[1].str.len() - exponent)
+
+        if bool(whole.all()) and bool((cells % 1 == 0).all()):
+            # Beyond 2^53 a float no longer holds every integer; the few such values are parsed exactly
+            unsafe = decimals.abs() > 2 ** 53
+            large = decimal_texts[unsafe].map(lambda text: int(Decimal(text)))
+            exact = self._concat_parts([large, cells])
+            too_large = exact[exact.abs() >= 2 ** 63]
+            if not too_large.empty:
+                return None, None, f"{too_large.iloc[0]} is too large for an INTEGER column"
+            result = self._concat_parts([integers.astype("Int64"), cells.astype("Int64"),
+                                         decimals[~unsafe].astype("Int64"), large.astype("Int64")])
+            return result.astype("Int64"), "INTEGER", None
+
+        # A decimal with at most 15 significant digits always survives a float round trip;
+        # longer ones (rare, e.g. a float's repr) are compared with the float's shortest repr
+        significant = mantissa.str.strip("0").str.len()
+        inexact = (decimals.abs() == math.inf) | ((decimals.abs() < sys.float_info.min) & ~zero)
+        long_texts = decimal_texts[significant > 15]
+        if not long_texts.empty:
+            inexact[long_texts.index] |= (long_texts.map(Decimal)
+                                          != decimals[long_texts.index].map(lambda v: Decimal(repr(v))))
+        if inexact.any():
+            return None, None, f"'{decimal_texts[inexact].iloc[0]}' cannot be stored exactly as a REAL number"
+        result = self._concat_parts([integers.astype(float), cells.astype(float), decimals.astype(float)])
+        return result, "REAL", None
+
+    def _concat_parts(self, parts):
+        parts = [part for part in parts if not part.empty]
+        return pd.concat(parts) if parts else pd.Series(dtype=object)
+
+    def _warn_reformatted(self, values, numbers, sql_type, col, sheet_display_name, collected_warnings):
+        """Report text cells whose stored number will read back differently, e.g. '1.50' as 1.5"""
+        original = values.reindex(numbers.index)
+        is_text = original.map(type) == str
+        if not is_text.any():
+            return
+        stored = numbers[is_text].map(int if sql_type == "INTEGER" else float).map(repr)
+        changed = stored != original[is_text]
+        if changed.any():
+            example = changed.idxmax()
+            collected_warnings.append(
+                (f"'{sheet_display_name}': Column '{col}' stored as {sql_type}; {int(changed.sum())} text value(s) "
+                 f"read back reformatted (e.g. '{original[example]}' as {stored[example]}).", "info"))
+
+    def _keep_unparsed(self, series, converted, parsed, sql_type, col, sheet_display_name, collected_warnings):
+        """Put values that failed to parse back as their original text and warn about them"""
+        failed = series.notna() & parsed.reindex(series.index).isna()
+        if not failed.any():
+            return converted, sql_type
+
+        merged = converted.astype(object).where(~failed, series.astype(str))
+        example = series[failed].iloc[0]
+        collected_warnings.append(
+            (f"'{sheet_display_name}': Column '{col}' stored as {sql_type}; {int(failed.sum())} value(s) "
+             f"could not be converted and were kept as text (e.g. '{example}').", "info")
+        )
+        return merged, sql_type
+
+    def _to_iso_dates(self, dates):
+        """Format datetimes as ISO-8601 text, dropping the time part when it is always midnight"""
+        valid = dates.dropna()
+        if (valid == valid.dt.normalize()).all():
+            return dates.dt.strftime('%Y-%m-%d')
+        return dates.dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    def create_partition_views(self, collected_warnings):
+        """
+        Group same-schema sheets that share a sheet name across workbooks and expose each group
+        as one UNION ALL view with a _source column holding the workbook name. SQLite pushes
+        a filter such as _source = 'sales_2024_03' into every branch and skips the branches whose
+        constant does not match, so single-workbook queries only scan their own table.
+        """
+        groups = {}
+        for dot_name, sql_name in self.table_mapping.items():
+            file_base, sheet = dot_name.split('.', 1)
+            cursor = self.conn.execute(f'PRAGMA table_info("{sql_name}")')
+            schema = tuple((row[1].lower(), row[2]) for row in cursor.fetchall())
+            if not schema or any(name == self.partition_source_column for name, _ in schema):
+                continue
+            groups.setdefault((sheet.lower(), schema), []).append((file_base, sheet, sql_name))
+
+        for (_, schema), members in sorted(groups.items()):
+            if len(members) < 2:
+                continue
+
+            file_bases = sorted(file_base for file_base, _, _ in members)
+            prefix = os.path.commonprefix([f.lower() for f in file_bases])
+            # Cut back to a whole word: sales_2024_01/sales_2024_02 -> sales_2024
+            prefix = re.sub(r'[^ _\-.]*$', '', file_bases[0][:len(prefix)]).rstrip(" _-.")
+            view_file = f"{prefix}_all" if prefix else "all"
+            view_dot_name = f"{view_file}.{members[0][1]}"
+            if view_dot_name in self.table_mapping:
+                continue
+
+            view_sql_name = re.sub(r'[^a-z0-9_]', '', f"{view_file}_{members[0][1]}".lower().replace(' ', '_'))
+            branches = [
+                f"SELECT '{file_base.replace(chr(39), chr(39) * 2)}' AS \"{self.partition_source_column}\", * FROM \"{sql_name}\""
+                for file_base, _, sql_name in sorted(members)
+            ]
+            try:
+                self.conn.execute(f'CREATE VIEW "{view_sql_name}" AS ' + "\nUNION ALL\n".join(branches))
+            except sqlite3.Error as e:
+                collected_warnings.append((f"Could not create partitioned view '{view_dot_name}': {e}", "error"))
+                continue
+
+            self.table_mapping[view_dot_name] = view_sql_name
+            self.partition_views[view_sql_name] = [(file_base, sql_name) for file_base, _, sql_name in sorted(members)]
+            collected_warnings.append(
+                (f"Partitioned view '{view_dot_name}' combines {len(members)} same-schema sheets "
+                 f"(filter on {self.partition_source_column} to pick workbooks).", "info")
+            )
+
+    def get_row_count(self, table_name):
+        """Get row count for a table"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM \"{table_name}\"")
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error getting row count for {table_name}: {e}")
+            return 0
+
+    # --- Column statistics ---
+
+    def profile_table(self, sql_name, conn=None, progress_callback=None, refresh=False):
+        """
+        Summarize every column of a table in one streaming pass (see esd_profile) and cache
+        the result in stats_catalog. Pass a worker connection to run it off the UI thread.
+        progress_callback(rows_done, total_rows) is called after each chunk.
+        """
+        if not refresh and sql_name in self.stats_catalog:
+            return self.stats_catalog[sql_name]
+
+        conn = conn or self.conn
+        total_rows = conn.execute(f'SELECT COUNT(*) FROM "{sql_name}"').fetchone()[0]
+        cursor = conn.execute(f'SELECT * FROM "{sql_name}"')
+        columns = [d[0] for d in cursor.description]
+        column_types = [self.inferred_schema.get(sql_name, {}).get(column) for column in columns]
+
+        def chunks():
+            while True:
+                rows = cursor.fetchmany(self.result_chunk_rows)
+                if not rows:
+                    return
+                yield _typed_frame(rows, columns, column_types)
+
+        try:
+            summaries = profile_chunks(
+                chunks(), columns, progress_callback and (lambda done: progress_callback(done, total_rows)))
+        finally:
+            cursor.close()
+        for summary, sql_type in zip(summaries, column_types):
+            summary["type"] = sql_type or "TEXT"
+        self.stats_catalog[sql_name] = summaries
+        return summaries
+
+    # --- Memory diagnostics ---
+
+    def table_memory_usage(self):
+        """
+        Return [(sql_name, bytes, pages)] per table, its indexes included, largest first.
+        Uses the dbstat virtual table when SQLite was built with it; otherwise only the
+        database total is known and it is returned as a single ("*", bytes, pages) row.
+        """
+        try:
+            return self.conn.execute(
+                "SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize), COUNT(*) "
+                "FROM dbstat AS s LEFT JOIN sqlite_master AS m ON m.name = s.name "
+                "GROUP BY 1 ORDER BY 2 DESC").fetchall()
+        except sqlite3.OperationalError:  # No such table: dbstat
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            return [("*", pages * page_size, pages)]
+
+    def _ingest_memory_report(self, before):
+        """Compare a tracemalloc snapshot taken before loading with the current state"""
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        top = []
+        for stat in after.compare_to(before, "lineno")[:self.memory_trace_top]:
+            frame = stat.traceback[0]
+            top.append((f"{frame.filename}:{frame.lineno}", stat.size_diff, stat.count_diff, stat.size))
+        return {"peak": peak, "current": current, "top": top}
+
+    # --- Index advisor ---
+
+    # Keywords that can follow a table name and must not be read as its alias
+    _ALIAS_STOPWORDS = {
+        "WHERE", "ON", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "NATURAL",
+        "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "USING", "WINDOW"
+    }
+
+    def _table_aliases(self, processed_query):
+        """Map every FROM/JOIN alias (and bare table name) in a processed query to its SQL table"""
+        aliases = {}
+        sql_names = set(self.table_mapping.values())
+        pattern = r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?'
+        for table, alias in re.findall(pattern, processed_query, flags=re.IGNORECASE):
+            if table not in sql_names or table in self.partition_views:
+                continue  # Views cannot be indexed; their plans name the underlying tables
+            aliases[table.lower()] = table
+            if alias and alias.upper() not in self._ALIAS_STOPWORDS:
+                aliases[alias.lower()] = table
+        return aliases
+
+    def _predicate_columns(self, processed_query):
+        """Return (qualifier, column) pairs used in comparisons, e.g. a.id = b.id or qty > 5"""
+        # Blank out string literals so their contents are not mistaken for columns
+        query = re.sub(r"'(?:[^']|'')*'", "''", processed_query)
+        ident = r'(?:"?(\w+)"?\.)?"?([A-Za-z_]\w*)"?'
+        operator = r'(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bLIKE\b|\bIS\b)'
+        refs = set(re.findall(ident + r'\s*' + operator, query, flags=re.IGNORECASE))
+        refs |= set(re.findall(r'(?:=|<>|!=|<=|>=|<|>)\s*' + ident, query))
+        return {(qualifier.lower(), column.lower()) for qualifier, column in refs}
+
+    def _table_columns(self, sql_name):
+        """Return {lowercase name: actual name} for the columns of a table"""
+        cursor = self.conn.execute(f'PRAGMA table_info("{sql_name}")')
+        return {row[1].lower(): row[1] for row in cursor.fetchall()}
+
+    def _indexed_columns(self, sql_name):
+        """Return the set of columns that lead an existing index on a table"""
+        indexed = set()
+        for index_row in self.conn.execute(f'PRAGMA index_list("{sql_name}")').fetchall():
+            info = self.conn.execute(f'PRAGMA index_info("{index_row[1]}")').fetchall()
+            if info:
+                indexed.add(info[0][2].lower())
+        return indexed
+
+    def advise_indexes(self, processed_query):
+        """
+        Inspect EXPLAIN QUERY PLAN for an executed query and count full scans
+        (and throw-away automatic indexes) on its join and filter columns.
+        Returns the list of indexes created automatically, if any.
+        """
+        if not self.index_advisor_enabled or not self.conn:
+            return []
+
+        try:
+            plan = self.conn.execute(f"EXPLAIN QUERY PLAN {processed_query}").fetchall()
+            aliases = self._table_aliases(processed_query)
+            predicates = self._predicate_columns(processed_query)
+
+            scanned = set()
+            for row in plan:
+                detail = row[-1]
+                # SQLite builds an automatic index on every execution when it lacks a real one
+                auto_match = re.match(r'SEARCH (\w+) USING AUTOMATIC (?:COVERING |PARTIAL )?INDEX \((\w+)', detail)
+                scan_match = re.match(r'SCAN (\w+)$', detail)
+                if auto_match:
+                    table = aliases.get(auto_match.group(1).lower())
+                    if table:
+                        columns = self._table_columns(table)
+                        if auto_match.group(2).lower() in columns:
+                            scanned.add((table, columns[auto_match.group(2).lower()]))
+                elif scan_match:
+                    name = scan_match.group(1).lower()
+                    table = aliases.get(name)
+                    if not table:
+                        continue
+                    columns = self._table_columns(table)
+                    for qualifier, column in predicates:
+                        # Unqualified columns only count when the query reads a single table
+                        if column in columns and (qualifier == name or (not qualifier and len(set(aliases.values())) == 1)):
+                            scanned.add((table, columns[column]))
+
+            for table, column in scanned:
+                if column.lower() not in self._indexed_columns(table):
+                    self.index_scan_counts[(table, column)] += 1
+        except sqlite3.Error as e:
+            print(f"Index advisor could not inspect query plan: {e}")  # Keep for console debug
+            return []
+
+        if not self.auto_create_indexes:
+            return []
+
+        created = []
+        for table, column in self.get_index_suggestions():
+            if len(self.created_indexes) >= self.index_budget:
+                break
+            if self.create_index(table, column):
+                created.append((table, column))
+        if created:
+            self.report_status(f"Index advisor created {len(created)} index(es): " +
+                               ", ".join(f"{t}({c})" for t, c in created))
+        return created
+
+    def get_index_suggestions(self):
+        """Return (sql_table, column) pairs scanned often enough to deserve an index, most scanned first"""
+        suggestions = []
+        for (table, column), count in self.index_scan_counts.most_common():
+            if count < self.index_scan_threshold:
+                break
+            if (table, column) not in self.created_indexes:
+                suggestions.append((table, column))
+        return suggestions
+
+    def create_index(self, sql_name, column, persist=True):
+        """Create an index on a loaded table column and remember it for later sessions"""
+        index_name = re.sub(r'\W', '_', f"esd_ix_{sql_name}_{column}")
+        try:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{sql_name}" ("{column}")')
+            self.conn.execute(f'ANALYZE "{sql_name}"')
+        except sqlite3.Error as e:
+            print(f"Error creating index on {sql_name}({column}): {e}")  # Keep for console debug
+            return False
+
+        if (sql_name, column) not in self.created_indexes:
+            self.created_indexes.append((sql_name, column))
+        self.index_scan_counts.pop((sql_name, column), None)
+        if persist:
+            self._save_index_cache()
+        return True
+
+    def _load_folder_cache(self, cache_filename):
+        """Return this folder's entries from a JSON cache in ESD_HOME keyed by folder path"""
+        try:
+            with open(os.path.join(ESD_HOME, cache_filename), encoding='utf-8') as f:
+                return json.load(f).get(os.path.abspath(self.file_path), [])
+        except (OSError, ValueError, AttributeError):
+            return []
+
+    def _save_folder_cache(self, cache_filename, entries):
+        """Replace this folder's entries in a JSON cache in ESD_HOME"""
+        if not self.file_path:
+            return
+        cache_path = os.path.join(ESD_HOME, cache_filename)
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[os.path.abspath(self.file_path)] = entries
+        try:
+            os.makedirs(ESD_HOME, exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"Could not save {cache_filename}: {e}")  # Keep for console debug
+
+    def _save_index_cache(self):
+        """Persist the advisor-created indexes of the current folder"""
+        self._save_folder_cache("index_cache.json", [
+            {"table": table, "column": column} for table, column in self.created_indexes
+        ])
+
+    def restore_persisted_indexes(self, collected_warnings):
+        """Re-create indexes that the advisor built for this folder in earlier sessions"""
+        entries = self._load_folder_cache("index_cache.json")
+        sql_names = set(self.table_mapping.values()) - set(self.partition_views)
+        restored = 0
+        for entry in entries:
+            table, column = entry.get("table"), entry.get("column")
+            if table not in sql_names or column not in self._table_columns(table).values():
+                continue  # Sheet or column no longer exists in the workbook
+            if self.create_index(table, column, persist=False):
+                restored += 1
+        if restored:
+            collected_warnings.append((f"Restored {restored} index(es) created by the index advisor.", "info"))
+
+    # --- Summary tables ---
+
+    def define_summary_table(self, name, query, persist=True):
+        """
+        Materialize a read-only query over loaded sheets as a real table that can be queried
+        as summary.<name>. It is rebuilt whenever one of its source tables is reloaded and
+        re-created from its saved definition when the folder is opened again.
+        """
+        if not re.fullmatch(r'[A-Za-z_]\w*', name or ""):
+            raise ValueError("Summary table names may only contain letters, digits and underscores")
+        dot_name = f"{self.summary_file}.{name}"
+        if dot_name in self.table_mapping and name not in self.summary_tables:
+            raise ValueError(f"'{dot_name}' is already a loaded sheet")
+        self.validate_query(query)
+        sources = self._summary_sources(self.process_query(query.strip().rstrip(';'), rewrite=False))
+        if not sources:
+            raise ValueError("The query does not read any loaded sheet")
+        summary_sql_names = {d["sql_name"] for other, d in self.summary_tables.items() if other != name}
+        if sources & summary_sql_names:
+            raise ValueError("Summary tables cannot be built from other summary tables")
+
+        self.summary_tables[name] = {"query": query.strip().rstrip(';'),
+                                     "sql_name": f"esd_summary_{name.lower()}",
+                                     "sources": sorted(sources)}
+        try:
+            self._build_summary_table(name)
+        except sqlite3.Error:
+            del self.summary_tables[name]
+            raise
+        if persist:
+            self._save_summary_definitions()
+        return self.summary_tables[name]
+
+    def drop_summary_table(self, name):
+        definition = self.summary_tables.pop(name)
+        self._summary_shapes.pop(name, None)
+        self.conn.execute(f'DROP TABLE IF EXISTS "{definition["sql_name"]}"')
+        self.table_mapping.pop(f"{self.summary_file}.{name}", None)
+        self.inferred_schema.pop(definition["sql_name"], None)
+        self.stats_catalog.pop(definition["sql_name"], None)
+        self._save_summary_definitions()
+
+    def refresh_summary_tables(self, changed_tables, collected_warnings):
+        """Rebuild the summary tables that read any of the changed tables (directly or through a view)"""
+        changed = set(changed_tables)
+        for view, members in self.partition_views.items():
+            if any(sql_name in changed for _, sql_name in members):
+                changed.add(view)
+        for name, definition in list(self.summary_tables.items()):
+            if not changed & set(definition["sources"]):
+                continue
+            try:
+                self._build_summary_table(name)
+            except sqlite3.Error as e:
+                collected_warnings.append((f"Could not refresh summary table '{name}': {e}", "error"))
+
+    def restore_summary_tables(self, collected_warnings):
+        """Re-create the summary tables defined for this folder in earlier sessions"""
+        for entry in self._load_folder_cache(self.summary_cache_filename):
+            name, query = entry.get("name"), entry.get("query")
+            try:
+                self.define_summary_table(name, query, persist=False)
+            except (sqlite3.Error, ValueError, DatabaseError) as e:
+                collected_warnings.append((f"Summary table '{name}' was not restored: {e}", "error"))
+        if self.summary_tables:
+            collected_warnings.append(
+                (f"Built {len(self.summary_tables)} summary table(s) from saved definitions.", "info"))
+
+    def _summary_sources(self, processed_query):
+        loaded = set(self.table_mapping.values())
+        return {name for name in re.findall(r'"(\w+)"', processed_query) if name in loaded}
+
+    def _build_summary_table(self, name):
+        """(Re)create one summary table from its definition and register it in table_mapping"""
+        definition = self.summary_tables[name]
+        sql_name = definition["sql_name"]
+        processed_query = self.process_query(definition["query"], rewrite=False)
+        with self.perf.span("build_summary", summary=name):
+            self.conn.execute(f'DROP TABLE IF EXISTS "{sql_name}"')
+            self.conn.execute(f'CREATE TABLE "{sql_name}" AS {processed_query}')
+            self.conn.commit()
+
+        # CREATE TABLE AS declares INT/REAL for numeric expressions; keep them typed in results
+        declared = {"INT": "INTEGER", "REAL": "REAL"}
+        self.inferred_schema[sql_name] = {
+            row[1]: declared[row[2]] for row in self.conn.execute(f'PRAGMA table_info("{sql_name}")')
+            if row[2] in declared
+        }
+        self.table_mapping[f"{self.summary_file}.{name}"] = sql_name
+        self.stats_catalog.pop(sql_name, None)
+        definition["rows"] = self.get_row_count(sql_name)
+        definition["refreshed"] = datetime.now().isoformat(timespec="seconds")
+        self._summary_shapes[name] = self._summary_shape(name)
+
+    def _save_summary_definitions(self):
+        self._save_folder_cache(self.summary_cache_filename, [
+            {"name": name, "query": definition["query"]} for name, definition in self.summary_tables.items()
+        ])
+
+    # --- Full-text indexes ---
+
+    def detect_text_columns(self, sql_name):
+        """Text columns whose values average at least text_index_min_length characters"""
+        schema = self.inferred_schema.get(sql_name, {})
+        detected = []
+        for column in self._table_columns(sql_name).values():
+            if schema.get(column, "TEXT") != "TEXT":
+                continue
+            average = self.conn.execute(
+                f'SELECT AVG(LENGTH("{column}")) FROM (SELECT "{column}" FROM "{sql_name}" '
+                f'WHERE "{column}" IS NOT NULL LIMIT 1000)').fetchone()[0]
+            if average is not None and average >= self.text_index_min_length:
+                detected.append(column)
+        return detected
+
+    def create_text_index(self, sql_name, columns=None, persist=True):
+        """
+        Build an FTS5 index over columns of a loaded table (by default the detected free-text
+        columns) so queries can search it with file.sheet MATCH '...' or
+        file.sheet.column MATCH '...'. Returns the indexed columns.
+        """
+        columns = list(columns) if columns else self.detect_text_columns(sql_name)
+        if not columns:
+            raise ValueError("No free-text columns to index")
+        fts_name = f"{sql_name}__fts"
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        with self.perf.span("build_text_index", table=sql_name, columns=len(columns)):
+            self.conn.execute(f'DROP TABLE IF EXISTS "{fts_name}"')
+            try:
+                self.conn.execute(
+                    f'CREATE VIRTUAL TABLE "{fts_name}" USING fts5({column_list}, content=\'{sql_name}\', '
+                    f'content_rowid=\'rowid\', tokenize=\'{self.text_index_tokenizer}\')')
+            except sqlite3.OperationalError as e:
+                if "fts5" in str(e):
+                    raise DatabaseError("This SQLite build has no FTS5 full-text search support") from e
+                raise
+            self.conn.execute(f'INSERT INTO "{fts_name}" ("{fts_name}") VALUES (\'rebuild\')')
+            self.conn.commit()
+        self.text_indexes[sql_name] = columns
+        if persist:
+            self._save_text_index_cache()
+        return columns
+
+    def drop_text_index(self, sql_name):
+        self.text_indexes.pop(sql_name, None)
+        self.conn.execute(f'DROP TABLE IF EXISTS "{sql_name}__fts"')
+        self._save_text_index_cache()
+
+    def restore_text_indexes(self, collected_warnings):
+        """Re-create the text indexes built for this folder in earlier sessions"""
+        restored = 0
+        for entry in self._load_folder_cache(self.text_index_cache_filename):
+            table, columns = entry.get("table"), entry.get("columns") or []
+            if table in self.text_indexes or table not in self.table_mapping.values():
+                continue  # Already built during the load, or the sheet no longer exists
+            available = self._table_columns(table).values()
+            columns = [column for column in columns if column in available]
+            if not columns:
+                continue
+            try:
+                self.create_text_index(table, columns, persist=False)
+                restored += 1
+            except (sqlite3.Error, ValueError) as e:
+                collected_warnings.append((f"Text index on '{table}' was not restored: {e}", "error"))
+        if restored:
+            collected_warnings.append((f"Restored {restored} full-text index(es).", "info"))
+
+    def _index_loaded_sheet(self, sql_name, sheet_display_name, collected_warnings):
+        """Rebuild a reloaded sheet's text index, or index it automatically (text_index_auto)"""
+        available = self._table_columns(sql_name).values()
+        columns = [column for column in self.text_indexes.get(sql_name, []) if column in available]
+        try:
+            if columns:
+                self.create_text_index(sql_name, columns, persist=False)
+            elif self.detect_text_columns(sql_name):
+                columns = self.create_text_index(sql_name, persist=False)
+                collected_warnings.append(
+                    (f"'{sheet_display_name}': full-text index built over {', '.join(columns)}.", "info"))
+            else:
+                self.text_indexes.pop(sql_name, None)
+        except (sqlite3.Error, ValueError) as e:
+            collected_warnings.append((f"'{sheet_display_name}': text index not built: {e}", "error"))
+
+    def _save_text_index_cache(self):
+        self._save_folder_cache(self.text_index_cache_filename, [
+            {"table": table, "columns": columns} for table, columns in self.text_indexes.items()
+        ])
+
+    def _rewrite_text_matches(self, query):
+        """
+        Turn file.sheet MATCH '...' and file.sheet.column MATCH '...' into a rowid lookup in
+        the sheet's FTS5 index. Runs before table names are replaced; the rowid qualifier is
+        fixed up for aliases by _qualify_text_matches afterwards.
+        """
+        for dot_name, sql_name in sorted(self.table_mapping.items(), key=lambda item: len(item[0]), reverse=True):
+            pattern = (r'\b' + re.escape(dot_name) + r'(?:\.(\w+))?\s+MATCH\s+(\'(?:[^\']|\'\')*\')')
+            matches = list(re.finditer(pattern, query, flags=re.IGNORECASE))
+            if not matches:
+                continue
+            columns = self.text_indexes.get(sql_name)
+            if not columns:
+                raise DatabaseError(f"'{dot_name}' has no full-text index; create a text index on {dot_name} first")
+
+            def replace(match):
+                search = match.group(2)
+                if match.group(1):
+                    column = next((c for c in columns if c.lower() == match.group(1).lower()), None)
+                    if column is None:
+                        raise DatabaseError(f"Column '{match.group(1)}' is not in the text index of '{dot_name}' "
+                                            f"(indexed: {', '.join(columns)})")
+                    search = f"'{column} : (" + search[1:-1] + ")'"
+                fts_name = f"{sql_name}__fts"
+                return (f'"{sql_name}".rowid IN (SELECT rowid FROM "{fts_name}" '
+                        f'WHERE "{fts_name}" MATCH {search})')
+
+            query = re.sub(pattern, replace, query, flags=re.IGNORECASE)
+        return query
+
+    def _qualify_text_matches(self, processed_query):
+        """Use the FROM alias of an aliased table for the rowid of its text-index lookups"""
+        for alias, sql_name in self._table_aliases(processed_query).items():
+            if alias != sql_name.lower():
+                processed_query = processed_query.replace(
+                    f'"{sql_name}".rowid IN (SELECT rowid FROM "{sql_name}__fts"',
+                    f'{alias}.rowid IN (SELECT rowid FROM "{sql_name}__fts"')
+        return processed_query
+
+    # --- Row samples for approximate mode ---
+
+    def build_samples(self, sql_name, df, column_types, collected_warnings):
+        """
+        Store a uniform and, when the sheet has a suitable text column, a stratified sample of
+        a large sheet next to its table. Every sample row carries a weight column with the
+        number of sheet rows it stands for and the number of rows sampled from its stratum
+        (the whole sheet for the uniform sample). The stratified sample keeps at least
+        sample_min_per_stratum rows of each value of the stratum column, so small groups
+        survive; approximate queries grouped by that column use it.
+        """
+        previous = self.sample_tables.pop(sql_name, None)
+        if previous:
+            for key in ("uniform", "stratified"):
+                if previous.get(key):
+                    self.conn.execute(f'DROP TABLE IF EXISTS "{previous[key]}"')
+        total_rows = len(df.index)
+        if total_rows < self.sample_min_rows:
+            return
+
+        with self.perf.span("build_samples", table=sql_name, rows=total_rows):
+            target = min(total_rows, max(self.sample_min_size, int(total_rows * self.sample_fraction)))
+            dtype = dict(column_types or {}, **{self.sample_weight_column: "REAL", self.sample_size_column: "INTEGER"})
+
+            uniform = df.sample(n=target, random_state=self.sample_seed)
+            uniform[self.sample_weight_column] = total_rows / target
+            uniform[self.sample_size_column] = target
+            entry = {"rows": total_rows, "uniform": f"{sql_name}__uniform_sample", "uniform_rows": target,
+                     "stratified": None, "stratified_rows": None, "stratum": None}
+            uniform.to_sql(entry["uniform"], self.conn, index=False, if_exists='replace', dtype=dtype)
+
+            stratum = self._stratum_column(uniform[df.columns], column_types)
+            if stratum is not None:
+                parts = []
+                for _, group in df.groupby(stratum, dropna=False, sort=False):
+                    share = max(self.sample_min_per_stratum, round(target * len(group.index) / total_rows))
+                    part = group.sample(n=min(len(group.index), share), random_state=self.sample_seed)
+                    part[self.sample_weight_column] = len(group.index) / len(part.index)
+                    part[self.sample_size_column] = len(part.index)
+                    parts.append(part)
+                stratified = pd.concat(parts, ignore_index=True)
+                entry.update(stratified=f"{sql_name}__stratified_sample", stratified_rows=len(stratified.index),
+                             stratum=stratum)
+                stratified.to_sql(entry["stratified"], self.conn, index=False, if_exists='replace', dtype=dtype)
+            self.sample_tables[sql_name] = entry
+
+        sheet = next((dot for dot, name in self.table_mapping.items() if name == sql_name), sql_name)
+        strata_note = f" and a sample stratified by {stratum}" if stratum else ""
+        collected_warnings.append((f"'{sheet}': kept a {target:,}-row sample{strata_note} for approximate queries.",
+                                   "info"))
+
+    def _stratum_column(self, sample, column_types):
+        """Text column with the most distinct values, as long as there are at most sample_max_strata"""
+        best, best_count = None, 1
+        for column in sample.columns:
+            if (column_types or {}).get(column, "TEXT") != "TEXT":
+                continue
+            count = sample[column].nunique(dropna=False)
+            if best_count < count <= self.sample_max_strata:
+                best, best_count = column, count
+        return best
+
+    def approximate_query(self, processed_query):
+        """
+        Plan a single-table aggregate query against a sample of its table. COUNT, SUM and TOTAL
+        are scaled by the sample weights and AVG weighted; MIN and MAX are the sample's.
+        Returns None when the query cannot be approximated (no sample, joins, DISTINCT or
+        GROUP_CONCAT aggregates), otherwise a dict with the SQL to run, the sample used and,
+        per scaled aggregate column, the variance expression its confidence bound comes from.
+        """
+        query = self._parse_aggregate_query(processed_query)
+        if query is None or not query["aggregates"]:
+            return None
+        sql_name = query["table"].strip('"')
+        samples = self.sample_tables.get(sql_name)
+        if not samples or "stratified_rows" not in samples:
+            return None  # No sample, or one from a workspace saved before per-stratum sample sizes were kept
+
+        stratified = samples["stratified"] is not None and samples["stratum"].lower() in query["group"]
+        sample_table = samples["stratified"] if stratified else samples["uniform"]
+        weight, size = f'"{self.sample_weight_column}"', f'"{self.sample_size_column}"'
+
+        select, bounds = [], []
+        for expr, alias in query["items"]:
+            scaled, variance = self._scale_aggregates(expr, weight, size)
+            if scaled is None:
+                return None
+            quoted_alias = alias.replace('"', '""')
+            select.append(f'{scaled} AS "{quoted_alias}"')
+            if variance is not None:
+                bounds.append((alias, f"__esd_variance_{len(bounds)}"))
+                select.append(f'{variance} AS "{bounds[-1][1]}"')
+
+        approximate = f'SELECT {", ".join(select)} FROM "{sample_table}"'
+        if query["where"]:
+            approximate += " WHERE " + " AND ".join(f"({condition})" for condition in query["where"])
+        if query["group"]:
+            approximate += " GROUP BY " + ", ".join(query["group"])
+        for clause, text in (("HAVING ", query["having"]), ("", query["tail"])):
+            if text:
+                scaled, _ = self._scale_aggregates(text, weight, size)
+                if scaled is None:
+                    return None
+                approximate += f" {clause}{scaled}"
+
+        sample_rows = samples["stratified_rows"] if stratified else samples["uniform_rows"]
+        return {"query": approximate, "bounds": bounds, "table": sql_name,
+                "sample": "stratified" if stratified else "uniform",
+                "fraction": sample_rows / samples["rows"]}
+
+    def _scale_aggregates(self, expr, weight, size):
+        """
+        Rewrite the aggregate calls in a normalized expression to weighted estimates. Returns
+        (expression, variance) where variance estimates the variance of the expression when it
+        is a single COUNT/SUM/TOTAL call, else None; the expression is None if an aggregate
+        cannot be scaled.
+
+        Samples are drawn without replacement, so the variance of an estimated total is
+        N^2 (1 - f) s^2 / n for a stratum of N rows sampled n at a time (f = n / N, s^2 the
+        sample variance of the row values, rows outside the WHERE filter or group counting as
+        0). Every group of a stratified query lies in a single stratum, and the uniform sample
+        is one stratum, so N / n and n are constant within a group: N^2 (1 - f) / n is
+        w (w - 1) n with w the weight. A fully sampled stratum (w = 1) or a count of every row
+        has no variance.
+        """
+        pieces, position, variance = [], 0, None
+        for match in _AGGREGATE_CALL_PATTERN.finditer(expr):
+            if match.start() < position or self._in_string_literal(expr, match.start()):
+                continue
+            end = self._closing_parenthesis(expr, match.end() - 1)
+            function, argument = match.group(1), expr[match.end():end] if end is not None else ""
+            if end is None or function == "group_concat" or argument.startswith("distinct"):
+                return None, None
+            if function == "count":
+                present = weight if argument == "*" else f"CASE WHEN ({argument}) IS NOT NULL THEN {weight} END"
+                scaled = f"CAST(COALESCE(ROUND(SUM({present})), 0) AS INTEGER)"
+                value = "1" if argument == "*" else f"CASE WHEN ({argument}) IS NOT NULL THEN 1 ELSE 0 END"
+                call_variance = self._total_variance(value, weight, size)
+            elif function in ("sum", "total"):
+                scaled = f"{function.upper()}(({argument}) * {weight})"
+                call_variance = self._total_variance(f"COALESCE({argument}, 0)", weight, size)
+            elif function == "avg":
+                scaled = (f"SUM(({argument}) * {weight}) / "
+                          f"SUM(CASE WHEN ({argument}) IS NOT NULL THEN {weight} END)")
+                call_variance = None
+            else:
+                scaled, call_variance = expr[match.start():end + 1], None  # MIN/MAX of the sample
+            if match.start() == 0 and end == len(expr) - 1:
+                variance = call_variance
+            pieces.extend([expr[position:match.start()], scaled])
+            position = end + 1
+        pieces.append(expr[position:])
+        return "".join(pieces), variance
+
+    def _total_variance(self, value, weight, size):
+        """Variance of an estimated group total of value (see _scale_aggregates)"""
+        n = f"MAX({size})"
+        spread = f"(SUM(({value}) * ({value})) - 1.0 * SUM({value}) * SUM({value}) / {n}) / ({n} - 1)"
+        return f"CASE WHEN {n} > 1 THEN MAX({weight}) * (MAX({weight}) - 1) * {n} * {spread} ELSE 0 END"
+
+    def _add_confidence_bounds(self, result_df, plan):
+        """Replace the variance columns of an approximate result with ± bound columns"""
+        for alias, variance_column in plan["bounds"]:
+            variance = pd.to_numeric(result_df.pop(variance_column), errors="coerce").clip(lower=0)
+            position = result_df.columns.get_loc(alias) + 1 if alias in result_df.columns else len(result_df.columns)
+            result_df.insert(position, f"{alias} ±", self.confidence_z * variance ** 0.5, allow_duplicates=True)
+
+    # --- Summary rewrite ---
+
+    def rewrite_with_summaries(self, processed_query):
+        """
+        Redirect a single-table aggregate query to the smallest summary table that can answer
+        it: the same table, GROUP BY keys that are a subset of the summary's, the summary's
+        filters plus any further filters on its keys, and aggregates the summary holds (SUM,
+        COUNT, MIN and MAX roll up to coarser groups; anything else needs the same keys).
+        Returns the query unchanged when no summary matches.
+        """
+        query = self._parse_aggregate_query(processed_query)
+        if query is None or not query["aggregates"]:
+            return processed_query
+
+        best = None
+        for name, definition in self.summary_tables.items():
+            summary = self._summary_shapes.get(name)
+            if summary is None or summary["table"] != query["table"]:
+                continue
+            rewritten = self._rewrite_for_summary(query, summary, definition["sql_name"])
+            if rewritten is not None and (best is None or definition.get("rows", 0) < best[0]):
+                best = (definition.get("rows", 0), name, rewritten)
+        if best is None:
+            return processed_query
+        return SUMMARY_REWRITE_MARK.format(f"{self.summary_file}.{best[1]}") + best[2]
+
+    def summary_rewrite_of(self, processed_query):
+        """Dot name of the summary table a processed query was redirected to, or None"""
+        prefix, _, rest = SUMMARY_REWRITE_MARK.partition("{}")
+        if not processed_query.startswith(prefix):
+            return None
+        return processed_query[len(prefix):].partition(rest)[0]
+
+    def _summary_shape(self, name):
+        """
+        Parsed definition of a summary table, with the table column holding each select item.
+        Computed when the table is built or restored, on the connection's own thread, so the
+        rewrite stage never touches the database.
+        """
+        definition = self.summary_tables[name]
+        shape = self._parse_aggregate_query(self.process_query(definition["query"], rewrite=False))
+        columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info("{definition["sql_name"]}")')]
+        if shape is not None and (shape["having"] or shape["tail"] and "limit" in shape["tail"]
+                                  or len(columns) != len(shape["items"])):
+            shape = None  # HAVING or LIMIT drop groups, so the table no longer holds every group
+        if shape is not None:
+            shape["columns"] = {expr: column for (expr, _), column in zip(shape["items"], columns)}
+            if not all(key in shape["columns"] for key in shape["group"]):
+                shape = None  # Every grouping key must be selected to filter and regroup on it
+        return shape
+
+    def _parse_aggregate_query(self, processed_query):
+        """
+        Split a single-table SELECT ... GROUP BY query into normalized parts, or return None
+        for anything else (joins, subqueries, compound selects, DISTINCT, window functions).
+        """
+        clean_query = re.sub(r'--.*?$', '', processed_query, flags=re.MULTILINE)
+        clean_query = re.sub(r'/\*.*?\*/', '', clean_query, flags=re.DOTALL)
+        match = _AGGREGATE_QUERY_PATTERN.match(clean_query)
+        if match is None or len(re.findall(r'\bSELECT\b', clean_query, re.IGNORECASE)) > 1:
+            return None
+        if re.search(r'\b(?:UNION|INTERSECT|EXCEPT|OVER|JOIN)\b', clean_query, re.IGNORECASE):
+            return None
+        select = match.group("select")
+        if re.match(r'(?:DISTINCT|ALL)\b', select, re.IGNORECASE):
+            return None
+
+        qualifiers = [match.group("table")] + ([match.group("alias")] if match.group("alias") else [])
+
+        def normalize(text):
+            return self._normalize_expression(text, qualifiers)
+
+        items = []
+        for item in self._split_top_level(select, ","):
+            alias_match = re.match(r'(?P<expr>.+?)\s+(?:AS\s+)?(?P<alias>"[^"]+"|\w+)$', item.strip(),
+                                   re.IGNORECASE | re.DOTALL)
+            if alias_match and (not re.search(r'[\w)"\']$', alias_match.group("expr"))
+                                or alias_match.group("alias").lower() in _SQL_WORDS):
+                alias_match = None  # e.g. "a + b" or "CASE ... END" end in an operand, not an alias
+            expr, alias = (alias_match.group("expr"), alias_match.group("alias")) if alias_match else (item, None)
+            if alias is None:
+                # Without an alias SQLite names a column reference by the column, anything else by its text
+                bare = normalize(expr)
+                alias = expr.strip().split(".")[-1] if re.fullmatch(r'"[^"]+"|\w+', bare) else expr.strip()
+            items.append((normalize(expr), alias.strip('"')))
+        if any(expr == "*" for expr, _ in items):
+            return None
+
+        where = match.group("where")
+        return {
+            "table": match.group("table"),
+            "items": items,
+            "where": [normalize(c) for c in self._split_conjuncts(where)] if where else [],
+            "group": [normalize(key) for key in self._split_top_level(match.group("group") or "", ",")],
+            "having": normalize(match.group("having")) if match.group("having") else None,
+            "tail": normalize(match.group("tail")) if match.group("tail") else None,
+            "aggregates": any(_AGGREGATE_CALL_PATTERN.search(expr) for expr, _ in items),
+        }
+
+    def _rewrite_for_summary(self, query, summary, summary_sql_name):
+        """Build the query against one summary table, or return None if it cannot answer it"""
+        if not set(query["group"]) <= set(summary["group"]):
+            return None
+        if not set(summary["where"]) <= set(query["where"]):
+            return None
+
+        exact = set(query["group"]) == set(summary["group"])
+        key_columns = {key: summary["columns"][key] for key in summary["group"]}
+        group_columns = {key: key_columns[key] for key in query["group"]}
+
+        residual = []
+        for condition in query["where"]:
+            if condition in summary["where"]:
+                continue
+            mapped = self._map_summary_expression(condition, summary, key_columns, exact, allow_aggregates=False)
+            if mapped is None:
+                return None  # Filters on anything but the summary's keys need the source rows
+            residual.append(mapped)
+
+        select = []
+        for expr, alias in query["items"]:
+            mapped = self._map_summary_expression(expr, summary, group_columns, exact)
+            if mapped is None:
+                return None
+            select.append(f'{mapped} AS "{alias.replace(chr(34), chr(34) * 2)}"')
+
+        rewritten = f'SELECT {", ".join(select)} FROM "{summary_sql_name}"'
+        if residual:
+            rewritten += " WHERE " + " AND ".join(f"({condition})" for condition in residual)
+        if query["group"]:
+            rewritten += " GROUP BY " + ", ".join(f'"{group_columns[key]}"' for key in query["group"])
+        if query["having"]:
+            having = self._map_summary_expression(query["having"], summary, group_columns, exact)
+            if having is None:
+                return None
+            rewritten += f" HAVING {having}"
+        if query["tail"]:
+            aliases = {alias.lower() for _, alias in query["items"]}
+            tail = self._map_summary_expression(query["tail"], summary, group_columns, exact, aliases)
+            if tail is None:
+                return None
+            rewritten += f" {tail}"
+        return rewritten
+
+    def _map_summary_expression(self, expr, summary, key_columns, exact, aliases=(), allow_aggregates=True):
+        """
+        Translate a normalized expression to summary columns: aggregate calls become the column
+        holding them (rolled up when the grouping is coarser) and key references become the key
+        column. Returns None if the expression reads anything the summary does not keep.
+        """
+        if exact and expr in summary["columns"] and expr not in key_columns and allow_aggregates:
+            return f'"{summary["columns"][expr]}"'
+
+        pieces = []
+        position = 0
+        for match in _AGGREGATE_CALL_PATTERN.finditer(expr):
+            if match.start() < position or self._in_string_literal(expr, match.start()):
+                continue
+            if not allow_aggregates:
+                return None
+            end = self._closing_parenthesis(expr, match.end() - 1)
+            column = summary["columns"].get(expr[match.start():end + 1]) if end is not None else None
+            if column is None:
+                return None
+            function = match.group(1)
+            distinct = expr.startswith("distinct", match.end())
+            if exact:
+                mapped = f'"{column}"'
+            elif function in ("sum", "total", "min", "max") and not distinct:
+                mapped = f'{function.upper()}("{column}")'
+            elif function == "count" and not distinct:
+                mapped = f'COALESCE(SUM("{column}"), 0)'
+            else:
+                return None  # AVG, GROUP_CONCAT and DISTINCT aggregates do not roll up
+            pieces.extend([self._map_key_references(expr[position:match.start()], key_columns, aliases), mapped])
+            position = end + 1
+        pieces.append(self._map_key_references(expr[position:], key_columns, aliases))
+        if any(piece is None for piece in pieces):
+            return None
+        return "".join(pieces)
+
+    def _map_key_references(self, text, key_columns, aliases):
+        """Replace column references in text with summary key columns; None if one is not a key"""
+        unknown = []
+
+        def replace(match):
+            token = match.group()
+            if token.startswith("'") or token in _SQL_WORDS:
+                return token
+            if token in key_columns:
+                return f'"{key_columns[token]}"'
+            if token.strip('"') not in aliases:
+                unknown.append(token)
+            return token
+
+        mapped = _SQL_IDENTIFIER_PATTERN.sub(replace, text)
+        return None if unknown else mapped
+
+    def _normalize_expression(self, text, qualifiers):
+        """Lower-case an expression outside string literals, drop table qualifiers and redundant quotes"""
+        parts = re.split(r"('(?:[^']|'')*')", text)
+        for i in range(0, len(parts), 2):
+            code = parts[i]
+            for qualifier in qualifiers:
+                code = re.sub(r'(?<![\w"])' + re.escape(qualifier) + r'\.', '', code, flags=re.IGNORECASE)
+            code = re.sub(r'"(\w+)"', r'\1', code).lower()
+            code = re.sub(r'\s+', ' ', code)
+            parts[i] = re.sub(r'\s*([(),])\s*', r'\1', code)
+        return "".join(parts).strip()
+
+    def _split_top_level(self, text, separator):
+        """Split on separator outside parentheses and string literals"""
+        pieces, depth, current, quote = [], 0, [], None
+        for char in text:
+            if quote:
+                quote = None if char == quote else quote
+            elif char in "'\"":
+                quote = char
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == separator and depth == 0:
+                pieces.append("".join(current).strip())
+                current = []
+                continue
+            current.append(char)
+        if "".join(current).strip():
+            pieces.append("".join(current).strip())
+        return pieces
+
+    def _split_conjuncts(self, where):
+        """Split a WHERE clause on top-level AND, keeping BETWEEN ... AND ... together"""
+        masked = re.sub(r"'(?:[^']|'')*'", lambda m: "_" * len(m.group()), where)
+        conjuncts, start, depth, pending_between = [], 0, 0, False
+        for token in re.finditer(r"\(|\)|\bBETWEEN\b|\bAND\b", masked, re.IGNORECASE):
+            word = token.group().upper()
+            if word == "(":
+                depth += 1
+            elif word == ")":
+                depth -= 1
+            elif depth == 0 and word == "BETWEEN":
+                pending_between = True
+            elif depth == 0 and word == "AND":
+                if pending_between:
+                    pending_between = False
+                    continue
+                conjuncts.append(where[start:token.start()].strip())
+                start = token.end()
+        conjuncts.append(where[start:].strip())
+        return [c for c in conjuncts if c]
+
+    def _closing_parenthesis(self, text, open_position):
+        depth = 0
+        for position in range(open_position, len(text)):
+            if self._in_string_literal(text, position):
+                continue
+            if text[position] == "(":
+                depth += 1
+            elif text[position] == ")":
+                depth -= 1
+                if depth == 0:
+                    return position
+        return None
+
+    def _in_string_literal(self, text, position):
+        return text.count("'", 0, position) % 2 == 1
+
+    def write_query_header(self, query, is_first_query):
+        """Write the header that precedes a query's results in the spool file"""
+        self.spool_file.write(f"\n--- Query executed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+        self.spool_file.write(f"{query}\n")
+        self.spool_file.write("-" * 80 + "\n")
+
+    def process_query(self, query, rewrite=True):
+        """
+        Converts file.sheet notation to SQL table names (e.g., "file_sheet")
+        while preserving aliases and not misinterpreting alias.column_name.
+        file.sheet MATCH '...' searches become lookups in the sheet's full-text index.
+        With rewrite (and summary_rewrite_enabled), aggregate queries a summary table can
+        answer are redirected to it; see rewrite_with_summaries and summary_rewrite_of.
+        """
+        started = self.perf.start()
+        processed_query = query
+
+        # Sort table mappings by the length of the dot_name in descending order.
+        # This ensures that if "file.sheet_a" and "file.sheet_a_b" exist,
+        # "file.sheet_a_b" is replaced first, preventing partial replacements.
+        sorted_table_mappings = sorted(self.table_mapping.items(), key=lambda item: len(item[0]), reverse=True)
+
+        text_match = re.search(r'\bMATCH\b', processed_query, flags=re.IGNORECASE) is not None
+        if text_match:
+            processed_query = self._rewrite_text_matches(processed_query)
+
+        # Iterate through the sorted table mappings and perform replacements.
+        # The key is to use a regex that specifically targets the table name
+        # and avoids matching alias.column_name patterns.
+        for dot_name, sql_name in sorted_table_mappings:
+            # Construct a regex pattern for the current dot_name.
+            # re.escape() handles special characters in dot_name (like the dot itself).
+            #
+            # IMPORTANT CHANGE HERE:
+            # The original pattern `\b` + re.escape(dot_name) + `\b(?!\.\w+)` was too restrictive.
+            # The final `\b` (word boundary) would fail if dot_name ended with a non-word char (like comma).
+            #
+            # New pattern:
+            # `\b` at the start ensures we match a whole word.
+            # `re.escape(dot_name)` matches the literal dot_name.
+            # `(?=\W|$)` is a positive lookahead that asserts the match is followed by
+            # a non-word character (`\W`) OR the end of the string (`$`).
+            # This allows dot_names ending in punctuation to be matched correctly.
+            # `(?!\.\w+)` is still needed to prevent matching `alias.column_name` where `alias` is a dot_name.
+            pattern = r'\b' + re.escape(dot_name) + r'(?=\W|$)(?!\.\w+)'
+
+            # Replace the found 'dot_name' with the quoted SQL table name.
+            # re.IGNORECASE ensures case-insensitive matching for the dot_name.
+            processed_query = re.sub(pattern, f'"{sql_name}"', processed_query, flags=re.IGNORECASE)
+
+        if text_match:
+            processed_query = self._qualify_text_matches(processed_query)
+
+        if rewrite and self.summary_rewrite_enabled and self.summary_tables:
+            processed_query = self.rewrite_with_summaries(processed_query)
+
+        self.perf.stop("process_query", started)
+        return processed_query
+
+    def validate_query(self, query):
+        """Basic query validation to prevent harmful operations, ignoring comments"""
+        # Remove single-line comments
+        clean_query = re.sub(r'--.*?$', '', query, flags=re.MULTILINE)
+        # Remove multi-line comments
+        clean_query = re.sub(r'/\*.*?\*/', '', clean_query, flags=re.DOTALL)
+
+        # Check for blocked keywords in the cleaned query
+        blocked_keywords = [
+            "DROP ", "DELETE ", "UPDATE ", "INSERT ", "ALTER ",
+            "CREATE ", "VACUUM ", "ATTACH ", "DETACH ", "PRAGMA ",
+            "TRANSACTION ", "ROLLBACK", "COMMIT", "REINDEX"
+        ]
+
+        # Convert the cleaned query to uppercase for case-insensitive comparison
+        clean_query_upper = clean_query.upper()
+
+        # Check if any blocked keyword is present in the cleaned query
+        if any(kw in clean_query_upper for kw in blocked_keywords):
+            raise DatabaseError("Modification queries are not allowed")
+
+        # Check for multiple statements by looking for more than one semicolon
+        # after stripping comments and leading/trailing whitespace
+        no_comments = clean_query.strip()
+        if no_comments.count(';') > 1 or (no_comments.count(';') == 1 and not no_comments.endswith(';')):
+            raise DatabaseError("Multiple statements not allowed")
+
+
+    def suggest_table_name(self, wrong_name):
+        """Suggest similar table names based on loaded tables"""
+        all_tables = list(self.table_mapping.keys())
+
+        # Prioritize exact case-insensitive matches
+        suggestions = [t for t in all_tables if t.lower() == wrong_name.lower()]
+        if suggestions:
+            return "\n- " + "\n- ".join(sorted(suggestions))
+
+        # Then, partial case-insensitive matches
+        suggestions = [t for t in all_tables if wrong_name.lower() in t.lower()]
+        if suggestions:
+            return "\n- " + "\n- ".join(sorted(suggestions))
+
+        # Finally, fuzzy matching on parts of the name
+        wrong_parts = re.split(r'[._\s]', wrong_name.lower())
+        fuzzy_suggestions = set()
+        for table in all_tables:
+            table_parts = re.split(r'[._\s]', table.lower())
+            if any(part in table_parts for part in wrong_parts if len(part) > 2):  # Only consider parts > 2 chars
+                fuzzy_suggestions.add(table)
+
+        if fuzzy_suggestions:
+            return "\n- " + "\n- ".join(sorted(list(fuzzy_suggestions)))
+
+        return None  # No suggestions found
+
+    def disable_spool(self):
+        """Disable spooling"""
+        if self.spool_file:
+            self.spool_file.close()
+            self.spool_file = None
+        self.spooling_active = False
+
+    def write_to_spool(self, content):
+        """Write content to spool file if active"""
+        if self.spooling_active:
+            self.spool_file.write(content)
+            self.spool_file.flush()
+
+    def split_statements(self, script_text):
+        """Split a script into statements on semicolons, dropping empty ones"""
+        return [q.strip() for q in script_text.split(';') if q.strip()]
+
+    def execute_statement(self, query):
+        """Validate, rewrite and run one statement; returns (processed_query, result DataFrame)"""
+        self.validate_query(query)
+        processed_query = self.process_query(query)
+        result_df = self.read_result(processed_query)
+        self.advise_indexes(processed_query)
+        return processed_query, result_df
+
+    def iter_statement_results(self, queries, validate=True, max_workers=None):
+        """
+        Run statements and yield (index, processed_query, result_df, error) in input order.
+        Consecutive read-only statements run concurrently on worker connections (see storage_mode);
+        any other statement runs alone on the main connection once everything before it is done.
+        """
+        max_workers = max_workers or self.parallel_workers
+        index = 0
+        while index < len(queries):
+            segment = []
+            while index < len(queries) and self._is_read_only(queries[index]):
+                segment.append(index)
+                index += 1
+
+            if len(segment) > 1 and max_workers > 1:
+                yield from self._run_parallel(queries, segment, max_workers)
+            else:
+                for i in segment:
+                    yield self._run_single(i, queries[i], validate)
+
+            if index < len(queries):
+                yield self._run_single(index, queries[index], validate)
+                index += 1
+
+    def _is_read_only(self, query):
+        try:
+            self.validate_query(query)
+            return True
+        except DatabaseError:
+            return False
+
+    def _run_single(self, index, query, validate):
+        """Run one statement on the main connection"""
+        processed_query = None
+        try:
+            if validate:
+                self.validate_query(query)
+            processed_query = self.process_query(query)
+            result_df = self.read_result(processed_query)
+            self.advise_indexes(processed_query)
+            return index, processed_query, result_df, None
+        except Exception as e:
+            return index, processed_query, None, e
+
+    def _run_parallel(self, queries, indices, max_workers):
+        """Run read-only statements on a thread pool and yield their results in input order"""
+        processed, errors = {}, {}
+        for i in indices:
+            try:
+                processed[i] = self.process_query(queries[i])
+            except Exception as e:
+                errors[i] = e  # Reported in its place; the other statements still run
+        if not processed:
+            for i in indices:
+                yield i, None, None, errors[i]
+            return
+        db_uri = self.worker_database_uri()
+        local = threading.local()
+        connections = []
+
+        def run(processed_query):
+            # One read-only connection per worker thread
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = self.connect_worker(db_uri)
+                connections.append(conn)
+            return self.read_result(processed_query, conn)
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(indices))) as pool:
+                futures = {i: pool.submit(run, query) for i, query in processed.items()}
+                try:
+                    for i in indices:
+                        if i in errors:
+                            yield i, None, None, errors[i]
+                            continue
+                        try:
+                            result_df = futures[i].result()
+                        except Exception as e:
+                            yield i, processed[i], None, e
+                            continue
+                        self.advise_indexes(processed[i])  # Main connection, so only from this thread
+                        yield i, processed[i], result_df, None
+                finally:
+                    for future in futures.values():
+                        future.cancel()  # Consumer stopped early; skip statements not started yet
+        finally:
+            for conn in connections:
+                conn.close()
+
+    def open_workspace_database(self):
+        """Replace the main connection with a new, empty database according to storage_mode"""
+        if self.conn:
+            self.conn.close()
+        if self._workspace_db_path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self._workspace_db_path + suffix):
+                    os.remove(self._workspace_db_path + suffix)
+
+        self._workspace_count += 1
+        self._workspace_uri = None
+        self._workspace_db_path = None
+        self._snapshot_signature = None
+        self._retire_snapshot()
+
+        if self.storage_mode == "memory":
+            self.conn = sqlite3.connect(':memory:')
+        elif self.storage_mode == "shared_memory":
+            # Lives as long as at least one connection to it is open, i.e. while self.conn is
+            self._workspace_uri = f"file:esd_{os.getpid()}_{id(self)}_{self._workspace_count}?mode=memory&cache=shared"
+            self.conn = sqlite3.connect(self._workspace_uri, uri=True)
+        elif self.storage_mode == "file":
+            self._workspace_db_path = os.path.join(self._get_temp_dir(), f"workspace_{self._workspace_count}.db")
+            self._workspace_uri = pathlib.Path(self._workspace_db_path).as_uri()
+            self.conn = sqlite3.connect(self._workspace_db_path)
+            self.conn.execute("PRAGMA journal_mode = WAL")  # Readers never block on the writer
+            self.conn.execute("PRAGMA synchronous = OFF")  # Scratch copy of the workbooks; no durability needed
+            self.conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        else:
+            raise ValueError(f"Unknown storage mode '{self.storage_mode}'")
+        self.conn.text_factory = str
+        if self.sql_functions_enabled:
+            register_functions(self.conn)
+
+    def save_workspace(self, path, extra=None):
+        """
+        Snapshot the database and the workspace metadata into one SQLite file using the
+        online backup API. extra is JSON-serializable app state such as query history.
+        """
+        metadata = {
+            "format": self.workspace_format,
+            "file_path": self.file_path,
+            "table_mapping": self.table_mapping,
+            "inferred_schema": self.inferred_schema,
+            "partition_views": self.partition_views,
+            "summary_tables": self.summary_tables,
+            "sample_tables": self.sample_tables,
+            "text_indexes": self.text_indexes,
+            "created_indexes": self.created_indexes,
+            "index_scan_counts": [[table, column, count] for (table, column), count in self.index_scan_counts.items()],
+            "load_warnings": self.load_warnings,
+            "extra": extra or {},
+        }
+        if os.path.exists(path):
+            os.remove(path)  # A stale file could otherwise keep its own journal mode or page size
+        dest = sqlite3.connect(path)
+        try:
+            self.conn.backup(dest)
+            dest.execute("PRAGMA journal_mode = DELETE")  # Keep the workspace a single file
+            dest.execute(f'CREATE TABLE "{self.workspace_meta_table}" (key TEXT PRIMARY KEY, value TEXT)')
+            dest.executemany(f'INSERT INTO "{self.workspace_meta_table}" VALUES (?, ?)',
+                             [(key, json.dumps(value)) for key, value in metadata.items()])
+            dest.commit()
+        finally:
+            dest.close()
+
+    def open_workspace(self, path):
+        """
+        Restore a workspace saved by save_workspace without touching the source workbooks.
+        Returns the extra app state that was saved with it.
+        """
+        src = sqlite3.connect(pathlib.Path(path).as_uri() + "?mode=ro", uri=True)
+        try:
+            try:
+                rows = src.execute(f'SELECT key, value FROM "{self.workspace_meta_table}"').fetchall()
+            except sqlite3.DatabaseError:
+                raise ValueError(f"{os.path.basename(path)} is not an Excel SQL Developer workspace")
+            metadata = {key: json.loads(value) for key, value in rows}
+            if metadata.get("format", 0) > self.workspace_format:
+                raise ValueError("Workspace was saved by a newer version of Excel SQL Developer")
+
+            self.open_workspace_database()
+            src.backup(self.conn)
+        finally:
+            src.close()
+
+        self.conn.execute(f'DROP TABLE "{self.workspace_meta_table}"')
+        if self.storage_mode == "file":
+            self.conn.execute("PRAGMA journal_mode = WAL")  # The backup copied the saved file's settings
+
+        self.file_path = metadata.get("file_path", "")
+        self.table_mapping = metadata.get("table_mapping", {})
+        self.inferred_schema = metadata.get("inferred_schema", {})
+        self.partition_views = {view: [tuple(member) for member in members]
+                                for view, members in metadata.get("partition_views", {}).items()}
+        self.summary_tables = metadata.get("summary_tables", {})
+        self.sample_tables = metadata.get("sample_tables", {})
+        self.text_indexes = metadata.get("text_indexes", {})
+        self._summary_shapes = {name: self._summary_shape(name) for name in self.summary_tables}
+        self.created_indexes = [tuple(pair) for pair in metadata.get("created_indexes", [])]
+        self.index_scan_counts = Counter({(table, column): count
+                                          for table, column, count in metadata.get("index_scan_counts", [])})
+        self.load_warnings = [tuple(w) for w in metadata.get("load_warnings", [])]
+        self.load_profiles = {}
+        self.stats_catalog = {}
+        return metadata.get("extra", {})
+
+    def worker_database_uri(self):
+        """
+        Return the URI worker threads should open. Shared-memory and file workspaces are
+        opened directly; a private in-memory database is first copied to a temp file,
+        copied again whenever the schema or data changed since the last copy (a full copy,
+        so large workspaces are better served by shared_memory or file storage).
+        Call from the thread that owns self.conn.
+        """
+        if self.storage_mode == "file":
+            return self._workspace_uri + "?mode=ro"
+        if self._workspace_uri:
+            return self._workspace_uri
+
+        signature = (id(self.conn), self.conn.execute("PRAGMA schema_version").fetchone()[0],
+                     self.conn.total_changes)
+        if signature != self._snapshot_signature:
+            # Each version gets its own file: workers (e.g. a background profile) may still
+            # be reading the previous one, and Windows cannot delete a file that is open
+            self._retire_snapshot()
+            db_path = self._new_temp_path("snapshot_", ".db")
+            disk = sqlite3.connect(db_path)
+            self.conn.backup(disk)
+            disk.close()
+            self._snapshot_path = db_path
+            self._snapshot_signature = signature
+        return pathlib.Path(self._snapshot_path).as_uri() + "?mode=ro"
+
+    def _retire_snapshot(self):
+        """Delete the current and any earlier snapshots that no reader holds open any more"""
+        if self._snapshot_path:
+            self._stale_snapshots.append(self._snapshot_path)
+            self._snapshot_path = None
+        still_open = []
+        for path in self._stale_snapshots:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                still_open.append(path)  # Retried on the next refresh; the temp folder goes at exit
+        self._stale_snapshots = still_open
+
+    def connect_worker(self, db_uri=None):
+        """Open a read-only connection for a worker thread (queries, exports, statistics)"""
+        conn = sqlite3.connect(db_uri or self.worker_database_uri(), uri=True, check_same_thread=False)
+        conn.text_factory = str
+        conn.execute("PRAGMA query_only = ON")
+        if self.storage_mode == "file":
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.sql_functions_enabled:
+            register_functions(conn)
+        return conn
+
+    def _get_temp_dir(self):
+        with self._temp_lock:  # Worker threads may create spill files concurrently
+            if self._temp_dir is None:
+                self._temp_dir = tempfile.mkdtemp(prefix="esd_workspace_")
+                atexit.register(shutil.rmtree, self._temp_dir, True)
+        return self._temp_dir
+
+    def _new_temp_path(self, prefix, suffix):
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self._get_temp_dir())
+        os.close(fd)
+        return path
+
+    def read_result(self, processed_query, conn=None):
+        """
+        Fetch a query result in chunks of result_chunk_rows, typing columns whose source type
+        is known from ingestion. Once the frames exceed result_memory_budget bytes, the full
+        result is spilled to a temporary SQLite file: the returned DataFrame then holds only
+        the rows that fit and result_df.attrs["spill"] is the ResultSpill with every row.
+        result_df.attrs["elapsed_seconds"] is the time taken to execute and fetch, and
+        result_df.attrs["summary_rewrite"] the summary table that answered a rewritten query.
+        In approximate_mode, aggregate queries over sampled tables run against a sample;
+        result_df.attrs["approximate"] then describes it and each scaled COUNT/SUM column is
+        followed by a "<column> ±" column holding its confidence bound.
+        """
+        query_started = time.perf_counter()
+        plan = self.approximate_query(processed_query) if self.approximate_mode else None
+        started = self.perf.start()
+        cursor = (conn or self.conn).execute(plan["query"] if plan else processed_query)
+        self.perf.stop("execute", started)
+        if cursor.description is None:
+            cursor.close()
+            result_df = pd.DataFrame()  # Statement without a result set
+            result_df.attrs["elapsed_seconds"] = time.perf_counter() - query_started
+            return result_df
+
+        columns = [d[0] for d in cursor.description]
+        column_types = self._known_column_types(plan["query"] if plan else processed_query, columns,
+                                                conn or self.conn)
+        chunks = []
+        used_bytes = 0
+        spill = None
+        build_seconds = 0.0  # Only accumulated while timing spans are recorded
+        fetch_started = self.perf.start()
+        try:
+            while True:
+                rows = cursor.fetchmany(self.result_chunk_rows)
+                if not rows:
+                    break
+                if spill is not None:
+                    spill.append(rows)
+                    continue
+
+                build_started = self.perf.start()
+                chunk = _typed_frame(rows, columns, column_types)
+                if build_started is not None:
+                    build_seconds += time.perf_counter() - build_started
+                used_bytes += int(chunk.memory_usage(deep=True).sum())
+                if used_bytes > self.result_memory_budget and chunks:
+                    spill = ResultSpill(self._new_temp_path("spill_", ".db"), columns, column_types)
+                    for kept in chunks:
+                        spill.append(kept.astype(object).where(kept.notna(), None).itertuples(index=False, name=None))
+                    spill.append(rows)
+                    continue
+                chunks.append(chunk)
+        finally:
+            cursor.close()
+
+        concat_started = self.perf.start()
+        if chunks:
+            result_df = pd.concat(chunks, ignore_index=True)
+        else:
+            result_df = pd.DataFrame(columns=columns)
+        if spill is not None:
+            spill.finish()
+            result_df.attrs["spill"] = spill
+        result_df.attrs["elapsed_seconds"] = time.perf_counter() - query_started
+        summary = self.summary_rewrite_of(processed_query)
+        if summary is not None:
+            result_df.attrs["summary_rewrite"] = summary
+        if plan is not None:
+            self._add_confidence_bounds(result_df, plan)
+            result_df.attrs["approximate"] = {key: plan[key] for key in ("table", "sample", "fraction")}
+        if fetch_started is not None:
+            fetch_seconds = concat_started - fetch_started - build_seconds  # SQLite stepping and spilling
+            build_seconds += time.perf_counter() - concat_started
+            self.perf.record("fetch_rows", fetch_seconds,
+                             rows=spill.row_count if spill is not None else len(result_df.index))
+            self.perf.record("build_dataframe", build_seconds, columns=len(columns))
+        return result_df
+
+    def _known_column_types(self, processed_query, columns, conn):
+        """
+        Types inferred at load for the result columns that are plain references to a source
+        column (or come from * / table.*), read from the outermost select list. Aliased columns
+        and expressions get None and keep the values SQLite returns.
+        """
+        unknown = [None] * len(columns)
+        clean_query = re.sub(r'--.*?$', '', processed_query, flags=re.MULTILINE)
+        clean_query = re.sub(r'/\*.*?\*/', '', clean_query, flags=re.DOTALL)
+        masked = self._mask_nested(clean_query)
+        select = re.match(r'\s*SELECT\s+(?:(?:ALL|DISTINCT)\s+)?', masked, re.IGNORECASE)
+        from_match = select and re.search(r'\bFROM\b', masked[select.end():], re.IGNORECASE)
+        if not from_match or re.search(r'\b(?:UNION|INTERSECT|EXCEPT)\b', masked, re.IGNORECASE):
+            return unknown
+        from_start = select.end() + from_match.end()
+        from_end = re.search(r'\b(?:WHERE|GROUP|HAVING|ORDER|LIMIT|WINDOW)\b', masked[from_start:], re.IGNORECASE)
+        from_clause = masked[from_start:from_start + from_end.start() if from_end else len(masked)]
+
+        sources, qualifiers = [], {}  # FROM sources in order (None for subqueries); name/alias -> source
+        for source in re.finditer(r'(?:^|,|\bJOIN\b)\s*(?:"(?P<table>[^"]+)"|\(\s*\))'
+                                  r'(?:\s+(?:AS\s+)?(?P<alias>"[^"]+"|\w+))?', from_clause, re.IGNORECASE):
+            table = source.group("table")
+            sources.append(table)
+            alias = source.group("alias")
+            if alias and alias.strip('"').lower() not in _JOIN_WORDS:
+                qualifiers[alias.strip('"').lower()] = table
+            elif table:
+                qualifiers[table.lower()] = table
+        table_columns = {}
+
+        def columns_of(table):
+            if table not in table_columns:
+                table_columns[table] = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+            return table_columns[table]
+
+        def type_of(table, column):
+            schema = self._source_schema(table)
+            return next((sql_type for name, sql_type in schema.items() if name.lower() == column.lower()), None)
+
+        types = []
+        for item in self._split_top_level(clean_query[select.end():select.end() + from_match.start()], ","):
+            star = re.fullmatch(r'(?:("[^"]+"|\w+)\.)?\*', item)
+            if star:
+                expanded = [qualifiers.get(star.group(1).strip('"').lower())] if star.group(1) else sources
+                if None in expanded:
+                    # A subquery's columns are not known, nor the positions after them
+                    return types + [None] * (len(columns) - len(types)) if len(types) <= len(columns) else unknown
+                types.extend(type_of(table, column) for table in expanded for column in columns_of(table))
+                continue
+            reference = re.fullmatch(r'(?:(?P<qualifier>"[^"]+"|\w+)\.)?(?P<column>"[^"]+"|[A-Za-z_]\w*)'
+                                     r'(?:\s+(?:AS\s+)?(?P<alias>"[^"]+"|\w+))?', item, re.IGNORECASE)
+            column = reference and reference.group("column").strip('"')
+            if (not reference or column.lower() in _SQL_WORDS
+                    or reference.group("alias") and reference.group("alias").strip('"').lower() != column.lower()):
+                types.append(None)
+                continue
+            if reference.group("qualifier"):
+                table = qualifiers.get(reference.group("qualifier").strip('"').lower())
+            else:
+                owners = [t for t in sources if t is not None and column.lower() in map(str.lower, columns_of(t))]
+                table = owners[0] if len(owners) == 1 and None not in sources else None
+            types.append(type_of(table, column) if table else None)
+        return types if len(types) == len(columns) else unknown
+
+    def _source_schema(self, sql_name):
+        """Inferred column types of a table, or of the sheet a sample table was drawn from"""
+        if sql_name in self.inferred_schema:
+            return self.inferred_schema[sql_name]
+        for table, samples in self.sample_tables.items():
+            if sql_name in (samples["uniform"], samples["stratified"]):
+                return self.inferred_schema.get(table, {})
+        return {}
+
+    def _mask_nested(self, text):
+        """text with string literals and the insides of parentheses blanked out, positions kept"""
+        masked, depth, quote = [], 0, None
+        for char in text:
+            if quote:
+                masked.append(char if char == quote else " ")
+                quote = None if char == quote else quote
+                continue
+            if char == "'":
+                quote = char
+            elif char == "(":
+                depth += 1
+                masked.append(char if depth == 1 else " ")
+                continue
+            elif char == ")":
+                depth -= 1
+                masked.append(char if depth == 0 else " ")
+                continue
+            masked.append(char if depth == 0 else " ")
+        return "".join(masked)
+
+    def enable_spool(self, file_path):
+        """Start spooling results to a file; raises OSError if it cannot be opened"""
+        self.spool_file = open(file_path, 'w', encoding='utf-8')
+        self.spooling_active = True
+        return True
+
+    def spool_results(self, result_df, query_index, header=None):
+        """Append a query's results to the spool file as CSV"""
+        if not self.spooling_active:
+            return
+        if header is None:
+            header = (query_index == 0)  # By default only for the first query
+
+        spill = result_df.attrs.get("spill")
+        chunks = spill.iter_chunks(self.result_chunk_rows) if spill is not None else [result_df]
+        with self.perf.span("spool", rows=spill.row_count if spill is not None else len(result_df.index)):
+            for chunk in chunks:
+                chunk.to_csv(self.spool_file, mode='a', index=False, header=header)
+                header = False
@@ -0,0 +1,159 @@
+"""
+Excel-style SQL functions registered on every Excel SQL Developer connection.
+
+    EXCEL_DATE(serial [, date1904])  Excel date serial -> 'YYYY-MM-DD', or 'YYYY-MM-DD HH:MM:SS'
+                                     when it has a time part; NULL if it is not a valid serial
+    text REGEXP pattern              1 when the Python regular expression matches anywhere in text
+    REGEX_EXTRACT(text, pattern [, group])
+                                     First match of pattern (or of one of its groups), else NULL
+    NORMALIZE(text)                  Case-, accent- and whitespace-insensitive form of text
+    NORM_EQ(a, b)                    1 when a and b are equal once normalized
+    TO_NUMBER(text)                  '1,234.50', '$ 12', '(5)', '12%' -> number; NULL when not a number
+    NORM_DISTINCT(text)              Aggregate: distinct values once normalized
+    ... COLLATE NORMALIZED           Compare, sort and group text by its normalized form
+
+SQLite calls Python functions once per row; Python's sqlite3 module has no batch or
+table-valued function API. The functions are therefore registered as deterministic
+(SQLite may evaluate them once for constant arguments and use them in indexes) and their
+results are memoized per distinct input, so a column of repeated dates, codes or names
+costs one Python call per distinct value. NORM_DISTINCT collects a group's distinct raw
+values and normalizes each of them once when the group is finished.
+"""
+import math
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+CACHE_SIZE = 65536  # Memoized results kept per function
+
+_NUMBER_PATTERN = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_CURRENCY_AND_SPACES = re.compile(r"[\s $€£¥]|(?<=\d),(?=\d{3}(?:\D|$))")
+_EXCEL_EPOCH = datetime(1899, 12, 30)  # Serial 0 once Excel's phantom 1900-02-29 is accounted for
+_EXCEL_EPOCH_1904 = datetime(1904, 1, 1)
+_MAX_SERIAL = 2958465  # 9999-12-31
+
+
+@lru_cache(maxsize=256)
+def _compiled(pattern):
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def excel_date(serial, date1904=0):
+    if serial is None or isinstance(serial, bytes):
+        return None
+    try:
+        serial = float(serial)
+    except ValueError:
+        return None
+    if not math.isfinite(serial) or serial < 0 or serial > _MAX_SERIAL:
+        return None
+    days = math.floor(serial)
+    seconds = round((serial - days) * 86400)
+    if date1904:
+        moment = _EXCEL_EPOCH_1904 + timedelta(days=days, seconds=seconds)
+    elif days == 60:
+        return None  # Excel's 1900-02-29, which never existed
+    else:
+        # Serials before the phantom leap day count from 1899-12-31
+        moment = _EXCEL_EPOCH + timedelta(days=days + (1 if days < 60 else 0), seconds=seconds)
+    return moment.strftime("%Y-%m-%d %H:%M:%S" if seconds else "%Y-%m-%d")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def regexp(pattern, text):
+    if pattern is None or text is None:
+        return None
+    return 1 if _compiled(pattern).search(str(text)) else 0
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def regex_extract(text, pattern, group=0):
+    if pattern is None or text is None:
+        return None
+    match = _compiled(pattern).search(str(text))
+    if match is None:
+        return None
+    try:
+        return match.group(group)
+    except IndexError:
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize(text):
+    if text is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def norm_eq(a, b):
+    if a is None or b is None:
+        return None
+    return 1 if normalize(a) == normalize(b) else 0
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def to_number(text):
+    if text is None or isinstance(text, (int, float)):
+        return text
+    if isinstance(text, bytes):
+        return None
+    cleaned = _CURRENCY_AND_SPACES.sub("", text)
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    if negative:
+        cleaned = cleaned[1:-1]
+    percent = cleaned.endswith("%")
+    if percent:
+        cleaned = cleaned[:-1]
+    if cleaned.endswith("-") and not cleaned.startswith(("-", "+")):
+        cleaned, negative = cleaned[:-1], not negative  # Accounting style "12-"
+    if not _NUMBER_PATTERN.fullmatch(cleaned):
+        return None
+    number = int(cleaned) if re.fullmatch(r'[+-]?\d+', cleaned) and not percent else float(cleaned)
+    if percent:
+        number /= 100
+    return -number if negative else number
+
+
+def collate_normalized(a, b):
+    a, b = normalize(a), normalize(b)
+    return (a > b) - (a < b)
+
+
+class NormDistinct:
+    """Aggregate counting the distinct values of a group after normalization"""
+
+    def __init__(self):
+        self.values = set()
+
+    def step(self, value):
+        if value is not None:
+            self.values.add(value)
+
+    def finalize(self):
+        return len({normalize(value) for value in self.values})
+
+
+def clear_caches():
+    """Forget memoized results, e.g. between benchmark runs"""
+    for function in (excel_date, regexp, regex_extract, normalize, to_number, _compiled):
+        function.cache_clear()
+
+
+def register_functions(conn):
+    """Register the function library on a connection"""
+    deterministic = {"deterministic": True}
+    conn.create_function("EXCEL_DATE", 1, excel_date, **deterministic)
+    conn.create_function("EXCEL_DATE", 2, excel_date, **deterministic)
+    conn.create_function("REGEXP", 2, regexp, **deterministic)
+    conn.create_function("REGEX_EXTRACT", 2, regex_extract, **deterministic)
+    conn.create_function("REGEX_EXTRACT", 3, regex_extract, **deterministic)
+    conn.create_function("NORMALIZE", 1, normalize, **deterministic)
+    conn.create_function("NORM_EQ", 2, norm_eq, **deterministic)
+    conn.create_function("TO_NUMBER", 1, to_number, **deterministic)
+    conn.create_aggregate("NORM_DISTINCT", 1, NormDistinct)
+    conn.create_collation("NORMALIZED", collate_normalized)
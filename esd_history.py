@@ -0,0 +1,149 @@
+"""
+Persistent query history for Excel SQL Developer.
+
+Queries are kept in a small SQLite database (by default ~/.esd/history.db), one row per
+distinct statement: re-running a query only bumps its run count, last run time, duration
+and row count. Comments, case and whitespace outside string literals are ignored when
+deciding whether two statements are the same. An FTS5 index over the query text makes
+searching tens of thousands of entries instant; the database is opened on first use so
+it never delays startup.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# String literals and quoted identifiers are kept verbatim; everything else is normalized
+_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    normalized TEXT NOT NULL UNIQUE,
+    sql TEXT NOT NULL,
+    folder TEXT,
+    first_run TEXT,  -- NULL for statements imported from a workspace and not run since
+    last_run TEXT,
+    run_count INTEGER NOT NULL DEFAULT 1,
+    last_duration_ms REAL,
+    total_duration_ms REAL NOT NULL DEFAULT 0,
+    last_rows INTEGER,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS queries_last_run ON queries (last_run);
+CREATE VIRTUAL TABLE IF NOT EXISTS queries_fts USING fts5 (sql, content='queries', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS queries_ai AFTER INSERT ON queries BEGIN
+    INSERT INTO queries_fts (rowid, sql) VALUES (new.id, new.sql);
+END;
+CREATE TRIGGER IF NOT EXISTS queries_ad AFTER DELETE ON queries BEGIN
+    INSERT INTO queries_fts (queries_fts, rowid, sql) VALUES ('delete', old.id, old.sql);
+END;
+CREATE TRIGGER IF NOT EXISTS queries_au AFTER UPDATE OF sql ON queries BEGIN
+    INSERT INTO queries_fts (queries_fts, rowid, sql) VALUES ('delete', old.id, old.sql);
+    INSERT INTO queries_fts (rowid, sql) VALUES (new.id, new.sql);
+END;
+"""
+
+_COLUMNS = "id, sql, folder, last_run, run_count, last_duration_ms, last_rows, last_error"
+
+
+def normalize_sql(sql):
+    """Dedup key for a statement: comments dropped, whitespace collapsed and case folded outside literals"""
+    parts = _LITERAL_PATTERN.split(sql)
+    for i in range(0, len(parts), 2):  # Even positions are outside literals
+        code = _COMMENT_PATTERN.sub(" ", parts[i])
+        parts[i] = re.sub(r"\s+", " ", code).lower()
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    words = re.findall(r"\w+", text)
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+
+class QueryHistory:
+    """Searchable, deduplicated history of executed queries"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def record(self, sql, duration_seconds=None, rows=None, error=None, folder=None):
+        """Add a statement, or update its run statistics if an equivalent one is already stored"""
+        normalized = normalize_sql(sql)
+        if not normalized:
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        duration_ms = None if duration_seconds is None else duration_seconds * 1000
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO queries (normalized, sql, folder, first_run, last_run, last_duration_ms,"
+                " total_duration_ms, last_rows, last_error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (normalized) DO UPDATE SET"
+                " sql = excluded.sql, folder = COALESCE(excluded.folder, folder), last_run = excluded.last_run,"
+                " first_run = COALESCE(first_run, excluded.first_run),"
+                " run_count = run_count + 1, last_duration_ms = excluded.last_duration_ms,"
+                " total_duration_ms = total_duration_ms + excluded.total_duration_ms,"
+                " last_rows = excluded.last_rows, last_error = excluded.last_error",
+                (normalized, sql.strip(), folder, now, now, duration_ms, duration_ms or 0, rows, error))
+
+    def import_queries(self, queries):
+        """
+        Add statements (e.g. from a saved workspace) that are not stored yet, without counting
+        a run. They have no run time, so they are listed after every statement actually run.
+        """
+        rows = [(normalize_sql(sql), sql.strip()) for sql in queries if normalize_sql(sql)]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO queries (normalized, sql, run_count) VALUES (?, ?, 0)"
+                " ON CONFLICT (normalized) DO NOTHING", rows)
+
+    def _where(self, text):
+        fts = _fts_query(text or "")
+        if not fts:
+            return "", ()
+        return "WHERE id IN (SELECT rowid FROM queries_fts WHERE queries_fts MATCH ?)", (fts,)
+
+    def count(self, text=None):
+        where, params = self._where(text)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM queries {where}", params).fetchone()[0]
+
+    def search(self, text=None, offset=0, limit=50):
+        """
+        Return one page of entries, most recently run first (never-run imports last), as dicts. With text, only
+        entries whose query contains every word (as a prefix) are returned.
+        """
+        where, params = self._where(text)
+        with self._lock:
+            cursor = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM queries {where} ORDER BY last_run IS NULL, last_run DESC, id DESC LIMIT ? OFFSET ?",
+                params + (limit, offset))
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def recent(self, limit):
+        """SQL text of the most recently run entries, newest first"""
+        return [entry["sql"] for entry in self.search(limit=limit)]
+
+    def delete(self, entry_id):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM queries WHERE id = ?", (entry_id,))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
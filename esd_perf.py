@@ -0,0 +1,166 @@
+"""
+Lightweight timing spans for Excel SQL Developer's hot paths, and deferred imports
+of heavy modules so the window can appear before pandas is loaded.
+
+    with engine.perf.span("process_query"):
+        ...
+
+While the recorder is disabled, span() returns a shared no-op context manager and
+start() returns None, so instrumented code pays one attribute check per call. When
+enabled, each finished span is kept in a bounded per-stage buffer (for the in-app
+Performance window) and written as one JSON line to a rotating log file.
+"""
+import importlib
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+# Upper edges, in milliseconds, of the histogram buckets shown per stage; the last bucket is open
+HISTOGRAM_EDGES_MS = [0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000]
+
+IMPORT_SECONDS = {}  # Module name -> seconds its deferred import took
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module that is imported on first attribute access:
+        pd = LazyModule("pandas", globals(), "pd")
+    The first access rebinds the global to the real module, so later lookups cost nothing.
+    """
+
+    def __init__(self, name, namespace, alias):
+        self._name = name
+        self._namespace = namespace
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def _load(self):
+        started = time.perf_counter()
+        already_loaded = self._name in sys.modules
+        module = importlib.import_module(self._name)  # Waits if another thread is mid-import
+        if not already_loaded:
+            IMPORT_SECONDS.setdefault(self._name, time.perf_counter() - started)
+        self._namespace[self._alias] = module
+        return module
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, recorder, stage, fields):
+        self.recorder = recorder
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.recorder.record(self.stage, time.perf_counter() - self.start, **self.fields)
+        return False
+
+    def set(self, **fields):
+        """Attach fields known only once the work is done, such as row counts"""
+        self.fields.update(fields)
+
+
+class PerfRecorder:
+    """Collects timing spans in memory and in a rotating JSON-lines log"""
+
+    def __init__(self, samples_per_stage=2000):
+        self.enabled = False
+        self.samples_per_stage = samples_per_stage  # Most recent durations kept per stage
+        self.log_path = None
+        self._samples = defaultdict(lambda: deque(maxlen=self.samples_per_stage))
+        self._lock = threading.Lock()  # Worker threads record spans too
+        self._logger = None
+
+    def enable(self, log_path=None, max_bytes=1024 * 1024, backup_count=3):
+        """Start recording; with log_path, spans are also appended to a rotating log file"""
+        if log_path and self._logger is None:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                           backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"esd.perf.{id(self)}")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(handler)
+            self.log_path = log_path
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, stage, **fields):
+        """Context manager timing one unit of work under a stage name"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, fields)
+
+    def start(self):
+        """Start a span that cannot be a with-block; pass the result to stop()"""
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, stage, started, **fields):
+        if started is not None:
+            self.record(stage, time.perf_counter() - started, **fields)
+
+    def record(self, stage, seconds, **fields):
+        with self._lock:
+            self._samples[stage].append(seconds)
+        if self._logger is not None:
+            entry = {"ts": datetime.now().isoformat(timespec="milliseconds"), "stage": stage,
+                     "ms": round(seconds * 1000, 3), "thread": threading.current_thread().name}
+            entry.update(fields)
+            self._logger.info(json.dumps(entry, default=str))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """Return one dict per stage: count, p50/p95/max milliseconds and histogram bucket counts"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items() if values}
+        rows = []
+        for stage, values in sorted(samples.items()):
+            ms = [seconds * 1000 for seconds in values]
+            histogram = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+            for value in ms:
+                bucket = next((i for i, edge in enumerate(HISTOGRAM_EDGES_MS) if value <= edge),
+                              len(HISTOGRAM_EDGES_MS))
+                histogram[bucket] += 1
+            rows.append({
+                "stage": stage,
+                "count": len(ms),
+                "p50_ms": ms[len(ms) // 2],
+                "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+                "max_ms": ms[-1],
+                "total_ms": sum(ms),
+                "histogram": histogram,
+            })
+        return rows
@@ -0,0 +1,140 @@
+"""
+Streaming column statistics for Excel SQL Developer.
+
+Every column is summarized in a single pass over DataFrame chunks with bounded memory:
+exact row and null counts, numeric and text min/max, a k-minimum-values sketch for the
+distinct count, a pruned frequency table for the top values, and a bottom-k random
+sample from which the histogram of numeric values is drawn.
+"""
+from esd_perf import LazyModule
+
+np = LazyModule("numpy", globals(), "np")
+pd = LazyModule("pandas", globals(), "pd")
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+class ColumnStats:
+    """One-pass, memory-bounded summary of a column"""
+
+    def __init__(self, name, kmv_size=1024, top_capacity=200, sample_size=10000, seed=0):
+        self.name = name
+        self.kmv_size = kmv_size  # Smallest hashes kept for the distinct estimate
+        self.top_capacity = top_capacity  # Candidate values kept for the top-k list
+        self.sample_size = sample_size  # Numeric values kept for the histogram
+
+        self.rows = 0
+        self.nulls = 0
+        self.numeric_count = 0
+        self.numeric_min = None
+        self.numeric_max = None
+        self.text_min = None
+        self.text_max = None
+
+        self._kmv = np.empty(0, dtype=np.uint64)
+        self._counts = pd.Series(dtype="float64")
+        self._sample_keys = np.empty(0)
+        self._sample = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, series):
+        """Fold one chunk of the column into the summary"""
+        self.rows += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            numbers = values.astype(float)
+        else:
+            numbers = pd.to_numeric(values, errors='coerce')
+        numeric = numbers.dropna().to_numpy(dtype=float)
+        if len(numeric):
+            self.numeric_count += len(numeric)
+            self.numeric_min = numeric.min() if self.numeric_min is None else min(self.numeric_min, numeric.min())
+            self.numeric_max = numeric.max() if self.numeric_max is None else max(self.numeric_max, numeric.max())
+            self._update_sample(numeric)
+
+        text = values[numbers.isna()].astype(str)
+        if len(text):
+            chunk_min, chunk_max = text.min(), text.max()
+            self.text_min = chunk_min if self.text_min is None else min(self.text_min, chunk_min)
+            self.text_max = chunk_max if self.text_max is None else max(self.text_max, chunk_max)
+
+        hashes = np.unique(pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64))
+        self._kmv = np.union1d(self._kmv, hashes[:self.kmv_size])[:self.kmv_size]
+
+        self._counts = self._counts.add(values.value_counts(), fill_value=0)
+        if len(self._counts) > self.top_capacity:
+            self._counts = self._counts.nlargest(self.top_capacity)
+
+    def _update_sample(self, numeric):
+        # Bottom-k sampling: the values with the k smallest random keys form a uniform sample
+        keys = np.concatenate([self._sample_keys, self._rng.random(len(numeric))])
+        values = np.concatenate([self._sample, numeric])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, values = keys[keep], values[keep]
+        self._sample_keys, self._sample = keys, values
+
+    def distinct_estimate(self):
+        """Return (estimate, exact) for the number of distinct non-null values"""
+        if len(self._kmv) < self.kmv_size:
+            return len(self._kmv), True
+        kth_smallest = float(self._kmv[-1]) / 2 ** 64
+        return int((self.kmv_size - 1) / kth_smallest), False
+
+    def histogram(self, bins=16):
+        if not len(self._sample) or self.numeric_min == self.numeric_max:
+            return []
+        counts, _ = np.histogram(self._sample, bins=bins, range=(self.numeric_min, self.numeric_max))
+        return counts.tolist()
+
+    def summary(self, top_k=5):
+        distinct, exact = self.distinct_estimate()
+        mostly_numeric = self.numeric_count * 2 >= self.rows - self.nulls
+        return {
+            "column": self.name,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "null_ratio": self.nulls / self.rows if self.rows else 0.0,
+            "distinct": distinct,
+            "distinct_exact": exact,
+            "min": self.numeric_min if mostly_numeric else self.text_min,
+            "max": self.numeric_max if mostly_numeric else self.text_max,
+            "top_values": [(value, int(count)) for value, count in self._counts.nlargest(top_k).items()],
+            "histogram": self.histogram() if mostly_numeric else [],
+        }
+
+
+def profile_chunks(chunks, columns=None, progress_callback=None):
+    """
+    Summarize every column of an iterable of DataFrame chunks; returns one dict per column.
+    columns names the columns to report when there may be no chunks at all.
+    """
+    stats = [ColumnStats(str(name)) for name in columns] if columns is not None else None
+    rows_done = 0
+    for chunk in chunks:
+        if stats is None:
+            stats = [ColumnStats(str(name)) for name in chunk.columns]
+        for position, column_stats in enumerate(stats):
+            column_stats.update(chunk.iloc[:, position])
+        rows_done += len(chunk.index)
+        if progress_callback:
+            progress_callback(rows_done)
+    return [column_stats.summary() for column_stats in stats or []]
+
+
+def dataframe_chunks(df, chunksize):
+    for start in range(0, len(df.index), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def sparkline(counts):
+    """Render histogram counts as a row of block characters"""
+    if not counts or not max(counts):
+        return ""
+    top = max(counts)
+    return "".join(SPARK_BLOCKS[min(len(SPARK_BLOCKS) - 1, int(c / top * (len(SPARK_BLOCKS) - 1) + 0.5))]
+                   if c else " " for c in counts)
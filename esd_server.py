@@ -0,0 +1,186 @@
+"""
+Local HTTP query service for Excel SQL Developer.
+
+    python esd_server.py FOLDER [--host 127.0.0.1] [--port 8765] [--readers 4]
+
+Loads FOLDER once into a temporary WAL-mode database file and answers
+SQL from a pool of read-only connections, so concurrent clients run in parallel
+against the same warm database instead of each parsing the workbooks again.
+
+    GET  /health   -> {"status": "ok", "tables": 12}
+    GET  /tables   -> {"file.sheet": {"table": "file_sheet", "rows": 123}, ...}
+    POST /query    body {"sql": "SELECT ... FROM file.sheet"}
+                   -> newline-delimited JSON, streamed as rows are fetched:
+                      {"columns": [...]}, one JSON array per row, then {"row_count": n}
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from esd_engine import ExcelSQLEngine
+
+
+class ReadOnlyPool:
+    """Fixed-size pool of read-only worker connections to the engine's workspace"""
+
+    def __init__(self, engine, size):
+        self._connections = queue.Queue()
+        db_uri = engine.worker_database_uri()
+        for _ in range(size):
+            self._connections.put(engine.connect_worker(db_uri))
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get().close()
+
+
+class ESDQueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, engine, pool, fetch_size=500):
+        super().__init__(address, ESDRequestHandler)
+        self.engine = engine
+        self.pool = pool
+        self.fetch_size = fetch_size  # Rows per streamed chunk
+
+
+class ESDRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Needed for chunked streaming responses
+
+    def do_GET(self):
+        engine = self.server.engine
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "tables": len(engine.table_mapping)})
+        elif self.path == "/tables":
+            tables = {}
+            with self.server.pool.connection() as conn:
+                for dot_name, sql_name in sorted(engine.table_mapping.items()):
+                    rows = conn.execute(f'SELECT COUNT(*) FROM "{sql_name}"').fetchone()[0]
+                    tables[dot_name] = {"table": sql_name, "rows": rows}
+            self._send_json(200, tables)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/query":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            query = json.loads(self.rfile.read(length) or b"{}").get("sql", "").strip()
+        except (ValueError, AttributeError):
+            self._send_json(400, {"error": "Request body must be JSON like {\"sql\": \"SELECT ...\"}"})
+            return
+        if not query:
+            self._send_json(400, {"error": "Please enter a SQL query"})
+            return
+
+        engine = self.server.engine
+        try:
+            engine.validate_query(query)
+            processed_query = engine.process_query(query.rstrip(';'))
+        except Exception as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        with self.server.pool.connection() as conn:
+            try:
+                cursor = conn.execute(processed_query)
+            except sqlite3.Error as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            self._write_chunk(json.dumps({"columns": columns}) + "\n")
+            row_count = 0
+            try:
+                while True:
+                    rows = cursor.fetchmany(self.server.fetch_size)
+                    if not rows:
+                        break
+                    row_count += len(rows)
+                    self._write_chunk("".join(json.dumps(row, default=str) + "\n" for row in rows))
+                self._write_chunk(json.dumps({"row_count": row_count}) + "\n")
+            except sqlite3.Error as e:
+                self._write_chunk(json.dumps({"error": str(e), "row_count": row_count}) + "\n")
+            except (BrokenPipeError, ConnectionResetError):
+                return  # Client went away; nothing left to send
+            finally:
+                cursor.close()
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve SQL over HTTP for a folder of Excel workbooks.")
+    parser.add_argument("folder", help="Folder containing .xlsx/.xls workbooks")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--readers", type=int, default=4, help="Read-only connections in the pool")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return 2
+
+    engine = ExcelSQLEngine()
+    engine.storage_mode = "file"  # WAL file database so every pooled reader sees the same warm pages
+    engine.index_advisor_enabled = False  # Readers are read-only; the advisor could not create indexes
+    excel_files, warnings = engine.load_folder(
+        args.folder, lambda i, total, name: print(f"Loading files ({i}/{total}): {name}", file=sys.stderr))
+    for message, msg_type in warnings:
+        print(f"{msg_type.upper()}: {message}", file=sys.stderr)
+    if not excel_files:
+        print("No Excel files found in selected directory.", file=sys.stderr)
+        return 2
+
+    pool = ReadOnlyPool(engine, max(1, args.readers))
+
+    server = ESDQueryServer((args.host, args.port), engine, pool)
+    print(f"Serving {len(engine.table_mapping)} tables on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        engine.conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import esd_engine
+from esd_engine import ExcelSQLEngine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(esd_engine, "ESD_HOME", str(tmp_path))  # Caches and the perf log stay out of ~/.esd
+    engine = ExcelSQLEngine()
+    engine.open_workspace_database()
+    engine.sample_min_rows = 1000
+    engine.sample_min_size = 500
+    engine.sample_min_per_stratum = 100
+
+    rng = np.random.default_rng(1)
+    rows = 20000
+    df = pd.DataFrame({
+        # "Rare" has fewer rows than sample_min_per_stratum, so it is sampled whole
+        "Region": np.where(np.arange(rows) < 50, "Rare", rng.choice(["North", "South", "East"], rows)),
+        "Amount": rng.uniform(0, 100, rows),
+    })
+    column_types = {"Region": "TEXT", "Amount": "REAL"}
+    df.to_sql("sales_sheet1", engine.conn, index=False, dtype=column_types)
+    engine.table_mapping["sales.Sheet1"] = "sales_sheet1"
+    engine.build_samples("sales_sheet1", df, column_types, [])
+    engine.approximate_mode = True
+    yield engine
+    engine.conn.close()
+
+
+def run(engine, query):
+    return engine.read_result(engine.process_query(query))
+
+
+def test_count_of_every_row_has_zero_width(engine):
+    result = run(engine, "SELECT COUNT(*) AS n FROM sales.Sheet1")
+    assert result.attrs["approximate"]["sample"] == "uniform"
+    assert result["n"].iloc[0] == 20000
+    assert result["n ±"].iloc[0] == pytest.approx(0, abs=1e-6)
+
+
+def test_count_per_stratum_has_zero_width(engine):
+    result = run(engine, "SELECT Region, COUNT(*) AS n FROM sales.Sheet1 GROUP BY Region")
+    assert result.attrs["approximate"]["sample"] == "stratified"
+    assert result.attrs["approximate"]["fraction"] > 0
+    assert result["n ±"].tolist() == pytest.approx([0] * len(result), abs=1e-6)
+
+
+def test_fully_sampled_stratum_has_zero_width(engine):
+    result = run(engine, "SELECT Region, SUM(Amount) AS total FROM sales.Sheet1 GROUP BY Region")
+    rare = result[result["Region"] == "Rare"]
+    assert rare["total ±"].iloc[0] == pytest.approx(0, abs=1e-6)
+    assert (result[result["Region"] != "Rare"]["total ±"] > 0).all()
+
+
+def test_filtered_count_has_a_bound(engine):
+    result = run(engine, "SELECT COUNT(*) AS n FROM sales.Sheet1 WHERE Amount < 50")
+    assert result["n ±"].iloc[0] > 0
+    assert abs(result["n"].iloc[0] - 10000) < 3 * result["n ±"].iloc[0]